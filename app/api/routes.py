@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Request, BackgroundTasks, Response, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, Request, Depends, HTTPException, status
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.templating import Jinja2Templates
 from app.core.config import settings
 from app.core.scanner import HybridScanner
+from app.core.job_store import create_job_store
+from app.core.history import create_history
+from app.core.fleet import FleetScanner, expand_targets
+from app.core.scheduler import ScanScheduler, QueueFull, PRIORITIES
+from app.core.remediation import write_fleet_bundle
+from app.core import metrics, tracing
+import asyncio
+import os
+import tempfile
 import uuid
+import time
+import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 # Audit Logger
 logger = logging.getLogger("audit")
@@ -15,8 +26,12 @@ router = APIRouter()
 templates = Jinja2Templates(directory=settings.BASE_DIR + "/app/templates")
 security = HTTPBasic()
 
-# In-memory job store (Use Redis for production)
-jobs: Dict[str, Any] = {}
+# Bounded job store (memory or SQLite, see JOB_STORE_BACKEND)
+jobs = create_job_store()
+# Per-host scan history for diffs between runs (None when HISTORY_ENABLED is off)
+history = create_history()
+# Bounded worker pool + priority queue every scan goes through
+scheduler = ScanScheduler(workers=settings.SCAN_WORKERS, max_queue=settings.SCAN_QUEUE_MAX)
 
 def check_auth(credentials: HTTPBasicCredentials = Depends(security)):
     is_correct_username = credentials.username == settings.AUTH_USERNAME
@@ -37,79 +52,330 @@ async def read_root(request: Request):
     # Ideally, frontend should handle auth challenge.
     return templates.TemplateResponse("index.html", {"request": request})
 
-async def perform_scan(job_id: str, username: str):
+def _record_history(job_id: str, username: str, host: str, result: Dict[str, Any]) -> Optional[int]:
+    if history is None:
+        return None
+    try:
+        return history.record(host, result, job_id=job_id, username=username)
+    except Exception as e:
+        # History is an add-on: never fail the scan because of it
+        logger.error(f"Could not record scan history for {host}: {e}")
+        return None
+
+def _store_completed(job_id: str, username: str, scanner: HybridScanner, result: Dict[str, Any]):
+    jobs[job_id] = {
+        "status": "completed",
+        "result": result,
+        "username": username,
+        "target": scanner.target_ip,
+        "timestamp": scanner.timestamp,
+        "completed_at": time.time(),
+        # Kept so /api/sanitize can build the script without rescanning
+        "fixes": scanner.fixes,
+        "history_id": _record_history(job_id, username, scanner.target_ip, result)
+    }
+
+async def perform_scan(job_id: str, username: str, targets: Optional[List[str]] = None, refresh: bool = False,
+                       trace: bool = False):
+    if not (trace or settings.TRACE_SCANS):
+        return await _perform_scan(job_id, username, targets, refresh)
+    
+    path = os.path.join(settings.TRACE_DIR, f"{job_id}.trace.json")
+    with tracing.trace(f"scan {job_id}", path):
+        await _perform_scan(job_id, username, targets, refresh)
+    job = jobs.get(job_id)
+    if job:
+        jobs[job_id] = {**job, "trace": os.path.basename(path)}
+
+async def _perform_scan(job_id: str, username: str, targets: Optional[List[str]] = None, refresh: bool = False):
+    targets = targets or [settings.TARGET_IP]
+    if len(targets) > 1:
+        return await perform_fleet_scan(job_id, username, targets, refresh)
+    
     logger.info(f"Scan Job {job_id} started by {username}")
     try:
-        scanner = HybridScanner()
-        await scanner.scan_network_ports()
-        await scanner.run_powershell_module()
+        scanner = HybridScanner(targets[0], refresh=refresh)
+        await scanner.run_all()
+        _store_completed(job_id, username, scanner, scanner.build_result())
+        logger.info(f"Scan Job {job_id} completed successfully")
+    except Exception as e:
+        logger.error(f"Scan Job {job_id} failed: {e}")
+        jobs[job_id] = {"status": "failed", "error": str(e), "username": username}
 
-        await scanner.run_csharp_module()
-        await scanner.run_filesystem_module()
-        
-        uac = scanner.report_data.get("UAC_Check", {})
-        sys_config = scanner.report_data.get("System_Config", {})
-        fs_check = scanner.report_data.get("FileSystem_Check", {})
+async def perform_fleet_scan(job_id: str, username: str, targets: List[str], refresh: bool = False):
+    logger.info(f"Fleet Scan Job {job_id} started by {username} ({len(targets)} hosts)")
+    hosts: Dict[str, Any] = {}
+    host_fixes: Dict[str, List[Dict[str, str]]] = {}
+    
+    async def scan_host(target: str) -> Dict[str, Any]:
+        scanner = HybridScanner(target, refresh=refresh)
+        with tracing.span(f"host:{target}", cat="host"):
+            await scanner.run_all()
+        host_fixes[target] = scanner.fixes
+        return scanner.build_result()
+    
+    try:
+        fleet = FleetScanner(scan_host, max_hosts=settings.FLEET_MAX_HOSTS)
+        async for target, result in fleet.stream(targets):
+            hosts[target] = result
+            _record_history(job_id, username, target, result)
+            # Publish each host as soon as it finishes so pollers see partial results
+            jobs[job_id] = {
+                "status": "processing",
+                "kind": "fleet",
+                "username": username,
+                "targets": targets,
+                "progress": {"completed": len(hosts), "total": len(targets)},
+                "result": {"hosts": hosts}
+            }
         
-        is_vulnerable = False
-        if (sys_config.get("SMBv1_Status") == "Enabled" or
-            sys_config.get("Unquoted_Services") != "None" or
-            uac.get("Risk") == "HIGH" or
-            any(f.get("Risk") == "HIGH" for f in fs_check.values())):
-            is_vulnerable = True
-            
-        result = {
-            "status": "success",
-            "network": scanner.report_data.get("Network_Scan", []),
-            "system": sys_config,
-            "uac": uac,
-            "filesystem": fs_check,
-            "vulnerable": is_vulnerable
+        jobs[job_id] = {
+            "status": "completed",
+            "result": {
+                "status": "success",
+                "hosts": {t: hosts[t] for t in targets},
+                "vulnerable": any(h.get("vulnerable") for h in hosts.values())
+            },
+            "kind": "fleet",
+            "username": username,
+            "targets": targets,
+            "progress": {"completed": len(hosts), "total": len(targets)},
+            "completed_at": time.time(),
+            "host_fixes": host_fixes
         }
-        
-        jobs[job_id] = {"status": "completed", "result": result}
-        logger.info(f"Scan Job {job_id} completed successfully")
+        logger.info(f"Fleet Scan Job {job_id} completed successfully")
     except Exception as e:
-        logger.error(f"Scan Job {job_id} failed: {e}")
-        jobs[job_id] = {"status": "failed", "error": str(e)}
+        logger.error(f"Fleet Scan Job {job_id} failed: {e}")
+        jobs[job_id] = {"status": "failed", "error": str(e), "username": username}
 
 @router.get("/api/scan")
-async def run_scan_background(background_tasks: BackgroundTasks, username: str = Depends(check_auth)):
+async def run_scan_background(targets: Optional[str] = None, refresh: bool = False, priority: str = "normal",
+                              trace: bool = False, username: str = Depends(check_auth)):
+    if priority not in PRIORITIES:
+        return JSONResponse(status_code=400, content={"error": f"priority must be one of {', '.join(PRIORITIES)}"})
+    try:
+        # Comma-separated IPs, hostnames or CIDR blocks; never local files from the API
+        target_list = expand_targets([targets], settings.MAX_TARGETS, allow_files=False) if targets else None
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    
+    # The same scan already waiting in the queue serves this request too
+    key = (username, tuple(target_list or [settings.TARGET_IP]), refresh, trace)
+    pending = scheduler.pending_job(key)
+    if pending:
+        logger.info(f"Scan requested by {username} joined queued Job ID: {pending}")
+        return {"job_id": pending, "status": "queued", "deduplicated": True}
+    
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing"}
-    background_tasks.add_task(perform_scan, job_id, username)
+    
+    async def run():
+        jobs[job_id] = {"status": "processing", "username": username}
+        await perform_scan(job_id, username, target_list, refresh, trace=trace)
+    
+    try:
+        scheduler.submit(job_id, run, priority=priority, key=key)
+    except QueueFull as e:
+        logger.warning(f"Scan requested by {username} rejected: {e}")
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    # The job task cannot start before this handler yields to the event loop
+    jobs[job_id] = {"status": "queued", "username": username, "priority": priority}
     logger.info(f"Scan requested by {username}. Job ID: {job_id}")
     return {"job_id": job_id, "status": "started"}
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/api/scan/stream")
+async def stream_scan(refresh: bool = False, username: str = Depends(check_auth)):
+    """Runs a scan and pushes each module's result as a Server-Sent Event as soon as it finishes"""
+    job_id = str(uuid.uuid4())
+    jobs[job_id] = {"status": "processing", "username": username}
+    logger.info(f"Streaming scan requested by {username}. Job ID: {job_id}")
+
+    async def events():
+        scanner = HybridScanner(refresh=refresh)
+        settled = False
+        yield _sse("start", {"job_id": job_id, "target": scanner.target_ip})
+        try:
+            if scheduler.would_wait():
+                jobs[job_id] = {"status": "queued", "username": username}
+                yield _sse("queued", {"job_id": job_id, "queue_depth": scheduler.stats()["queue_depth"] + 1})
+            async with scheduler.slot(job_id):
+                jobs[job_id] = {"status": "processing", "username": username}
+                async for key, event in scanner.stream_all():
+                    yield _sse("module", {
+                        "module": key,
+                        "data": event["data"],
+                        "extra": event["extra"],
+                        "mitre_techniques": event["mitre_techniques"],
+                        "fixes": len(event["fixes"])
+                    })
+            result = scanner.build_result()
+            _store_completed(job_id, username, scanner, result)
+            settled = True
+            logger.info(f"Scan Job {job_id} completed successfully")
+            yield _sse("complete", {"job_id": job_id, "result": result})
+        except Exception as e:
+            logger.error(f"Scan Job {job_id} failed: {e}")
+            jobs[job_id] = {"status": "failed", "error": str(e), "username": username}
+            settled = True
+            yield _sse("error", {"job_id": job_id, "error": str(e)})
+        finally:
+            # Client went away mid-scan: do not leave the job "processing" forever
+            if not settled:
+                jobs[job_id] = {"status": "failed", "error": "Stream closed before completion", "username": username}
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/api/status/{job_id}")
 async def get_scan_status(job_id: str, username: str = Depends(check_auth)):
     job = jobs.get(job_id)
     if not job:
         return JSONResponse(status_code=404, content={"error": "Job not found"})
+    if job.get("status") in ("queued", "processing"):
+        # Live position/wait from the scheduler (unknown for jobs from another process)
+        job = {**job, **(scheduler.status(job_id) or {})}
     return job
 
+@router.get("/metrics")
+async def get_metrics(username: str = Depends(check_auth)):
+    """Prometheus text format: strategy latency/failures, enrichment, subprocesses, queue and jobs"""
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "Metrics are disabled"})
+    # Point-in-time gauges are sampled on scrape
+    stats = scheduler.stats()
+    metrics.SCAN_QUEUE_DEPTH.set(stats["queue_depth"])
+    metrics.SCANS_RUNNING.set(stats["running"])
+    metrics.JOBS.set(len(jobs))
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@router.get("/api/history")
+async def list_history(host: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+                       limit: int = 50, username: str = Depends(check_auth)):
+    """Scan runs (metadata only), newest first; since/until are UNIX timestamps"""
+    if history is None:
+        return JSONResponse(status_code=404, content={"error": "Scan history is disabled"})
+    return {"scans": history.runs(host, since, until, max(1, min(limit, 1000)))}
+
+@router.get("/api/history/diff")
+async def diff_history(host: str, baseline: Optional[int] = None, current: Optional[int] = None,
+                       username: str = Depends(check_auth)):
+    """Findings that are new, resolved or changed since a baseline run (default: the previous one)"""
+    if history is None:
+        return JSONResponse(status_code=404, content={"error": "Scan history is disabled"})
+    diff = history.diff(host, baseline, current)
+    if diff is None:
+        return JSONResponse(status_code=404, content={"error": "Not enough scan history to compare"})
+    return diff
+
+@router.get("/api/history/{scan_id}")
+async def get_history(scan_id: int, username: str = Depends(check_auth)):
+    entry = history.get(scan_id) if history is not None else None
+    if entry is None:
+        return JSONResponse(status_code=404, content={"error": "Scan not found"})
+    return entry
+
 @router.post("/api/sanitize")
-async def run_sanitize(username: str = Depends(check_auth)):
+async def run_sanitize(job_id: Optional[str] = None, username: str = Depends(check_auth)):
     logger.info(f"Remediation script requested by {username}")
-    scanner = HybridScanner()
-    
-    # We run checks again to ensure fresh fix generation
-    # Ideally optimize to use cached results from scan job
-    await scanner.scan_network_ports()
-    await scanner.run_powershell_module()
 
-    await scanner.run_csharp_module()
-    await scanner.run_filesystem_module()
-    
-    content = scanner.generate_remediation_content()
+    if job_id:
+        job = jobs.get(job_id)
+        if not job or job.get("username") != username:
+            return JSONResponse(status_code=404, content={"status": "error", "message": "Job not found"})
+        if job.get("status") != "completed":
+            return JSONResponse(status_code=409, content={"status": "error", "message": "Job not completed"})
+        if job.get("kind") == "fleet":
+            return JSONResponse(status_code=409, content={
+                "status": "error",
+                "message": f"Job {job_id} is a fleet scan; use POST /api/sanitize/fleet?job_id={job_id}"
+            })
+    else:
+        # Fleet jobs keep fixes per host; they are served by /api/sanitize/fleet
+        job = jobs.latest(username, "completed", kind="host")
+
+    age = time.time() - job.get("completed_at", 0) if job else None
+    if job_id and age > settings.SANITIZE_MAX_AGE:
+        # Rescanning here would silently mix another point in time into that job's script
+        return JSONResponse(status_code=409, content={
+            "status": "error",
+            "message": f"Job {job_id} results are older than {settings.SANITIZE_MAX_AGE:.0f}s; scan again first"
+        })
+    # Fixes belong to the host the job scanned, not the default target
+    scanner = HybridScanner(job.get("target") if job else None)
+    if job and age <= settings.SANITIZE_MAX_AGE:
+        logger.info(f"Reusing scan results from {age:.0f}s ago for {username}")
+        scanner.fixes = list(job.get("fixes", []))
+        scanner.timestamp = job.get("timestamp", scanner.timestamp)
+    else:
+        # No fresh results for this user: rescan (bypassing cached strategy results)
+        scanner.refresh = True
+        try:
+            # Interactive request: ahead of queued background scans
+            async with scheduler.slot(str(uuid.uuid4()), priority="high"):
+                await scanner.run_all()
+        except QueueFull as e:
+            return JSONResponse(status_code=503, content={"status": "error", "message": str(e)})
     
-    if content:
+    if scanner.fixes:
         logger.info(f"Remediation script generated for {username}")
-        return Response(
-            content=content,
+        # Rendered chunk by chunk from the compiled template while it is sent
+        return StreamingResponse(
+            (chunk.encode("utf-8") for chunk in scanner.iter_remediation_content()),
             media_type="application/octet-stream",
             headers={"Content-Disposition": "attachment; filename=REMEDIATION_SCRIPT.ps1"}
         )
     else:
         logger.info(f"No fixes needed for {username}")
         return JSONResponse(status_code=400, content={"status": "error", "message": "No fixes needed"})
+
+def _read_chunks(f, chunk_size: int = 64 * 1024):
+    try:
+        f.seek(0)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+@router.post("/api/sanitize/fleet")
+async def run_fleet_sanitize(job_id: str, username: str = Depends(check_auth)):
+    """
+    Remediation bundle for a completed scan job: a zip with one script per
+    distinct fix set (hosts needing the same fixes share it) and a manifest.json
+    mapping hosts to scripts.
+    """
+    job = jobs.get(job_id)
+    if not job or job.get("username") != username:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Job not found"})
+    if job.get("status") != "completed":
+        return JSONResponse(status_code=409, content={"status": "error", "message": "Job not completed"})
+
+    # Single-host jobs keep their fixes at the top level
+    host_fixes = job.get("host_fixes") or {job.get("target", settings.TARGET_IP): job.get("fixes", [])}
+    if not any(host_fixes.values()):
+        logger.info(f"No fixes needed for {username} (job {job_id})")
+        return JSONResponse(status_code=400, content={"status": "error", "message": "No fixes needed"})
+
+    timestamp = job.get("timestamp") or time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.get("completed_at")))
+    # Spills to disk past 8 MiB; zipping runs off the event loop
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        manifest = await asyncio.get_running_loop().run_in_executor(
+            None, write_fleet_bundle, out, host_fixes, timestamp)
+    except Exception:
+        out.close()
+        raise
+    logger.info(f"Remediation bundle generated for {username}: {manifest['hosts']} hosts, "
+                f"{manifest['scripts']} distinct scripts")
+    return StreamingResponse(
+        _read_chunks(out),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=REMEDIATION_BUNDLE.zip"}
+    )
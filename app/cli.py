@@ -4,43 +4,150 @@ import json
 import logging
 import sys
 import os
+import time
 
 # Ensure app is in path if run as script
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Settings are lazy: values given on the command line never load pydantic or .env
+from app.core.config import settings
 from app.core.context import ContextScanner
-from app.core.strategies import (
-    NetworkScanStrategy, ServiceConfigStrategy, 
-    RegistryAuditStrategy, FileSystemStrategy
-)
+from app.core.fleet import FleetScanner, expand_targets
+from app.core.tracing import trace
+from app.core.registry import create_strategy, strategy_names
 
 # Configure logging to stderr so it doesn't pollute JSON stdout
 logging.basicConfig(level=logging.ERROR)
 
+def option(value, name: str):
+    """Command-line value, or the configured default (reading settings only then)"""
+    return value if value is not None else getattr(settings, name)
+
+def build_scanner(target: str, args) -> ContextScanner:
+    scanner = ContextScanner(
+        target,
+        concurrent=not args.sequential,
+        max_concurrency=option(args.concurrency, "SCAN_CONCURRENCY"),
+        strategy_timeout=option(args.timeout, "STRATEGY_TIMEOUT")
+    )
+    
+    # Fresh strategy instances per host: the port scanner keeps per-host RTT state.
+    # Strategy modules are imported on first use (see app.core.registry)
+    options = {
+        "network": {"ports": args.ports, "concurrency": args.port_concurrency,
+                    "timeout": args.port_timeout, "retries": args.port_retries}
+    }
+    names = strategy_names() if args.strategy == "all" else [args.strategy]
+    for name in names:
+        scanner.add_strategy(create_strategy(name, **options.get(name, {})))
+    return scanner
+
+async def run_monitor(args, parser):
+    from functools import partial
+    from app.core.history import create_history
+    from app.core.monitor import Monitor, load_plan, scan_modules
+    try:
+        hosts = load_plan(args.monitor, option(args.max_targets, "MAX_TARGETS"))
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    
+    # One JSON line per run: what changed and when the host is due next
+    monitor = Monitor(
+        partial(scan_modules, history=create_history()),
+        hosts,
+        max_concurrent=option(args.max_hosts, "FLEET_MAX_HOSTS"),
+        jitter=settings.MONITOR_JITTER,
+        splay=settings.MONITOR_SPLAY,
+        on_result=lambda host, summary: print(json.dumps(summary), flush=True)
+    )
+    await monitor.run()
+
+async def run_scan(args, targets):
+    if len(targets) == 1:
+        results = await build_scanner(targets[0], args).execute_scan()
+        print(json.dumps(results, indent=2))
+        return
+    
+    # Several hosts: stream one JSON line per host as soon as it finishes
+    fleet = FleetScanner(lambda t: build_scanner(t, args).execute_scan(),
+                         max_hosts=option(args.max_hosts, "FLEET_MAX_HOSTS"))
+    async for target, results in fleet.stream(targets):
+        print(json.dumps({"target": target, "results": results}), flush=True)
+
+def profile_path(trace_path: str) -> str:
+    """Profile stats file next to the trace: scan.trace.json -> scan.prof"""
+    base = trace_path[:-len(".json")] if trace_path.endswith(".json") else trace_path
+    base = base[:-len(".trace")] if base.endswith(".trace") else base
+    return base + ".prof"
+
+async def run_traced(args, targets):
+    import cProfile
+    import pstats
+    trace_path = args.trace or f"winsec-trace-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    profiler = cProfile.Profile() if args.profile else None
+    
+    with trace(f"winsec {' '.join(targets)}", trace_path):
+        if profiler:
+            profiler.enable()
+        try:
+            await run_scan(args, targets)
+        finally:
+            if profiler:
+                profiler.disable()
+    print(f"Trace written to {trace_path}", file=sys.stderr)
+    
+    if profiler:
+        stats_path = profile_path(trace_path)
+        profiler.dump_stats(stats_path)
+        print(f"Profile written to {stats_path}", file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(args.profile_top)
+
 async def main():
     parser = argparse.ArgumentParser(description="WinSec Defender CLI")
-    parser.add_argument("--target", default="127.0.0.1", help="Target IP")
-    parser.add_argument("--strategy", choices=["network", "service", "registry", "file", "all"], default="all")
+    parser.add_argument("--target", nargs="+", default=["127.0.0.1"],
+                        help="Target IPs, hostnames, CIDR blocks or @file (one per line)")
+    parser.add_argument("--strategy", choices=strategy_names() + ["all"], default="all")
+    parser.add_argument("--ports", default=None, help='Ports to scan: "21,445", "1-1024", "topN" (N <= 105) or "all"')
+    parser.add_argument("--port-timeout", type=float, default=None, help="Connect timeout per port (default PORT_SCAN_TIMEOUT)")
+    parser.add_argument("--port-retries", type=int, default=None, help="Retries per filtered port (default PORT_SCAN_RETRIES)")
+    parser.add_argument("--port-concurrency", type=int, default=None, help="Ports probed at once (default PORT_SCAN_CONCURRENCY)")
+    parser.add_argument("--sequential", action="store_true", help="Run strategies one after another")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max strategies running at once per host (default SCAN_CONCURRENCY)")
+    parser.add_argument("--max-hosts", type=int, default=None, help="Max hosts scanned at once (default FLEET_MAX_HOSTS)")
+    parser.add_argument("--max-targets", type=int, default=None, help="Max hosts after expanding targets (default MAX_TARGETS)")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-strategy timeout in seconds (default STRATEGY_TIMEOUT)")
+    parser.add_argument("--update-mitre", metavar="BUNDLE", default=None,
+                        help="Refresh the MITRE cache from a local STIX bundle and exit")
+    parser.add_argument("--monitor", metavar="PLAN", default=None,
+                        help="Daemon mode: re-scan the hosts of a JSON monitoring plan on adaptive intervals")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="Write a Chrome trace (chrome://tracing, Perfetto) of the scan to FILE")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run the scan under cProfile; stats are written next to the trace (.prof)")
+    parser.add_argument("--profile-top", type=int, default=25, help="Functions listed on stderr with --profile")
     
     args = parser.parse_args()
     
-    scanner = ContextScanner(args.target)
+    if args.update_mitre:
+        from app.core.mitre_mapper import MitreMapper
+        try:
+            summary = MitreMapper().update_cache_from_bundle(args.update_mitre)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+        print(json.dumps(summary, indent=2))
+        return
     
-    strategies = {
-        "network": NetworkScanStrategy(),
-        "service": ServiceConfigStrategy(),
-        "registry": RegistryAuditStrategy(),
-        "file": FileSystemStrategy()
-    }
+    if args.monitor:
+        return await run_monitor(args, parser)
+    
+    try:
+        targets = expand_targets(args.target, option(args.max_targets, "MAX_TARGETS"))
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
     
-    if args.strategy == "all":
-        for s in strategies.values():
-            scanner.add_strategy(s)
-    else:
-        scanner.add_strategy(strategies[args.strategy])
-        
-    results = await scanner.execute_scan()
-    print(json.dumps(results, indent=2))
+    if args.trace or args.profile:
+        return await run_traced(args, targets)
+    await run_scan(args, targets)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import logging
+from typing import Dict, Any, List, Optional, Callable, Set
+
+logger = logging.getLogger(__name__)
+
+Matcher = Callable[[Any], bool]
+
+def _members(values: List[Any]):
+    """Set for hashable members (O(1) lookups), list otherwise (e.g. [] as a value)"""
+    try:
+        return frozenset(values)
+    except TypeError:
+        return list(values)
+
+def _contains(members, value: Any) -> bool:
+    try:
+        return value in members
+    except TypeError:
+        # Unhashable value against a frozenset
+        return any(value == m for m in members)
+
+def compile_matcher(spec: Optional[Dict[str, Any]]) -> Matcher:
+    """
+    Compiles a matcher spec into a predicate once, so evaluating a rule is a
+    plain function call. Every operator in a spec must hold (logical AND).
+
+    Operators: equals, not_equals, in, not_in, contains, prefix, regex,
+    field (apply the rest of the spec to value[field]), any_value (match if
+    any value of a dict/list matches), all / any (lists of nested specs).
+    An empty or missing spec always matches.
+    """
+    if not spec:
+        return lambda value: True
+
+    spec = dict(spec)
+    field = spec.pop("field", None)
+    checks: List[Matcher] = []
+
+    for op, arg in spec.items():
+        if op == "equals":
+            checks.append(lambda v, a=arg: v == a)
+        elif op == "not_equals":
+            checks.append(lambda v, a=arg: v != a)
+        elif op == "in":
+            checks.append(lambda v, m=_members(arg): _contains(m, v))
+        elif op == "not_in":
+            checks.append(lambda v, m=_members(arg): not _contains(m, v))
+        elif op == "contains":
+            checks.append(lambda v, a=arg: isinstance(v, (str, list, dict)) and a in v)
+        elif op == "prefix":
+            checks.append(lambda v, a=arg: isinstance(v, str) and v.startswith(a))
+        elif op == "regex":
+            checks.append(lambda v, r=re.compile(arg): isinstance(v, str) and r.search(v) is not None)
+        elif op == "any_value":
+            inner = compile_matcher(arg)
+            checks.append(lambda v, m=inner: any(m(x) for x in (v.values() if isinstance(v, dict) else v if isinstance(v, list) else [])))
+        elif op == "all":
+            inner_all = [compile_matcher(s) for s in arg]
+            checks.append(lambda v, ms=inner_all: all(m(v) for m in ms))
+        elif op == "any":
+            inner_any = [compile_matcher(s) for s in arg]
+            checks.append(lambda v, ms=inner_any: any(m(v) for m in ms))
+        else:
+            raise ValueError(f"Unknown matcher operator: {op}")
+
+    def match(value: Any) -> bool:
+        if field is not None:
+            if not isinstance(value, dict) or field not in value:
+                return False
+            value = value[field]
+        return all(check(value) for check in checks)
+
+    return match
+
+class CompiledRule:
+    __slots__ = ("id", "finding", "within", "matcher", "risk", "mitre", "fix")
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.id = rule.get("id") or rule["finding"]
+        self.finding = rule["finding"]
+        # Report sections the finding key is nested in (e.g. "System_Config"); empty = top level
+        within = rule.get("within") or []
+        self.within = [within] if isinstance(within, str) else list(within)
+        self.matcher = compile_matcher(rule.get("match"))
+        self.risk = rule.get("risk")
+        self.mitre = rule.get("mitre")
+        self.fix = rule.get("fix")
+
+class CheckPack:
+    """
+    Declarative finding rules compiled into an index keyed by finding key.
+    Evaluating a report walks its keys once and only runs the rules indexed
+    under the keys it actually contains, however many rules are loaded.
+
+    Rule format (JSON, or YAML when PyYAML is installed):
+        {"id": "smbv1-enabled", "finding": "SMBv1_Status",
+         "match": {"in": ["Enabled"]}, "risk": "HIGH", "mitre": "T1210",
+         "fix": {"desc": "Disable SMBv1", "cmd": "Disable-WindowsOptionalFeature ..."},
+         "within": ["System_Config"]}
+    Rules without "risk" only map their finding key to a MITRE technique.
+    "within" names the report sections a nested finding key lives in, so MITRE
+    enrichment only descends into those (see MitreMapper.enrich_report).
+    """
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None):
+        self.index: Dict[str, List[CompiledRule]] = {}
+        self.technique_map: Dict[str, str] = {}
+        # Section keys that lead to mapped finding keys
+        self.containers: Set[str] = set()
+        self.rule_count = 0
+        for rule in rules or []:
+            self.add_rule(rule)
+
+    def add_rule(self, rule: Dict[str, Any]) -> None:
+        compiled = CompiledRule(rule)
+        self.index.setdefault(compiled.finding, []).append(compiled)
+        self.rule_count += 1
+        if compiled.mitre:
+            self.containers.update(compiled.within)
+            existing = self.technique_map.setdefault(compiled.finding, compiled.mitre)
+            if existing != compiled.mitre:
+                logger.warning(f"Rule {compiled.id} maps {compiled.finding} to {compiled.mitre}, keeping {existing}")
+
+    @classmethod
+    def from_files(cls, paths: List[str]) -> "CheckPack":
+        pack = cls()
+        for path in paths:
+            for rule in cls._read_rules(path):
+                pack.add_rule(rule)
+        logger.info(f"Loaded {pack.rule_count} check rules for {len(pack.index)} finding keys")
+        return pack
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "CheckPack":
+        """Loads every .json/.yaml/.yml pack in directory, in file name order"""
+        if not os.path.isdir(directory):
+            logger.error(f"Check pack directory not found: {directory}")
+            return cls()
+        names = sorted(n for n in os.listdir(directory) if n.endswith((".json", ".yaml", ".yml")))
+        return cls.from_files([os.path.join(directory, n) for n in names])
+
+    @staticmethod
+    def _read_rules(path: str) -> List[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                if path.endswith((".yaml", ".yml")):
+                    import yaml
+                    data = yaml.safe_load(f)
+                else:
+                    data = json.load(f)
+        except ImportError:
+            logger.error(f"PyYAML is not installed. Skipping check pack {path}.")
+            return []
+        except Exception as e:
+            logger.error(f"Error loading check pack {path}: {e}")
+            return []
+        # A pack is either a bare list of rules or {"name": ..., "rules": [...]}
+        return data.get("rules", []) if isinstance(data, dict) else data
+
+    @staticmethod
+    def _items(node: Any):
+        if isinstance(node, dict):
+            return iter(node.items())
+        return ((None, item) for item in node)
+
+    def evaluate(self, report: Any) -> List[Dict[str, Any]]:
+        """Returns the findings triggered anywhere in report, in document order"""
+        findings = []
+        if not isinstance(report, (dict, list)):
+            return findings
+        # Iterative pre-order walk: a stack of item iterators instead of recursion
+        stack = [self._items(report)]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                continue
+            key, value = item
+            if key == "mitre_techniques":
+                continue
+            rules = self.index.get(key, ()) if key is not None else ()
+            for rule in rules:
+                if rule.risk and rule.matcher(value):
+                    findings.append({
+                        "rule": rule.id,
+                        "finding": key,
+                        "risk": rule.risk,
+                        "mitre": rule.mitre,
+                        "fix": rule.fix
+                    })
+            if isinstance(value, (dict, list)):
+                stack.append(self._items(value))
+        return findings
+
+_packs: Dict[str, CheckPack] = {}
+
+def get_check_pack(directory: Optional[str] = None) -> CheckPack:
+    """Returns the pack for directory, compiled once per process"""
+    if directory is None:
+        from .config import settings
+        directory = settings.CHECKS_DIR
+    if directory not in _packs:
+        _packs[directory] = CheckPack.from_directory(directory)
+    return _packs[directory]
@@ -1,50 +1,47 @@
-from pydantic_settings import BaseSettings
-from pydantic import Field
-import os
-import secrets
-import string
-
-class Settings(BaseSettings):
-    PROJECT_NAME: str = "WinSecDefender"
-    VERSION: str = "2.1.0"
-    
-    # Paths
-    BASE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    ROOT_DIR: str = os.path.dirname(BASE_DIR)
-    SCRIPTS_DIR: str = os.path.join(ROOT_DIR, "scripts")
-    BIN_DIR: str = os.path.join(ROOT_DIR, "bin")
-    
-    # Logging
-    LOG_FILE: str = os.path.join(ROOT_DIR, "audit.log")
-    
-    # Security
-    # Default to "admin" if not set in .env
-    AUTH_USERNAME: str = Field(default="admin", env="WINSEC_ADMIN_USER")
-    # Default to None so we can detect if it's missing/default
-    AUTH_PASSWORD: str = Field(default="", env="WINSEC_ADMIN_PASSWORD")
-    
-    # SSL/TLS (Optional)
-    SSL_KEYFILE: str = ""
-    SSL_CERTFILE: str = ""
-    
-    # Scanner Settings
-    TARGET_IP: str = "127.0.0.1"
-    
-    class Config:
-        env_file = ".env"
-        extra = "ignore"
-
-settings = Settings()
-
-# Security Check: Generate random password if not set or default
-if not settings.AUTH_PASSWORD or settings.AUTH_PASSWORD == "admin123":
-    # Generate a strong random password
-    chars = string.ascii_letters + string.digits + "!@#$%"
-    generated_pwd = ''.join(secrets.choice(chars) for _ in range(16))
-    settings.AUTH_PASSWORD = generated_pwd
-    
-    print("\n" + "="*60)
-    print("WARNING: No secure password found in .env (WINSEC_ADMIN_PASSWORD).")
-    print(f"Generated Temporary Admin Password: {generated_pwd}")
-    print("PLEASE SAVE THIS PASSWORD OR CONFIGURE .env IMMEDIATELEY.")
-    print("="*60 + "\n")
+import threading
+from typing import Any
+
+class LazySettings:
+    """
+    Stands in for the Settings instance and builds it on first attribute access.
+    Importing pydantic-settings and reading .env costs more than a short CLI
+    scan, so modules can import `settings` freely and only code that actually
+    reads a value pays for it.
+    """
+    def __init__(self):
+        object.__setattr__(self, "_wrapped", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    @property
+    def loaded(self) -> bool:
+        return self._wrapped is not None
+
+    def _setup(self):
+        with self._lock:
+            if self._wrapped is None:
+                from .settings_model import load_settings
+                object.__setattr__(self, "_wrapped", load_settings())
+        return self._wrapped
+
+    def __getattr__(self, name: str) -> Any:
+        wrapped = self._wrapped if self._wrapped is not None else self._setup()
+        return getattr(wrapped, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._setup(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        # patch.object(settings, ...) deletes the attribute on exit when it was not set on the proxy
+        delattr(self._setup(), name)
+
+    def __repr__(self) -> str:
+        return repr(self._wrapped) if self._wrapped is not None else "<LazySettings (not loaded)>"
+
+settings = LazySettings()
+
+def __getattr__(name: str) -> Any:
+    # PEP 562: `from app.core.config import Settings` keeps working without importing pydantic up front
+    if name == "Settings":
+        from .settings_model import Settings
+        return Settings
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
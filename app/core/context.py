@@ -1,15 +1,55 @@
-from typing import List, Dict, Any, Type
+import asyncio
+import functools
+import ipaddress
+import socket
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from .interfaces import IScanStrategy
-from .strategies import NetworkScanStrategy, ServiceConfigStrategy, RegistryAuditStrategy, FileSystemStrategy
+from .result_cache import ResultCache
+from .metrics import STRATEGY_DURATION, STRATEGY_FAILURES, STRATEGY_CACHE_HITS
+from .tracing import span, mark
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Result of a local-only strategy (registry, services, files) for a host other than this one
+NOT_APPLICABLE = {"Status": "Not applicable", "Risk": "INFO",
+                  "Reason": "Audits the scanning machine; not applicable for remote target"}
+
+@functools.lru_cache(maxsize=1)
+def _local_names() -> frozenset:
+    names = {"localhost", socket.gethostname().lower(), socket.getfqdn().lower()}
+    try:
+        names.update(info[4][0] for info in socket.getaddrinfo(socket.gethostname(), None))
+    except OSError:
+        pass
+    return frozenset(names)
+
+def is_local_target(target: str) -> bool:
+    """True if target is this machine (loopback, its host name or one of its addresses)"""
+    target = target.strip().lower()
+    try:
+        if ipaddress.ip_address(target).is_loopback:
+            return True
+    except ValueError:
+        pass
+    return target in _local_names()
+
 class ContextScanner:
-    def __init__(self, target: str):
+    def __init__(self, target: str, concurrent: bool = False,
+                 max_concurrency: Optional[int] = None,
+                 strategy_timeout: Optional[float] = None,
+                 cache: Optional[ResultCache] = None, refresh: bool = False):
         self.target = target
         self.strategies: List[IScanStrategy] = []
         self.results: Dict[str, Any] = {}
+        # Concurrent mode runs every strategy at once (bounded by max_concurrency)
+        self.concurrent = concurrent
+        self.max_concurrency = max_concurrency
+        self.strategy_timeout = strategy_timeout
+        # Optional result cache; refresh=True bypasses reads but still stores new results
+        self.cache = cache
+        self.refresh = refresh
 
     def add_strategy(self, strategy: IScanStrategy):
         self.strategies.append(strategy)
@@ -18,15 +58,107 @@ class ContextScanner:
         """Replaces all strategies with a single one"""
         self.strategies = [strategy]
 
+    async def _run_strategy(self, strategy: IScanStrategy,
+                            semaphore: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+        if strategy.local_only and not is_local_target(self.target):
+            # It would report this machine's state under the remote host's name
+            return {strategy.__class__.__name__: dict(NOT_APPLICABLE)}
+        if semaphore is None:
+            return await self._run_cached(strategy)
+        async with semaphore:
+            return await self._run_cached(strategy)
+
+    async def _run_cached(self, strategy: IScanStrategy) -> Dict[str, Any]:
+        """Serves a fresh cached result if there is one, otherwise scans and caches"""
+        ttl = self.cache.ttl_for(strategy) if self.cache is not None else 0
+        if not ttl:
+            return await self._scan(strategy)
+
+        key = ResultCache.key_for(self.target, strategy)
+        try:
+            token = await strategy.change_token(self.target)
+        except Exception as e:
+            logger.warning(f"Change probe for {strategy.__class__.__name__} failed: {e}")
+            token = None
+
+        if not self.refresh:
+            cached = self.cache.get(key, ttl, token)
+            if cached is not None:
+                logger.info(f"Strategy {strategy.__class__.__name__} served from cache")
+                STRATEGY_CACHE_HITS.inc(strategy=strategy.__class__.__name__)
+                mark(f"cache-hit:{strategy.__class__.__name__}", cat="strategy")
+                return cached
+
+        result = await self._scan(strategy)
+        if not self._has_error(result):
+            self.cache.set(key, result, token)
+        return result
+
+    @staticmethod
+    def _has_error(result: Dict[str, Any]) -> bool:
+        if "error" in result:
+            return True
+        return any(isinstance(v, dict) and ("error" in v or v.get("Status") == "Error") for v in result.values())
+
+    async def _scan(self, strategy: IScanStrategy) -> Dict[str, Any]:
+        """Runs a single strategy, isolating its errors and enforcing the timeout"""
+        name = strategy.__class__.__name__
+        started = time.perf_counter()
+        try:
+            with span(f"strategy:{name}", cat="strategy", target=self.target):
+                result = await asyncio.wait_for(strategy.scan(self.target), timeout=self.strategy_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Strategy {name} timed out after {self.strategy_timeout}s")
+            STRATEGY_FAILURES.inc(strategy=name, reason="timeout")
+            return {name: {"error": f"Timed out after {self.strategy_timeout}s"}}
+        except Exception as e:
+            logger.error(f"Strategy {name} failed: {e}")
+            STRATEGY_FAILURES.inc(strategy=name, reason="exception")
+            return {name: {"error": str(e)}}
+        finally:
+            STRATEGY_DURATION.observe(time.perf_counter() - started, strategy=name)
+        if self._has_error(result):
+            STRATEGY_FAILURES.inc(strategy=name, reason="error")
+        return result
+
+    async def stream_scan(self) -> AsyncIterator[Tuple[IScanStrategy, Dict[str, Any]]]:
+        """Runs all strategies concurrently and yields (strategy, result) as each one finishes"""
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+
+        async def run(strategy: IScanStrategy):
+            return strategy, await self._run_strategy(strategy, semaphore)
+
+        tasks = [asyncio.ensure_future(run(s)) for s in self.strategies]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early: do not leave orphaned scans running
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
     async def execute_scan(self) -> Dict[str, Any]:
-        logger.info(f"Executing scan with {len(self.strategies)} strategies...")
+        with span("execute_scan", target=self.target, strategies=len(self.strategies)):
+            return await self._execute()
+
+    async def _execute(self) -> Dict[str, Any]:
+        mode = "concurrently" if self.concurrent else "sequentially"
+        logger.info(f"Executing scan with {len(self.strategies)} strategies {mode}...")
         self.results = {}
-        for strategy in self.strategies:
-            try:
-                result = await strategy.scan(self.target)
-                self.results.update(result)
-            except Exception as e:
-                logger.error(f"Strategy {strategy.__class__.__name__} failed: {e}")
-                self.results[strategy.__class__.__name__] = {"error": str(e)}
-        
+
+        if self.concurrent:
+            semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+            outcomes = await asyncio.gather(
+                *(self._run_strategy(s, semaphore) for s in self.strategies)
+            )
+        else:
+            outcomes = []
+            for strategy in self.strategies:
+                outcomes.append(await self._run_strategy(strategy))
+
+        # Merge in registration order so the report does not depend on completion order
+        for result in outcomes:
+            self.results.update(result)
+
         return self.results
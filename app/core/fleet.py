@@ -0,0 +1,94 @@
+import asyncio
+import ipaddress
+import logging
+import os
+from typing import Dict, Any, List, Iterable, Callable, Awaitable, AsyncIterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+def expand_targets(specs: Iterable[str], max_targets: int = 65536, allow_files: bool = True) -> List[str]:
+    """
+    Expands target specs into a de-duplicated, ordered list of hosts.
+    A spec may be an IP or hostname, a CIDR block ("10.0.0.0/24"), a
+    comma-separated list of those, or a file ("@hosts.txt" or an existing path)
+    with one spec per line ("#" starts a comment). Files are only read when
+    allow_files is set, so untrusted input cannot make us open local paths.
+    """
+    targets: List[str] = []
+    seen = set()
+
+    def add(host: str):
+        if host not in seen:
+            if len(targets) >= max_targets:
+                raise ValueError(f"Too many targets (limit {max_targets})")
+            seen.add(host)
+            targets.append(host)
+
+    def expand(spec: str):
+        spec = spec.strip()
+        if not spec or spec.startswith("#"):
+            return
+        if allow_files and (spec.startswith("@") or os.path.isfile(spec)):
+            path = spec[1:] if spec.startswith("@") else spec
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    expand(line.split("#", 1)[0])
+        elif "," in spec:
+            for part in spec.split(","):
+                expand(part)
+        elif "/" in spec:
+            network = ipaddress.ip_network(spec, strict=False)
+            if network.num_addresses > max_targets:
+                raise ValueError(f"CIDR block {spec} exceeds the target limit ({max_targets})")
+            # /31, /32 (and IPv6 equivalents) have no network/broadcast to skip
+            hosts = network if network.num_addresses <= 2 else network.hosts()
+            for ip in hosts:
+                add(str(ip))
+        elif spec.startswith("@"):
+            raise ValueError(f"Target files are not allowed here: {spec}")
+        else:
+            add(spec)
+
+    for spec in specs:
+        expand(spec)
+    return targets
+
+class FleetScanner:
+    """
+    Fans a per-host scan out over many targets.
+    At most max_hosts scans run at once (the global cap); the per-host cap is
+    whatever concurrency the scan_host coroutine applies to its own strategies.
+    """
+    def __init__(self, scan_host: Callable[[str], Awaitable[Dict[str, Any]]], max_hosts: int = 16):
+        self.scan_host = scan_host
+        self.max_hosts = max(1, max_hosts)
+
+    async def _scan_one(self, target: str) -> Dict[str, Any]:
+        try:
+            return await self.scan_host(target)
+        except Exception as e:
+            logger.error(f"Scan of {target} failed: {e}")
+            return {"error": str(e)}
+
+    async def stream(self, targets: List[str]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yields (target, result) for each host as soon as its scan finishes"""
+        finished: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue()
+        pending = iter(targets)
+
+        async def worker():
+            for target in pending:
+                await finished.put((target, await self._scan_one(target)))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.max_hosts, len(targets)))]
+        try:
+            for _ in range(len(targets)):
+                yield await finished.get()
+        finally:
+            for w in workers:
+                if not w.done():
+                    w.cancel()
+
+    async def run(self, targets: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Scans every target and returns results keyed by target, in input order"""
+        results = {target: result async for target, result in self.stream(targets)}
+        return {target: results[target] for target in targets}
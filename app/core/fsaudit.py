@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import stat
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Mode bits only mean something on POSIX; on Windows os.stat fakes them from the read-only flag
+POSIX_MODES = os.name != "nt"
+
+if not POSIX_MODES:
+    import ctypes
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _CreateFileW = _kernel32.CreateFileW
+    _CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                             wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+    _CreateFileW.restype = wintypes.HANDLE
+    _CloseHandle = _kernel32.CloseHandle
+    _INVALID_HANDLE = wintypes.HANDLE(-1).value
+    # FILE_WRITE_DATA is FILE_ADD_FILE on a directory; sharing everything avoids false negatives
+    _FILE_WRITE_DATA = 0x0002
+    _FILE_SHARE_ALL = 0x0001 | 0x0002 | 0x0004
+    _OPEN_EXISTING = 3
+    _FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+
+def is_writable(path: str, is_dir: bool = False) -> bool:
+    """Whether this account may write path (add entries to it, for a directory)"""
+    if POSIX_MODES:
+        return os.access(path, os.W_OK)
+    # os.access only looks at the read-only attribute on Windows. Asking for write access
+    # makes the kernel check the ACL; nothing is written. Directories need backup semantics to open
+    handle = _CreateFileW(path, _FILE_WRITE_DATA, _FILE_SHARE_ALL, None, _OPEN_EXISTING,
+                          _FILE_FLAG_BACKUP_SEMANTICS if is_dir else 0, None)
+    if handle == _INVALID_HANDLE:
+        return False
+    _CloseHandle(handle)
+    return True
+
+def classify_mode(path: str, mode: int) -> Optional[Dict[str, Any]]:
+    """Finding for a risky entry (world-writable, setuid/setgid), or None"""
+    if not POSIX_MODES:
+        return None
+    if stat.S_ISREG(mode) and mode & stat.S_ISUID:
+        return {"Status": "SetUID", "Risk": "HIGH", "Path": path, "Mode": oct(stat.S_IMODE(mode))}
+    if stat.S_ISREG(mode) and mode & stat.S_ISGID:
+        return {"Status": "SetGID", "Risk": "MEDIUM", "Path": path, "Mode": oct(stat.S_IMODE(mode))}
+    if mode & stat.S_IWOTH:
+        # Sticky world-writable directories (e.g. /tmp) are the expected setup
+        if stat.S_ISDIR(mode) and mode & stat.S_ISVTX:
+            return None
+        return {"Status": "World-Writable", "Risk": "HIGH", "Path": path, "Mode": oct(stat.S_IMODE(mode))}
+    return None
+
+def check_path(path: str) -> Dict[str, Any]:
+    """Status of one critical path: Missing, Writable (by this account), a risky mode, or Secure"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {"Status": "Missing", "Risk": "UNKNOWN", "Path": path}
+    except OSError as e:
+        return {"Status": f"Error: {e.strerror}", "Risk": "UNKNOWN", "Path": path}
+    risky = classify_mode(path, st.st_mode)
+    if risky:
+        return risky
+    if is_writable(path, stat.S_ISDIR(st.st_mode)):
+        return {"Status": "Writable", "Risk": "HIGH", "Path": path}
+    return {"Status": "Secure", "Risk": "LOW", "Path": path}
+
+class _DirState:
+    __slots__ = ("signature", "scanned_at", "findings", "subdirs")
+
+    def __init__(self, signature: Tuple[int, int], scanned_at: float,
+                 findings: List[Dict[str, Any]], subdirs: List[str]):
+        self.signature = signature
+        self.scanned_at = scanned_at
+        self.findings = findings
+        self.subdirs = subdirs
+
+class FileSystemAuditor:
+    """
+    Walks directory trees with os.scandir on a thread pool, one directory per
+    task, and yields risky entries as directories finish. Only findings and
+    subdirectory names are kept per directory, never full listings.
+
+    Incremental runs: a directory whose mtime/ctime are unchanged since the
+    previous run (and was scanned less than rescan_after seconds ago) reuses
+    its findings and subdirectory list without being listed again, so an
+    unchanged tree costs one stat per directory. Mode changes on files do
+    not touch the parent's mtime; rescan_after bounds how long they can go
+    unnoticed. State for subdirectories that disappear, and for roots no
+    longer audited, is dropped so the cache follows the live tree.
+
+    Entries this account can write are reported as "Writable" (an ACL check
+    on Windows, where mode bits say nothing). check_writable defaults to off
+    for root on POSIX, who can write everything.
+    """
+    def __init__(self, max_workers: Optional[int] = None, max_entries: int = 1_000_000,
+                 max_findings: int = 500, rescan_after: float = 3600.0,
+                 check_writable: Optional[bool] = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        if check_writable is None:
+            check_writable = not (POSIX_MODES and os.geteuid() == 0)
+        self.check_writable = check_writable
+        self.max_entries = max_entries
+        self.max_findings = max_findings
+        self.rescan_after = rescan_after
+        self._dirs: Dict[str, _DirState] = {}
+
+    def _forget(self, path: str) -> None:
+        """Drops the cached state of path and of every directory cached below it"""
+        stack = [path]
+        while stack:
+            state = self._dirs.pop(stack.pop(), None)
+            if state is not None:
+                stack.extend(state.subdirs)
+
+    def _retain_roots(self, roots: Iterable[str]) -> None:
+        """Drops the cached state of directories outside roots (e.g. paths removed from the config)"""
+        roots = set(roots)
+        prefixes = tuple(os.path.join(root, "") for root in roots)
+        for path in list(self._dirs):
+            if path not in roots and not path.startswith(prefixes):
+                self._dirs.pop(path, None)
+
+    def _scan_dir(self, path: str) -> Tuple[List[Dict[str, Any]], List[str], int, bool]:
+        """(findings, subdirs, entries listed, reused) for one directory; runs in a worker thread"""
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            self._forget(path)
+            return [], [], 0, False
+        signature = (st.st_mtime_ns, st.st_ctime_ns)
+        cached = self._dirs.get(path)
+        if cached and cached.signature == signature and time.time() - cached.scanned_at < self.rescan_after:
+            return cached.findings, cached.subdirs, 0, True
+
+        findings: List[Dict[str, Any]] = []
+        subdirs: List[str] = []
+        count = 0
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    count += 1
+                    try:
+                        # Symlinks are neither followed nor reported (their mode is always 777)
+                        if entry.is_symlink():
+                            continue
+                        mode = entry.stat(follow_symlinks=False).st_mode
+                    except OSError:
+                        continue
+                    is_dir = stat.S_ISDIR(mode)
+                    if is_dir:
+                        subdirs.append(entry.path)
+                    finding = classify_mode(entry.path, mode)
+                    if finding is None and self.check_writable and is_writable(entry.path, is_dir):
+                        finding = {"Status": "Writable", "Risk": "HIGH", "Path": entry.path}
+                    if finding:
+                        findings.append(finding)
+        except OSError as e:
+            logger.debug(f"Cannot list {path}: {e}")
+            self._forget(path)
+            return [], [], count, False
+        if cached is not None:
+            for gone in set(cached.subdirs).difference(subdirs):
+                self._forget(gone)
+        self._dirs[path] = _DirState(signature, time.time(), findings, subdirs)
+        return findings, subdirs, count, False
+
+    @staticmethod
+    def new_stats() -> Dict[str, Any]:
+        return {"Directories": 0, "Entries": 0, "Reused": 0, "Findings": 0, "Truncated": False}
+
+    async def walk(self, root: str, stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yields risky entries under root as each directory is scanned"""
+        loop = asyncio.get_running_loop()
+        stats = stats if stats is not None else self.new_stats()
+        pending = deque([root])
+        running = set()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fsaudit")
+        try:
+            while pending or running:
+                # A couple of directories queued per thread keeps every worker busy
+                while pending and len(running) < self.max_workers * 2:
+                    running.add(loop.run_in_executor(executor, self._scan_dir, pending.popleft()))
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    findings, subdirs, count, reused = future.result()
+                    stats["Directories"] += 1
+                    stats["Entries"] += count
+                    stats["Reused"] += int(reused)
+                    pending.extend(subdirs)
+                    for finding in findings:
+                        if stats["Findings"] >= self.max_findings:
+                            stats["Truncated"] = True
+                            break
+                        stats["Findings"] += 1
+                        yield finding
+                if stats["Truncated"] or stats["Entries"] >= self.max_entries:
+                    stats["Truncated"] = True
+                    logger.warning(f"File system audit of {root} stopped early: {stats}")
+                    return
+        finally:
+            for future in running:
+                future.cancel()
+            # Do not block the event loop on directories still being listed
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def audit(self, paths: Dict[str, str],
+                    stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields (label, finding) for each configured path and, for directories,
+        for every risky entry found under them (labelled by its own path).
+        """
+        loop = asyncio.get_running_loop()
+        stats = stats if stats is not None else self.new_stats()
+        self._retain_roots(paths.values())
+        for label, path in paths.items():
+            # os.stat/os.access can block on network drives: keep them off the event loop
+            yield label, await loop.run_in_executor(None, check_path, path)
+            if os.path.isdir(path):
+                async for finding in self.walk(path, stats):
+                    yield finding["Path"], finding
+
+_default_auditor: Optional[FileSystemAuditor] = None
+
+def get_fs_auditor() -> FileSystemAuditor:
+    """Process-wide auditor, so incremental state carries over between scans"""
+    global _default_auditor
+    if _default_auditor is None:
+        from .config import settings
+        _default_auditor = FileSystemAuditor(
+            max_workers=settings.FS_AUDIT_WORKERS or None,
+            max_entries=settings.FS_AUDIT_MAX_ENTRIES,
+            max_findings=settings.FS_AUDIT_MAX_FINDINGS,
+            rescan_after=settings.FS_AUDIT_RESCAN_AFTER
+        )
+    return _default_auditor
@@ -0,0 +1,214 @@
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _compress(result: Dict[str, Any]) -> bytes:
+    return gzip.compress(json.dumps(result, default=str, separators=(",", ":")).encode("utf-8"))
+
+def _decompress(blob: bytes) -> Dict[str, Any]:
+    return json.loads(gzip.decompress(blob).decode("utf-8"))
+
+def _module_set(result: Dict[str, Any]) -> Optional[str]:
+    # Sorted so the same selection in any order compares equal; None for results that predate it
+    modules = result.get("modules")
+    return ",".join(sorted(modules)) if modules is not None else None
+
+# Module (report key) that produces each host result section
+SECTION_MODULES = {"network": "Network_Scan", "registry_baseline": "UAC_Check"}
+
+def finding_index(result: Dict[str, Any], modules: Optional[Set[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Flattens a host result into comparable entries keyed by a stable identity:
+    check pack findings ("finding:<rule>"), open ports ("port:<n>") and
+    registry baseline checks ("registry:<name>"). With modules, only entries
+    produced by those modules are included.
+    """
+    def covered(module: Optional[str]) -> bool:
+        return modules is None or module is None or module in modules
+
+    index: Dict[str, Dict[str, Any]] = {}
+    for finding in result.get("findings") or []:
+        if not covered(finding.get("module")):
+            continue
+        key = f"finding:{finding.get('rule')}"
+        # The same rule can fire more than once in a report
+        n = 2
+        while key in index:
+            key = f"finding:{finding.get('rule')}#{n}"
+            n += 1
+        index[key] = finding
+    network = result.get("network") if covered(SECTION_MODULES["network"]) else None
+    if isinstance(network, list):
+        for entry in network:
+            if isinstance(entry, dict) and "port" in entry:
+                index[f"port:{entry['port']}"] = entry
+    baseline = result.get("registry_baseline") if covered(SECTION_MODULES["registry_baseline"]) else None
+    if isinstance(baseline, dict):
+        for name, entry in baseline.items():
+            index[f"registry:{name}"] = entry
+    return index
+
+def diff_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Entries that are new, resolved or changed between two host results.
+    Modules only one of them scanned are left out: a module a partial
+    (monitor) run skipped has not resolved anything.
+    """
+    modules = None
+    if baseline.get("modules") is not None and current.get("modules") is not None:
+        modules = set(baseline["modules"]) & set(current["modules"])
+    before, after = finding_index(baseline, modules), finding_index(current, modules)
+    return {
+        "new": [{"key": k, "after": v} for k, v in after.items() if k not in before],
+        "resolved": [{"key": k, "before": v} for k, v in before.items() if k not in after],
+        "changed": [{"key": k, "before": before[k], "after": v}
+                    for k, v in after.items() if k in before and before[k] != v],
+        "unchanged": sum(1 for k, v in after.items() if k in before and before[k] == v),
+    }
+
+class ScanHistory:
+    """
+    Append-only history of host scan results in SQLite. Results are stored as
+    gzip-compressed JSON and indexed by (host, scanned_at), so listing a host's
+    runs or picking a baseline never decompresses anything. Only the newest
+    max_per_host runs of each host are kept. Each run records the modules it
+    covered, so a default diff compares runs of the same module set.
+    """
+    def __init__(self, path: str, max_per_host: int = 500):
+        self.path = path
+        self.max_per_host = max_per_host
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use so importing the API does not create the file
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10.0)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS scans ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT NOT NULL, scanned_at REAL NOT NULL, "
+                    "job_id TEXT, username TEXT, vulnerable INTEGER, findings INTEGER, data BLOB NOT NULL, "
+                    "modules TEXT)"
+                )
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(scans)")}
+                if "modules" not in columns:
+                    # Histories written before module sets were recorded
+                    conn.execute("ALTER TABLE scans ADD COLUMN modules TEXT")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_scans_host_time ON scans(host, scanned_at)")
+            self._conn = conn
+            logger.debug(f"Scan history opened at {self.path}")
+        return self._conn
+
+    def record(self, host: str, result: Dict[str, Any], job_id: Optional[str] = None,
+               username: Optional[str] = None, scanned_at: Optional[float] = None) -> int:
+        """Appends a host result and returns its history id"""
+        scanned_at = time.time() if scanned_at is None else scanned_at
+        blob = _compress(result)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO scans (host, scanned_at, job_id, username, vulnerable, findings, data, modules) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (host, scanned_at, job_id, username, int(bool(result.get("vulnerable"))),
+                     len(result.get("findings") or []), blob, _module_set(result))
+                )
+                conn.execute(
+                    "DELETE FROM scans WHERE host = ? AND id IN "
+                    "(SELECT id FROM scans WHERE host = ? ORDER BY scanned_at DESC LIMIT -1 OFFSET ?)",
+                    (host, host, self.max_per_host)
+                )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _meta(row: Tuple) -> Dict[str, Any]:
+        return {"id": row[0], "host": row[1], "scanned_at": row[2], "job_id": row[3],
+                "username": row[4], "vulnerable": bool(row[5]), "findings": row[6],
+                "modules": row[7].split(",") if row[7] is not None else None}
+
+    def runs(self, host: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Run metadata, newest first"""
+        clauses, params = [], []
+        if host is not None:
+            clauses.append("host = ?")
+            params.append(host)
+        if since is not None:
+            clauses.append("scanned_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("scanned_at <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, host, scanned_at, job_id, username, vulnerable, findings, modules FROM scans "
+                f"{where}ORDER BY scanned_at DESC, id DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [self._meta(row) for row in rows]
+
+    def get(self, scan_id: int) -> Optional[Dict[str, Any]]:
+        """Metadata plus the decompressed result of one run"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT id, host, scanned_at, job_id, username, vulnerable, findings, modules, data "
+                "FROM scans WHERE id = ?",
+                (scan_id,)
+            ).fetchone()
+        if not row:
+            return None
+        entry = self._meta(row)
+        entry["result"] = _decompress(row[8])
+        return entry
+
+    def _latest_id(self, host: str, before: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        query = "SELECT id FROM scans WHERE host = ? "
+        params: List[Any] = [host]
+        if before is not None:
+            # The previous run of the same module set
+            query += "AND (scanned_at < ? OR (scanned_at = ? AND id < ?)) AND modules IS ? "
+            modules = before["modules"]
+            params += [before["scanned_at"], before["scanned_at"], before["id"],
+                       ",".join(modules) if modules is not None else None]
+        with self._lock:
+            row = self._connection().execute(query + "ORDER BY scanned_at DESC, id DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def diff(self, host: str, baseline_id: Optional[int] = None,
+             current_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Compares two runs of host: by default the latest run against the
+        previous run of the same module set. Returns None when there are not
+        two runs to compare.
+        """
+        current_id = current_id or self._latest_id(host)
+        current = self.get(current_id) if current_id else None
+        if current is None or current["host"] != host:
+            return None
+        baseline_id = baseline_id or self._latest_id(host, before=current)
+        baseline = self.get(baseline_id) if baseline_id else None
+        if baseline is None or baseline["host"] != host:
+            return None
+
+        changes = diff_results(baseline.pop("result"), current.pop("result"))
+        return {"host": host, "baseline": baseline, "current": current, **changes}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM scans").fetchone()[0]
+
+def create_history() -> Optional[ScanHistory]:
+    """History store configured in settings, or None when disabled"""
+    from .config import settings
+    if not settings.HISTORY_ENABLED:
+        return None
+    return ScanHistory(settings.HISTORY_PATH, settings.HISTORY_MAX_PER_HOST)
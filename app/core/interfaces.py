@@ -1,10 +1,62 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 class IScanStrategy(ABC):
+    # Seconds a result may be served from the result cache (0 = never cached)
+    cache_ttl: float = 0
+    # Audits the machine the scanner runs on and ignores the target (registry, services, files)
+    local_only: bool = False
+
     @abstractmethod
     async def scan(self, target: str) -> Dict[str, Any]:
         """
         Executes the scan strategy on the given target.
         """
         pass
+
+    def cache_params(self) -> Tuple:
+        """
+        Parameters that make two instances produce different results (part of the cache key).
+        """
+        return ()
+
+    async def change_token(self, target: str) -> Optional[str]:
+        """
+        Cheap probe for "has anything changed": a token that differs whenever a
+        cached result would be stale. None means no probe is available.
+        """
+        return None
+
+class IJobStore(ABC):
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the job with the given ID, or None if missing or expired.
+        """
+        pass
+
+    @abstractmethod
+    def set(self, job_id: str, job: Dict[str, Any]) -> None:
+        """
+        Creates or replaces a job, evicting expired and excess entries.
+        """
+        pass
+
+    @abstractmethod
+    def latest(self, username: str, status: str = "completed", kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the most recently updated job of a user with the given status,
+        optionally only of one kind ("host" unless the job says otherwise, e.g. "fleet").
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def __setitem__(self, job_id: str, job: Dict[str, Any]) -> None:
+        self.set(job_id, job)
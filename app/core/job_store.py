@@ -0,0 +1,162 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from .interfaces import IJobStore
+
+logger = logging.getLogger(__name__)
+
+# Jobs without a "kind" are single-host scans
+DEFAULT_KIND = "host"
+
+class MemoryJobStore(IJobStore):
+    """
+    Bounded in-process store. Entries are kept in update order so the least
+    recently updated job is evicted first, and expire ttl seconds after
+    their last update.
+    """
+    def __init__(self, ttl: float = 86400, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._jobs: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # (username, status, kind or None for any) -> job_id of the latest matching job
+        self._latest: Dict[Tuple[str, str, Optional[str]], str] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._jobs:
+            job_id, (updated_at, _) = next(iter(self._jobs.items()))
+            if len(self._jobs) <= self.max_entries and now - updated_at <= self.ttl:
+                break
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._jobs.get(job_id)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def set(self, job_id: str, job: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = (now, job)
+            self._jobs.move_to_end(job_id)
+            if job.get("username") and job.get("status"):
+                self._latest[(job["username"], job["status"], None)] = job_id
+                self._latest[(job["username"], job["status"], job.get("kind", DEFAULT_KIND))] = job_id
+            self._evict(now)
+
+    def latest(self, username: str, status: str = "completed", kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        key = (username, status, kind)
+        job_id = self._latest.get(key)
+        if job_id is None:
+            return None
+        job = self.get(job_id)
+        if job is not None and job.get("status") == status:
+            return job
+        # The indexed job expired or moved on to another status since: fall back to the newest live match
+        now = time.time()
+        with self._lock:
+            for candidate_id, (updated_at, candidate) in reversed(self._jobs.items()):
+                if now - updated_at > self.ttl:
+                    break
+                if (candidate.get("username") == username and candidate.get("status") == status
+                        and (kind is None or candidate.get("kind", DEFAULT_KIND) == kind)):
+                    self._latest[key] = candidate_id
+                    return candidate
+            del self._latest[key]
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._jobs.clear()
+            self._latest.clear()
+
+    def __len__(self) -> int:
+        # Expired jobs are not served, so they are not counted either
+        with self._lock:
+            self._evict(time.time())
+            return len(self._jobs)
+
+class SQLiteJobStore(IJobStore):
+    """
+    Local SQLite store in WAL mode, shared by every worker process on the host.
+    Lookups go through the primary key; eviction uses the updated_at index.
+    """
+    def __init__(self, path: str, ttl: float = 86400, max_entries: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, username TEXT, status TEXT, "
+                "updated_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(username, status, updated_at)")
+        logger.debug(f"Job store opened at {path}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ? AND updated_at >= ?",
+                (job_id, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, job_id: str, job: Dict[str, Any]) -> None:
+        now = time.time()
+        data = json.dumps(job, default=str)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, username, status, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                (job_id, job.get("username"), job.get("status"), now, data)
+            )
+            self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM jobs WHERE job_id IN "
+                "(SELECT job_id FROM jobs ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def latest(self, username: str, status: str = "completed", kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            # Newest first through idx_jobs_user; the kind check decodes only the rows it passes over
+            rows = self._conn.execute(
+                "SELECT data FROM jobs WHERE username = ? AND status = ? AND updated_at >= ? "
+                "ORDER BY updated_at DESC",
+                (username, status, time.time() - self.ttl)
+            )
+            for (data,) in rows:
+                job = json.loads(data)
+                if kind is None or job.get("kind", DEFAULT_KIND) == kind:
+                    return job
+        return None
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE updated_at >= ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+
+def create_job_store(backend: Optional[str] = None) -> IJobStore:
+    """Builds the job store configured in settings"""
+    from .config import settings
+    backend = backend or settings.JOB_STORE_BACKEND
+    if backend == "sqlite":
+        return SQLiteJobStore(settings.JOB_STORE_PATH, settings.JOB_TTL_SECONDS, settings.JOB_MAX_ENTRIES)
+    if backend != "memory":
+        logger.warning(f"Unknown job store backend '{backend}', using memory")
+    return MemoryJobStore(settings.JOB_TTL_SECONDS, settings.JOB_MAX_ENTRIES)
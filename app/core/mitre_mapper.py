@@ -1,12 +1,205 @@
 import os
 import json
 import logging
-from typing import Dict, Any, Optional
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import ENRICH_DURATION
 
 logger = logging.getLogger(__name__)
 
+_OBJECTS_ARRAY = re.compile(r'"objects"\s*:\s*\[')
+
+def iter_stix_objects(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the objects of a STIX 2 bundle one at a time, reading the file in
+    chunks, so a bundle never has to be held in memory as a whole.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ""
+        eof = False
+
+        def fill() -> None:
+            nonlocal buf, eof
+            chunk = f.read(chunk_size)
+            if chunk:
+                buf += chunk
+            else:
+                eof = True
+
+        while True:
+            match = _OBJECTS_ARRAY.search(buf)
+            if match:
+                buf = buf[match.end():]
+                break
+            if eof:
+                raise ValueError(f"{path} is not a STIX bundle (no objects array)")
+            fill()
+
+        while True:
+            buf = buf.lstrip(" \t\r\n,")
+            if not buf:
+                if eof:
+                    raise ValueError(f"Truncated STIX bundle: {path}")
+                fill()
+                continue
+            if buf[0] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            buf = buf[end:]
+            yield obj
+
+def _parse_stix_time(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _is_newer(modified: Optional[str], cached: Optional[str]) -> bool:
+    """True when modified is later than cached (a missing cached timestamp counts as older)"""
+    if not cached:
+        return True
+    if not modified:
+        return False
+    new, old = _parse_stix_time(modified), _parse_stix_time(cached)
+    if new is None or old is None:
+        return modified > cached
+    return new > old
+
+class TechniqueIndex:
+    """
+    Compact SQLite index of a MITRE technique cache file, keyed by technique ID.
+    The JSON cache stays the source of truth; the index is rebuilt from it once
+    whenever the file changes, and lookups then read single rows. Looked-up
+    records (descriptions included) are memoised, so only the techniques a
+    scan actually maps are ever loaded into memory.
+    """
+    COLUMNS = ("id", "name", "description", "url", "deprecated", "revoked")
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self.path = os.path.splitext(cache_file)[0] + ".idx.db"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._source: Optional[Tuple[int, int]] = None
+        self._records: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.cache_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _connect(self) -> sqlite3.Connection:
+        try:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open MITRE index {self.path} ({e}), using an in-memory index")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS techniques (id TEXT PRIMARY KEY, name TEXT, "
+                "description TEXT, url TEXT, deprecated INTEGER, revoked INTEGER)"
+            )
+        return conn
+
+    def _rebuild(self, signature: Tuple[int, int]) -> None:
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading MITRE cache: {e}")
+            data = {}
+        rows = [
+            (tid, t.get("name"), t.get("description"), t.get("url"),
+             int(bool(t.get("deprecated"))), int(bool(t.get("revoked"))))
+            for tid, t in data.items() if isinstance(t, dict)
+        ]
+        with self._conn:
+            self._conn.execute("DELETE FROM techniques")
+            self._conn.executemany("INSERT OR REPLACE INTO techniques VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (json.dumps(signature),))
+        logger.info(f"Indexed {len(rows)} MITRE techniques from {self.cache_file}")
+
+    def refresh(self) -> None:
+        """Re-indexes the cache file if it changed since it was last indexed (one stat call otherwise)"""
+        signature = self._signature()
+        with self._lock:
+            if signature == self._source and self._conn is not None:
+                return
+            self._records.clear()
+            if signature is None:
+                logger.info(f"MITRE cache {self.cache_file} not found. Call update_cache() to create it.")
+                self._source = None
+                if self._conn is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM techniques")
+                return
+            if self._conn is None:
+                self._conn = self._connect()
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+            # Another process may already have indexed this exact file
+            if not row or tuple(json.loads(row[0])) != signature:
+                self._rebuild(signature)
+            self._source = signature
+
+    def get(self, technique_id: str, default: Any = None) -> Optional[Dict[str, Any]]:
+        if technique_id in self._records:
+            record = self._records[technique_id]
+            return record if record is not None else default
+        with self._lock:
+            row = None
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT id, name, description, url, deprecated, revoked FROM techniques WHERE id = ?",
+                    (technique_id,)
+                ).fetchone()
+            record = None
+            if row:
+                record = dict(zip(self.COLUMNS, row))
+                record["deprecated"] = bool(record["deprecated"])
+                record["revoked"] = bool(record["revoked"])
+            self._records[technique_id] = record
+        return record if record is not None else default
+
+    def __contains__(self, technique_id: str) -> bool:
+        return self.get(technique_id) is not None
+
+    def __len__(self) -> int:
+        if self._conn is None:
+            return 0
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM techniques").fetchone()[0]
+
+_indexes: Dict[str, TechniqueIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_technique_index(cache_file: str) -> TechniqueIndex:
+    """One index per cache file, shared by every mapper in the process"""
+    path = os.path.abspath(cache_file)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = TechniqueIndex(path)
+        return _indexes[path]
+
 class MitreMapper:
-    # Static mapping from scanner findings to MITRE ATT&CK technique IDs
+    # Default mapping from scanner findings to MITRE ATT&CK technique IDs,
+    # used when no check pack mapping is supplied (see app/core/checkpack.py)
     FINDING_TO_TECHNIQUE = {
         "SMBv1_Status": "T1210",
         "Unquoted_Services": "T1574.009",
@@ -15,32 +208,153 @@ class MitreMapper:
         "Network_Scan": "T1046" # Adding Network scanning to discovery
     }
 
-    def __init__(self, cache_file: str = "mitre_cache.json"):
+    # Sections of a host report that hold mapped finding keys (check packs declare theirs with "within")
+    FINDING_CONTAINERS = frozenset({"System_Config"})
+    # Keys whose children are whole host reports (fleet results)
+    REPORT_COLLECTIONS = frozenset({"hosts"})
+
+    def __init__(self, cache_file: str = "mitre_cache.json", technique_map: Optional[Dict[str, str]] = None,
+                 containers: Optional[Iterable[str]] = None):
         self.cache_file = cache_file
-        self.cache: Dict[str, Any] = {}
-        self.load_cache()
+        self.technique_map = technique_map if technique_map is not None else self.FINDING_TO_TECHNIQUE
+        self.containers = frozenset(containers) if containers is not None else self.FINDING_CONTAINERS
+        # Dictionaries examined by the last enrich_report call
+        self.visited = 0
+        # Shared, lazily opened index: building a mapper costs nothing
+        self._index = get_technique_index(cache_file)
+        self._checked = False
+
+    @property
+    def cache(self) -> TechniqueIndex:
+        if not self._checked:
+            self.load_cache()
+        return self._index
 
     def load_cache(self) -> None:
-        """Loads the MITRE technique cache from disk if it exists."""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.cache = json.load(f)
-                logger.debug(f"Loaded MITRE cache from {self.cache_file}")
-            except Exception as e:
-                logger.error(f"Error loading MITRE cache: {e}")
-                self.cache = {}
-        else:
-            logger.info(f"MITRE cache {self.cache_file} not found. Call update_cache() to create it.")
-
-    def save_cache(self) -> None:
-        """Saves the current cache to disk."""
+        """Makes sure the technique index reflects the cache file on disk."""
+        self._index.refresh()
+        self._checked = True
+
+    def _read_cache_file(self) -> Dict[str, Any]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading MITRE cache: {e}")
+            return {}
+
+    def save_cache(self, techniques: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Saves techniques (default: the current cache file) and re-indexes it.
+        Written to a temporary file and renamed over the cache, so readers
+        never see a partial file.
+        """
+        if techniques is None:
+            techniques = self._read_cache_file()
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".mitre_cache.", suffix=".tmp")
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, indent=4)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(techniques, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.cache_file)
             logger.info(f"Saved MITRE cache to {self.cache_file}")
         except Exception as e:
             logger.error(f"Error saving MITRE cache: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.load_cache()
+
+    @staticmethod
+    def _technique_record(obj: Any) -> Optional[Dict[str, Any]]:
+        """Cache record for a STIX attack-pattern, or None if it has no ATT&CK ID"""
+        mitre_id = None
+        url = None
+        # STIX 2 objects have external_references
+        for ref in obj.get('external_references', []):
+            if ref.get('source_name') == 'mitre-attack':
+                mitre_id = ref.get('external_id')
+                url = ref.get('url')
+                break
+        if not mitre_id:
+            return None
+        modified = obj.get('modified')
+        return {
+            "id": mitre_id,
+            "name": obj.get('name', 'Unknown'),
+            "description": obj.get('description', 'No description available'),
+            "url": url,
+            "deprecated": bool(obj.get('x_mitre_deprecated', False)),
+            "revoked": bool(obj.get('revoked', False)),
+            "stix_id": obj.get('id'),
+            "modified": str(modified) if modified else None,
+        }
+
+    def apply_stix_objects(self, objects: Iterable[Any]) -> Dict[str, Any]:
+        """
+        Merges STIX objects into the cache, applying only techniques whose
+        `modified` timestamp is newer than the cached one, and records
+        deprecations and revocations (with the replacing technique when a
+        revoked-by relationship names it). The cache is only rewritten when
+        something changed. Returns a summary of the changes.
+        """
+        current = self._read_cache_file()
+        summary: Dict[str, Any] = {"added": [], "updated": [], "deprecated": [], "revoked": [], "unchanged": 0}
+        stix_ids = {rec["stix_id"]: tid for tid, rec in current.items()
+                    if isinstance(rec, dict) and rec.get("stix_id")}
+        revocations = []
+
+        for obj in objects:
+            obj_type = obj.get('type')
+            if obj_type == 'relationship' and obj.get('relationship_type') == 'revoked-by':
+                revocations.append((obj.get('source_ref'), obj.get('target_ref')))
+                continue
+            if obj_type != 'attack-pattern':
+                continue
+            record = self._technique_record(obj)
+            if record is None:
+                continue
+            tid = record["id"]
+            if record["stix_id"]:
+                stix_ids[record["stix_id"]] = tid
+            old = current.get(tid)
+            if old and not _is_newer(record["modified"], old.get("modified")):
+                summary["unchanged"] += 1
+                continue
+            if old and old.get("revoked_by"):
+                record["revoked_by"] = old["revoked_by"]
+            current[tid] = record
+            summary["updated" if old else "added"].append(tid)
+            if record["deprecated"] and not (old and old.get("deprecated")):
+                summary["deprecated"].append(tid)
+            if record["revoked"] and not (old and old.get("revoked")):
+                summary["revoked"].append(tid)
+
+        relinked = False
+        for source, target in revocations:
+            tid, replacement = stix_ids.get(source), stix_ids.get(target)
+            if tid in current and replacement and current[tid].get("revoked_by") != replacement:
+                current[tid]["revoked_by"] = replacement
+                relinked = True
+
+        if summary["added"] or summary["updated"] or relinked:
+            self.save_cache(current)
+        logger.info(
+            f"MITRE cache: {len(summary['added'])} added, {len(summary['updated'])} updated, "
+            f"{summary['unchanged']} unchanged, {len(summary['deprecated'])} newly deprecated, "
+            f"{len(summary['revoked'])} newly revoked"
+        )
+        return summary
+
+    def update_cache_from_bundle(self, bundle_path: str) -> Dict[str, Any]:
+        """
+        Offline refresh from a local STIX 2 bundle (e.g. enterprise-attack.json).
+        The bundle is parsed as a stream, one object at a time.
+        """
+        return self.apply_stix_objects(iter_stix_objects(bundle_path))
 
     def update_cache(self) -> None:
         """
@@ -52,39 +366,8 @@ class MitreMapper:
             client = attack_client()
             logger.info("Fetching MITRE ATT&CK techniques... this may take a moment.")
             techniques = client.get_enterprise_techniques()
-            
-            new_cache = {}
-            for t in techniques:
-                # STIX 2 objects have external_references
-                ext_refs = t.get('external_references', [])
-                mitre_id = None
-                url = None
-                for ref in ext_refs:
-                    if ref.get('source_name') == 'mitre-attack':
-                        mitre_id = ref.get('external_id')
-                        url = ref.get('url')
-                        break
-                        
-                if not mitre_id:
-                    continue
-                    
-                name = t.get('name', 'Unknown')
-                description = t.get('description', 'No description available')
-                deprecated = t.get('x_mitre_deprecated', False)
-                revoked = t.get('revoked', False)
-                
-                new_cache[mitre_id] = {
-                    "id": mitre_id,
-                    "name": name,
-                    "description": description,
-                    "url": url,
-                    "deprecated": deprecated,
-                    "revoked": revoked,
-                }
-                
-            self.cache = new_cache
-            self.save_cache()
-            logger.info(f"Successfully updated MITRE cache with {len(self.cache)} techniques.")
+            summary = self.apply_stix_objects(techniques)
+            logger.info(f"Successfully updated MITRE cache ({len(summary['added']) + len(summary['updated'])} techniques changed).")
         except ImportError:
             logger.error("attackcti is not installed. Please install it to update the MITRE cache.")
         except Exception as e:
@@ -95,7 +378,7 @@ class MitreMapper:
         Given a finding key from the scanner, returns the enriched MITRE ATT&CK details
         if a mapping exists.
         """
-        technique_id = self.FINDING_TO_TECHNIQUE.get(finding_key)
+        technique_id = self.technique_map.get(finding_key)
         if not technique_id:
             return None
             
@@ -118,30 +401,70 @@ class MitreMapper:
 
     def enrich_report(self, report_data: Any) -> Any:
         """
-        Recursively maps finding keys in report_data and attaches MITRE data
-        to the dictionaries where they were found or at the top level.
+        Maps finding keys in report_data and attaches MITRE data, in place, to
+        the dictionaries where they were found. Iterative and idempotent:
+        running it again adds no duplicate technique entries.
+        Only the paths that can hold mapped keys are walked: the report (or list
+        of reports), the sections in self.containers and the host reports under
+        REPORT_COLLECTIONS. Finding values such as port lists or baseline checks
+        are never entered, so the cost follows the number of hosts and sections,
+        not the size of the data.
         """
-        if isinstance(report_data, dict):
-            # To avoid mutating during iteration
-            keys = list(report_data.keys())
-            mitre_list = []
-            for k in keys:
-                details = self.get_technique_details(k)
-                if details:
-                    mitre_list.append({k: details})
-                
-                # Recurse
-                report_data[k] = self.enrich_report(report_data[k])
-                
-            if mitre_list:
-                if "mitre_techniques" not in report_data:
-                    report_data["mitre_techniques"] = mitre_list
-                else:
-                    report_data["mitre_techniques"].extend(mitre_list)
-                    
+        with ENRICH_DURATION.time():
+            return self._enrich(report_data)
+
+    def _enrich(self, report_data: Any) -> Any:
+        mapped = self.technique_map.keys()
+        if not mapped:
             return report_data
-            
-        elif isinstance(report_data, list):
-            return [self.enrich_report(item) for item in report_data]
-            
+
+        self.visited = 0
+        stack = [report_data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(item for item in node if isinstance(item, (dict, list)))
+                continue
+            if not isinstance(node, dict):
+                continue
+            self.visited += 1
+
+            for k in self.containers.intersection(node):
+                if isinstance(node[k], (dict, list)):
+                    stack.append(node[k])
+            for k in self.REPORT_COLLECTIONS.intersection(node):
+                hosts = node[k]
+                if isinstance(hosts, dict):
+                    stack.extend(v for v in hosts.values() if isinstance(v, (dict, list)))
+                elif isinstance(hosts, list):
+                    stack.append(hosts)
+
+            if len(node) <= len(mapped):
+                hits = [k for k in node if k in mapped]
+            else:
+                hits = [k for k in mapped if k in node]
+                if len(hits) > 1:
+                    # Keep document order for the attached entries
+                    hit_set = set(hits)
+                    hits = [k for k in node if k in hit_set]
+            if hits:
+                self._attach(node, hits)
+
         return report_data
+
+    def _attach(self, node: Dict[str, Any], hits: List[str]) -> None:
+        existing = node.get("mitre_techniques")
+        created = not isinstance(existing, list)
+        if created:
+            existing = node["mitre_techniques"] = []
+        present = {next(iter(entry)) for entry in existing if isinstance(entry, dict) and entry}
+        for k in hits:
+            if k in present:
+                continue
+            details = self.get_technique_details(k)
+            if details:
+                existing.append({k: details})
+                present.add(k)
+        # Only drop the list we added; a caller's (even empty) list stays
+        if created and not existing:
+            del node["mitre_techniques"]
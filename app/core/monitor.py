@@ -0,0 +1,216 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import random
+import re
+import time
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Sequence, Union
+
+from .history import diff_results
+
+logger = logging.getLogger(__name__)
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_INTERVAL = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$", re.IGNORECASE)
+
+def parse_interval(value: Union[str, int, float]) -> float:
+    """Seconds for 90, "90", "30s", "15m", "6h" or "1d" """
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = _INTERVAL.match(str(value))
+        if not match:
+            raise ValueError(f"Invalid interval: {value!r}")
+        seconds = float(match.group(1)) * _UNITS[(match.group(2) or "s").lower()]
+    if seconds <= 0:
+        raise ValueError(f"Interval must be positive: {value!r}")
+    return seconds
+
+class MonitoredHost:
+    """
+    Schedule state of one (host, modules) pair. interval starts at the base
+    period and adapts after every run: it shrinks (down to min_interval) when
+    the findings changed since the previous run and grows (up to
+    max_interval) while they stay the same.
+    """
+    def __init__(self, target: str, modules: Optional[Sequence[str]], interval: float,
+                 min_interval: Optional[float] = None, max_interval: Optional[float] = None):
+        self.target = target
+        self.modules = list(modules) if modules else None
+        self.base_interval = interval
+        self.min_interval = min_interval or interval / 4
+        self.max_interval = max_interval or interval * 4
+        self.interval = interval
+        self.next_run = 0.0
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.runs = 0
+        self.changes = 0
+        self.failures = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.target} [{','.join(self.modules or ['all'])}]"
+
+    def adapt(self, changed: bool, shrink: float = 0.5, grow: float = 1.5) -> float:
+        if changed:
+            self.interval = max(self.min_interval, self.interval * shrink)
+        else:
+            self.interval = min(self.max_interval, self.interval * grow)
+        return self.interval
+
+def load_plan(path: str, max_targets: int = 1024) -> List[MonitoredHost]:
+    """
+    Reads a monitoring plan: a JSON list of entries such as
+    {"targets": ["10.0.0.0/30", "srv01"], "modules": ["service", "registry"],
+     "interval": "1h", "min_interval": "15m", "max_interval": "1d"}.
+    modules defaults to every module, min/max to a quarter/four times interval.
+    """
+    from .fleet import expand_targets
+    from .registry import strategy_names
+    known = strategy_names()
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = [entries]
+    hosts: List[MonitoredHost] = []
+    for entry in entries:
+        if "targets" not in entry or "interval" not in entry:
+            raise ValueError(f"Monitor plan entries need 'targets' and 'interval': {entry}")
+        modules = entry.get("modules")
+        if modules is not None:
+            if not isinstance(modules, list):
+                raise ValueError(f"Monitor plan 'modules' must be a list of names: {entry}")
+            unknown = [m for m in modules if m not in known]
+            if unknown:
+                raise ValueError(f"Unknown module(s) {', '.join(map(repr, unknown))} in monitor plan "
+                                 f"(expected one of {', '.join(known)})")
+        specs = entry["targets"] if isinstance(entry["targets"], list) else [entry["targets"]]
+        interval = parse_interval(entry["interval"])
+        low = parse_interval(entry["min_interval"]) if "min_interval" in entry else None
+        high = parse_interval(entry["max_interval"]) if "max_interval" in entry else None
+        for target in expand_targets(specs, max_targets):
+            hosts.append(MonitoredHost(target, modules, interval, low, high))
+    return hosts
+
+ScanFunc = Callable[[str, Optional[List[str]]], Awaitable[Dict[str, Any]]]
+
+class Monitor:
+    """
+    Continuous posture tracking: re-runs each host's modules when its interval
+    is due, at most max_concurrent scans at once. Intervals adapt to how often
+    a host's findings change (see MonitoredHost), each delay is randomised by
+    +/- jitter, and first runs are spread over `splay` seconds so a large
+    fleet does not start in one burst.
+    """
+    def __init__(self, scan: ScanFunc, hosts: Sequence[MonitoredHost], max_concurrent: int = 16,
+                 jitter: float = 0.1, splay: float = 60.0,
+                 on_result: Optional[Callable[[MonitoredHost, Dict[str, Any]], None]] = None,
+                 clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None):
+        self.scan = scan
+        self.hosts = list(hosts)
+        self.max_concurrent = max_concurrent
+        self.jitter = jitter
+        self.splay = splay
+        self.on_result = on_result
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._seq = itertools.count()
+
+    def _jittered(self, delay: float) -> float:
+        return max(0.0, delay * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+    async def _run_host(self, host: MonitoredHost) -> Dict[str, Any]:
+        started = self.clock()
+        try:
+            result = await self.scan(host.target, host.modules)
+        except Exception as e:
+            host.failures += 1
+            logger.error(f"Monitor scan of {host.name} failed: {e}")
+            # Retry at the current pace; a failure says nothing about drift
+            host.next_run = self.clock() + self._jittered(host.interval)
+            return {"target": host.target, "modules": host.modules, "error": str(e),
+                    "next_run_in": round(host.next_run - self.clock(), 1)}
+
+        host.runs += 1
+        summary: Dict[str, Any] = {"target": host.target, "modules": host.modules,
+                                   "duration": round(self.clock() - started, 3)}
+        if host.last_result is None:
+            # First run is the baseline: keep the base interval
+            summary["baseline"] = True
+        else:
+            diff = diff_results(host.last_result, result)
+            changed = bool(diff["new"] or diff["resolved"] or diff["changed"])
+            host.changes += int(changed)
+            host.adapt(changed)
+            summary.update({"changed": changed, "new": len(diff["new"]),
+                            "resolved": len(diff["resolved"]), "modified": len(diff["changed"])})
+        host.last_result = result
+        host.next_run = self.clock() + self._jittered(host.interval)
+        summary.update({"interval": round(host.interval, 1), "next_run_in": round(host.next_run - self.clock(), 1)})
+        return summary
+
+    async def run(self, stop: Optional[asyncio.Event] = None, max_runs: Optional[int] = None) -> int:
+        """
+        Runs until stop is set or max_runs scans have been started, and returns
+        the number of scans started. Scans in flight are awaited on the way out.
+        """
+        stop = stop or asyncio.Event()
+        now = self.clock()
+        queue = []
+        for host in self.hosts:
+            host.next_run = now + self.rng.uniform(0, min(self.splay, host.interval))
+            heapq.heappush(queue, (host.next_run, next(self._seq), host))
+
+        slots = asyncio.Semaphore(self.max_concurrent)
+        running = set()
+        started = 0
+
+        async def run_one(host: MonitoredHost):
+            async with slots:
+                summary = await self._run_host(host)
+            if self.on_result is not None:
+                self.on_result(host, summary)
+            heapq.heappush(queue, (host.next_run, next(self._seq), host))
+            wake.set()
+
+        wake = asyncio.Event()
+        try:
+            while not stop.is_set() and (max_runs is None or started < max_runs):
+                if queue and queue[0][0] <= self.clock():
+                    _, _, host = heapq.heappop(queue)
+                    task = asyncio.create_task(run_one(host))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    started += 1
+                    continue
+                # Sleep until the next host is due, a scan finishes (and reschedules) or stop
+                timeout = queue[0][0] - self.clock() if queue else None
+                wake.clear()
+                waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(wake.wait())]
+                try:
+                    await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        finally:
+            for task in running:
+                task.cancel()
+        return started
+
+async def scan_modules(target: str, modules: Optional[List[str]] = None, history=None) -> Dict[str, Any]:
+    """Fresh (uncached) HybridScanner run of the given modules, recorded in history when given"""
+    from .scanner import HybridScanner
+    scanner = HybridScanner(target, refresh=True, modules=modules)
+    await scanner.run_all()
+    result = scanner.build_result()
+    if history is not None:
+        try:
+            history.record(target, result, job_id="monitor", username="monitor")
+        except Exception as e:
+            # History is an add-on: never stop monitoring because of it
+            logger.error(f"Could not record scan history for {target}: {e}")
+    return result
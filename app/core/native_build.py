@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import sys
+from typing import Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class NativeBuild:
+    """
+    Compiles RegistryInspector.exe off the event loop, so startup does not wait
+    for csc. If there is no binary yet, the registry strategy reports "warming
+    up" instead of an error until the build ends; a stale binary keeps serving
+    until the new one is swapped in. build.py's manifest skips the build when
+    the source is unchanged.
+    """
+    def __init__(self, source_file: Optional[str] = None, output_file: Optional[str] = None):
+        self.source_file = source_file or os.path.join(settings.SCRIPTS_DIR, "RegistryInspector.cs")
+        self.output_file = os.path.abspath(output_file or os.path.join(settings.BIN_DIR, "RegistryInspector.exe"))
+        # idle -> building -> ready | failed (or straight to ready when up to date)
+        self.state = "idle"
+        self._task: Optional[asyncio.Future] = None
+
+    @staticmethod
+    def _import_build():
+        # build.py lives at the project root, outside the app package
+        if settings.ROOT_DIR not in sys.path:
+            sys.path.append(settings.ROOT_DIR)
+        try:
+            import build
+            return build
+        except ImportError:
+            logger.error("Could not import build.py. Please run 'python build.py' manually.")
+            return None
+
+    def is_building(self, exe_path: str) -> bool:
+        """True while the first build of exe_path runs, i.e. there is no binary to use yet"""
+        return self.state == "building" and os.path.abspath(exe_path) == self.output_file \
+            and not os.path.exists(self.output_file)
+
+    def start(self) -> Optional[asyncio.Future]:
+        """Starts the build if the binary is missing or stale; returns the running build, if any"""
+        if self._task is not None and not self._task.done():
+            return self._task
+        build = self._import_build()
+        if build is None:
+            self.state = "failed"
+            return None
+        if not build.needs_build(self.source_file, self.output_file):
+            self.state = "ready"
+            return None
+
+        logger.warning("RegistryInspector.exe missing or out of date. Building in the background...")
+        self.state = "building"
+        loop = asyncio.get_running_loop()
+        self._task = loop.run_in_executor(None, build.compile_csharp, False, self.source_file, self.output_file)
+        self._task.add_done_callback(self._finished)
+        return self._task
+
+    def _finished(self, task: asyncio.Future) -> None:
+        if task.cancelled():
+            self.state = "failed"
+        elif task.exception() is not None:
+            logger.error(f"Error during startup build: {task.exception()}")
+            self.state = "failed"
+        elif task.result():
+            logger.info("RegistryInspector.exe built successfully.")
+            self.state = "ready"
+        else:
+            logger.error("Failed to build RegistryInspector.exe. C# Strategy will be unavailable.")
+            self.state = "failed"
+
+    async def wait(self) -> str:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+        return self.state
+
+_default_build: Optional[NativeBuild] = None
+
+def get_native_build() -> NativeBuild:
+    global _default_build
+    if _default_build is None:
+        _default_build = NativeBuild()
+    return _default_build
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import socket
+import time
+import weakref
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Service labels reported for well-known ports
+SERVICE_MAP: Dict[int, str] = {
+    21: "FTP (File Transfer)",
+    22: "SSH (Secure Shell)",
+    23: "Telnet (Cleartext Remote Shell)",
+    25: "SMTP (Mail)",
+    53: "DNS",
+    80: "HTTP",
+    88: "Kerberos",
+    110: "POP3 (Mail)",
+    111: "RPCbind",
+    135: "MSRPC (RPC Endpoint Mapper)",
+    139: "NetBIOS Session",
+    143: "IMAP (Mail)",
+    389: "LDAP",
+    443: "HTTPS",
+    445: "SMB (Windows File Sharing)",
+    464: "Kerberos Password Change",
+    593: "RPC over HTTP",
+    636: "LDAPS",
+    1433: "MSSQL",
+    1521: "Oracle DB",
+    2049: "NFS",
+    3268: "LDAP Global Catalog",
+    3306: "MySQL",
+    3389: "RDP (Remote Desktop)",
+    5432: "PostgreSQL",
+    5900: "VNC",
+    5985: "WinRM (HTTP)",
+    5986: "WinRM (HTTPS)",
+    6379: "Redis",
+    8080: "HTTP Proxy / Alt",
+    8443: "HTTPS Alt",
+    9200: "Elasticsearch",
+    27017: "MongoDB",
+}
+
+# Most frequently open TCP ports, most common first (used by "topN" specs)
+TOP_PORTS: List[int] = [
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080,
+    1723, 111, 995, 993, 5900, 1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001,
+    10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554, 26, 1433, 49152, 2001, 515,
+    8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106,
+    2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389,
+    8009, 3128, 444, 9999, 5009, 7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051,
+    6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37, 5985, 5986, 636, 3268, 593,
+]
+
+MAX_PORT = 65535
+
+def parse_ports(spec: str) -> List[int]:
+    """
+    Parses a port specification such as "21,445,3389", "1-1024", "top100"
+    or "all" into an ordered list of unique ports. "topN" takes the N most
+    common ports, N up to len(TOP_PORTS) (105); larger N raises ValueError.
+    """
+    ports: List[int] = []
+    seen = set()
+    for token in spec.replace(" ", "").split(","):
+        if not token:
+            continue
+        token = token.lower()
+        if token == "all":
+            candidates = range(1, MAX_PORT + 1)
+        elif token.startswith("top"):
+            count = int(token[3:] or len(TOP_PORTS))
+            if not 1 <= count <= len(TOP_PORTS):
+                raise ValueError(f"top{count} is out of range: use top1 to top{len(TOP_PORTS)}, a range or 'all'")
+            candidates = TOP_PORTS[:count]
+        elif "-" in token:
+            start, end = (int(p) for p in token.split("-", 1))
+            if start > end:
+                raise ValueError(f"Invalid port range: {token}")
+            candidates = range(start, end + 1)
+        else:
+            candidates = [int(token)]
+
+        for port in candidates:
+            if not 1 <= port <= MAX_PORT:
+                raise ValueError(f"Port out of range: {port}")
+            if port not in seen:
+                seen.add(port)
+                ports.append(port)
+    return ports
+
+def default_concurrency(limit: int = 1000, reserve: int = 64) -> int:
+    """Caps concurrent sockets below the process file-descriptor limit"""
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            return max(1, min(limit, soft - reserve))
+    except (ImportError, ValueError, OSError):
+        # Windows has no RLIMIT_NOFILE; the selector limit is far above our cap
+        pass
+    return limit
+
+# One socket budget per event loop (the app runs a single loop), shared by every
+# PortScanner on it: a fleet scan runs many scanners at once and together they
+# must stay below the descriptor limit, not each of them on its own
+_socket_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def socket_slots() -> asyncio.Semaphore:
+    """Process-wide limit on sockets open for probing, sized by default_concurrency()"""
+    loop = asyncio.get_running_loop()
+    slots = _socket_slots.get(loop)
+    if slots is None:
+        slots = _socket_slots[loop] = asyncio.Semaphore(default_concurrency())
+    return slots
+
+class PortScanner:
+    """
+    Asynchronous TCP connect scanner.
+    Concurrency is bounded by a fixed worker pool, the connect timeout adapts
+    to the measured round-trip time, and only ports that timed out are retried.
+    Every probe also takes a slot from socket_slots(), so concurrent scanners
+    share one descriptor budget.
+    """
+    def __init__(self, concurrency: Optional[int] = None, timeout: float = 0.5,
+                 min_timeout: float = 0.05, retries: int = 1):
+        self.concurrency = concurrency or default_concurrency()
+        self.max_timeout = timeout
+        self.min_timeout = min(min_timeout, timeout)
+        self.retries = retries
+        # Smoothed RTT estimator (RFC 6298 style)
+        self._srtt: Optional[float] = None
+        self._rttvar = 0.0
+
+    @property
+    def timeout(self) -> float:
+        if self._srtt is None:
+            return self.max_timeout
+        rto = self._srtt + 4 * self._rttvar
+        return min(self.max_timeout, max(self.min_timeout, rto))
+
+    def _record_rtt(self, rtt: float) -> None:
+        if self._srtt is None:
+            self._srtt = rtt
+            self._rttvar = rtt / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(self._srtt - rtt)
+            self._srtt = 0.875 * self._srtt + 0.125 * rtt
+
+    async def _probe(self, addr: Tuple, family: int, port: int, timeout: float) -> str:
+        """Returns "open", "closed" or "timeout" for a single port"""
+        loop = asyncio.get_running_loop()
+        async with socket_slots():
+            sock = None
+            try:
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                start = time.perf_counter()
+                await asyncio.wait_for(loop.sock_connect(sock, (addr[0], port) + tuple(addr[2:])), timeout=timeout)
+                self._record_rtt(time.perf_counter() - start)
+                return "open"
+            except asyncio.TimeoutError:
+                return "timeout"
+            except ConnectionRefusedError:
+                # A RST is as good an RTT sample as a SYN/ACK
+                self._record_rtt(time.perf_counter() - start)
+                return "closed"
+            except OSError as e:
+                if sock is None:
+                    # No descriptor for the probe (EMFILE/ENFILE): unanswered, so the retry pass tries again
+                    logger.debug(f"Could not open a socket for port {port}: {e}")
+                    return "timeout"
+                return "closed"
+            finally:
+                if sock is not None:
+                    sock.close()
+
+    async def _sweep(self, addr: Tuple, family: int, ports: List[int],
+                     backoff: float) -> Tuple[List[int], List[int]]:
+        """
+        Probes ports with a fixed pool of workers, so at most `concurrency`
+        sockets (and tasks) exist at any time, however many ports are scanned.
+        """
+        open_ports: List[int] = []
+        timed_out: List[int] = []
+        queue = iter(ports)
+
+        async def worker():
+            for port in queue:
+                # Re-read the timeout per probe so it tracks the RTT measured so far
+                state = await self._probe(addr, family, port, self.timeout * backoff)
+                if state == "open":
+                    open_ports.append(port)
+                elif state == "timeout":
+                    timed_out.append(port)
+
+        workers = min(self.concurrency, len(ports))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return open_ports, timed_out
+
+    async def scan(self, target: str, ports: List[int]) -> List[int]:
+        """Returns the sorted list of open ports on target"""
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(target, None, type=socket.SOCK_STREAM)
+        family, _, _, _, addr = infos[0]
+
+        open_ports: List[int] = []
+        pending = list(ports)
+        for attempt in range(self.retries + 1):
+            if not pending:
+                break
+            # Back off on retries: the host or a filter may be slow rather than silent
+            backoff = 2 ** attempt
+            found, pending = await self._sweep(addr, family, pending, backoff)
+            open_ports.extend(found)
+            logger.debug(f"{target}: attempt {attempt + 1}, {len(pending)} ports timed out (timeout {self.timeout * backoff:.3f}s)")
+
+        return sorted(open_ports)
+
+def describe_ports(ports: List[int]) -> List[Dict[str, Any]]:
+    """Formats open ports the way the Network_Scan report expects"""
+    return [{"port": p, "service": SERVICE_MAP.get(p, "Unknown"), "status": "OPEN"} for p in ports]
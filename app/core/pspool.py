@@ -0,0 +1,260 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Sequence
+
+from .metrics import SUBPROCESS_SPAWNS, PS_POOL_JOB_DURATION, program_name
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+FRAME_MARKER = "@@WINSEC-FRAME@@"
+
+class PowerShellError(Exception):
+    """A worker failed to start, died, or the script raised"""
+
+class PowerShellStartError(PowerShellError):
+    """No worker could be started, e.g. on PowerShell v2, which lacks ConvertFrom-Json"""
+
+class _Worker:
+    """One long-lived interpreter speaking the framed JSON protocol of scripts/ps_worker.ps1"""
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.jobs = 0
+        self.last_used = time.monotonic()
+        self._ids = itertools.count(1)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def read_frame(self) -> Dict[str, Any]:
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise PowerShellError(f"Worker {self.process.pid} exited")
+            text = line.decode("utf-8", errors="replace").strip()
+            # Anything that is not a frame is console noise (banners, Write-Host)
+            if text.startswith(FRAME_MARKER):
+                return json.loads(text[len(FRAME_MARKER):])
+
+    async def request(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        request_id = next(self._ids)
+        line = json.dumps({"id": request_id, **payload}) + "\n"
+        self.process.stdin.write(line.encode("utf-8"))
+
+        async def reply() -> Dict[str, Any]:
+            await self.process.stdin.drain()
+            while True:
+                frame = await self.read_frame()
+                if frame.get("id") == request_id:
+                    return frame
+
+        frame = await asyncio.wait_for(reply(), timeout=timeout)
+        self.last_used = time.monotonic()
+        return frame
+
+    def abandon(self) -> None:
+        """
+        Kills and reaps a worker whose event loop has finished, so neither the
+        process nor its pipes can be awaited any more: waits on the Popen object
+        directly and closes the pipes without the loop, instead of leaving a
+        zombie and open transports behind.
+        """
+        transport = self.process._transport
+        popen = transport.get_extra_info("subprocess")
+        try:
+            popen.kill()
+        except ProcessLookupError:
+            pass
+        # Reaps it (or notices asyncio's child watcher already did)
+        popen.wait()
+        # What transport.close() would do, minus the steps that need the loop
+        transport._closed = True
+        for fd in (0, 1, 2):
+            pipe = transport.get_pipe_transport(fd)
+            if pipe is not None:
+                try:
+                    pipe.close()
+                except RuntimeError:
+                    # Marked closing, but the rest could not be scheduled on the closed
+                    # loop: run it (close the file and drop it) directly
+                    try:
+                        pipe._call_connection_lost(None)
+                    except RuntimeError:
+                        pass
+
+    async def stop(self, graceful: bool = False) -> None:
+        if self.alive and graceful:
+            # Closing stdin ends the worker loop
+            try:
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), timeout=2.0)
+            except (asyncio.TimeoutError, OSError):
+                pass
+        if self.alive:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        await self.process.wait()
+
+class PowerShellPool:
+    """
+    Pool of persistent interpreter processes that run scripts on request, so a
+    scan no longer pays PowerShell start-up time. Workers are started lazily
+    (up to size), health-checked with a ping when they have been idle for
+    health_interval seconds, recycled after max_jobs scripts, and killed and
+    replaced when a job exceeds its timeout. If no worker can start, run()
+    raises PowerShellStartError and callers fall back to one process per
+    script (see `disabled`).
+    """
+    def __init__(self, command: Sequence[str], size: int = 2, max_jobs: int = 50, timeout: float = 30.0,
+                 start_timeout: float = 30.0, health_interval: float = 60.0, max_line: int = 8 * 1024 * 1024):
+        self.command = list(command)
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.health_interval = health_interval
+        self.max_line = max_line
+        # Process counters, e.g. for monitoring how often workers are replaced
+        self.spawned = 0
+        self.recycled = 0
+        # Set once workers failed to start: callers run scripts one-shot for the rest of the process
+        self.disabled = False
+        self._idle: List[_Worker] = []
+        self._busy: List[_Worker] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> None:
+        # Worker pipes belong to the loop that started them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for worker in self._idle + self._busy:
+                worker.abandon()
+            self._idle = []
+            self._busy = []
+            self._slots = asyncio.Semaphore(self.size)
+            self._loop = loop
+
+    async def _spawn(self) -> _Worker:
+        with span("spawn", cat="subprocess", program=program_name(self.command), pooled=True):
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *self.command,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                    limit=self.max_line
+                )
+            except OSError as e:
+                raise PowerShellStartError(f"Cannot start {self.command[0]}: {e}") from e
+        SUBPROCESS_SPAWNS.inc(program=program_name(self.command))
+        worker = _Worker(process)
+        try:
+            ready = await asyncio.wait_for(worker.read_frame(), timeout=self.start_timeout)
+            if not ready.get("ready"):
+                raise PowerShellError(ready.get("error") or "Worker did not report ready")
+        except BaseException as e:
+            await worker.stop()
+            if isinstance(e, asyncio.TimeoutError):
+                raise PowerShellStartError(f"Worker did not start within {self.start_timeout}s") from e
+            if isinstance(e, PowerShellError):
+                raise PowerShellStartError(str(e)) from e
+            raise
+        self.spawned += 1
+        logger.info(f"PowerShell worker {process.pid} started")
+        return worker
+
+    async def _healthy(self, worker: _Worker) -> bool:
+        if not worker.alive:
+            return False
+        if time.monotonic() - worker.last_used < self.health_interval:
+            return True
+        try:
+            return bool((await worker.request({"ping": True}, timeout=min(5.0, self.timeout))).get("ok"))
+        except Exception:
+            return False
+
+    async def _acquire(self) -> _Worker:
+        while self._idle:
+            worker = self._idle.pop()
+            if await self._healthy(worker):
+                return worker
+            logger.warning(f"PowerShell worker {worker.process.pid} failed its health check, replacing it")
+            await worker.stop()
+        return await self._spawn()
+
+    async def _release(self, worker: _Worker) -> None:
+        if worker.jobs >= self.max_jobs:
+            logger.info(f"Recycling PowerShell worker {worker.process.pid} after {worker.jobs} jobs")
+            self.recycled += 1
+            await worker.stop(graceful=True)
+        elif worker.alive:
+            self._idle.append(worker)
+
+    async def run(self, script: str, args: Sequence[str] = (), timeout: Optional[float] = None) -> str:
+        """
+        Runs script in a pooled interpreter and returns its output as text.
+        Raises asyncio.TimeoutError (the worker is killed) or PowerShellError.
+        """
+        self._bind_loop()
+        async with self._slots:
+            worker = await self._acquire()
+            self._busy.append(worker)
+            try:
+                worker.jobs += 1
+                with PS_POOL_JOB_DURATION.time(), \
+                     span("ps_pool:run", cat="subprocess", script=os.path.basename(script), pid=worker.process.pid):
+                    reply = await worker.request({"script": script, "args": list(args)}, timeout or self.timeout)
+            except BaseException:
+                # Timed out, died or cancelled mid-job: its state is unknown
+                await worker.stop()
+                raise
+            finally:
+                # close() may already have taken it
+                if worker in self._busy:
+                    self._busy.remove(worker)
+            await self._release(worker)
+        if not reply.get("ok"):
+            raise PowerShellError(reply.get("error") or "Script failed")
+        return reply.get("output") or ""
+
+    async def close(self) -> None:
+        """Stops every worker (idle ones gracefully)"""
+        # Workers started on another (finished) loop are reaped there and then
+        self._bind_loop()
+        idle, busy = self._idle, self._busy
+        self._idle, self._busy = [], []
+        for worker in idle:
+            await worker.stop(graceful=True)
+        for worker in busy:
+            await worker.stop()
+
+    def __len__(self) -> int:
+        return len(self._idle) + len(self._busy)
+
+_default_pool: Optional[PowerShellPool] = None
+
+def get_powershell_pool() -> Optional[PowerShellPool]:
+    """Process-wide pool configured from settings, or None when PS_POOL_SIZE is 0 or its workers cannot start"""
+    global _default_pool
+    from .config import settings
+    if settings.PS_POOL_SIZE <= 0 or (_default_pool is not None and _default_pool.disabled):
+        return None
+    if _default_pool is None:
+        worker_script = os.path.join(settings.SCRIPTS_DIR, "ps_worker.ps1")
+        _default_pool = PowerShellPool(
+            [settings.POWERSHELL_PATH, "-NoLogo", "-NoProfile", "-NonInteractive",
+             "-ExecutionPolicy", "Bypass", "-File", worker_script],
+            size=settings.PS_POOL_SIZE,
+            max_jobs=settings.PS_POOL_MAX_JOBS,
+            timeout=settings.PS_TIMEOUT,
+            max_line=settings.SUBPROCESS_MAX_OUTPUT
+        )
+    return _default_pool
@@ -0,0 +1,48 @@
+import importlib
+import threading
+from typing import Any, Dict, List, Type
+
+from .interfaces import IScanStrategy
+
+# Strategy name (CLI --strategy, monitor plans) -> "module:Class", in report order.
+# Nothing is imported until a strategy is used, so a port probe never loads the others.
+STRATEGIES: Dict[str, str] = {
+    "network": "app.core.strategies:NetworkScanStrategy",
+    "service": "app.core.strategies:ServiceConfigStrategy",
+    "registry": "app.core.strategies:RegistryAuditStrategy",
+    "file": "app.core.strategies:FileSystemStrategy",
+}
+
+_classes: Dict[str, Type[IScanStrategy]] = {}
+_classes_lock = threading.Lock()
+
+def strategy_names() -> List[str]:
+    return list(STRATEGIES)
+
+def register_strategy(name: str, path: str) -> None:
+    """Adds or replaces a strategy; path is "package.module:ClassName" """
+    if ":" not in path:
+        raise ValueError(f"Strategy path must look like 'module:Class', got {path!r}")
+    with _classes_lock:
+        STRATEGIES[name] = path
+        _classes.pop(name, None)
+
+def get_strategy_class(name: str) -> Type[IScanStrategy]:
+    cls = _classes.get(name)
+    if cls is not None:
+        return cls
+    try:
+        path = STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown strategy {name!r} (expected one of {', '.join(STRATEGIES)})") from None
+    module_name, _, class_name = path.partition(":")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(cls, type) and issubclass(cls, IScanStrategy)):
+        raise TypeError(f"{path} is not an IScanStrategy")
+    with _classes_lock:
+        _classes[name] = cls
+    return cls
+
+def create_strategy(name: str, **kwargs: Any) -> IScanStrategy:
+    """New instance of the named strategy; kwargs go to its constructor"""
+    return get_strategy_class(name)(**kwargs)
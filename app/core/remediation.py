@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import zipfile
+from typing import Dict, Any, IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+class CompiledTemplate:
+    """
+    A template split once into literal text and {{ name }} placeholders, so
+    rendering is a walk over the parts instead of repeated str.replace calls
+    over the whole script. Values may be strings or iterables of chunks.
+    """
+    def __init__(self, text: str):
+        self.parts: List[Tuple[bool, str]] = []
+        pos = 0
+        for match in _PLACEHOLDER.finditer(text):
+            if match.start() > pos:
+                self.parts.append((False, text[pos:match.start()]))
+            self.parts.append((True, match.group(1)))
+            pos = match.end()
+        if pos < len(text):
+            self.parts.append((False, text[pos:]))
+
+    @property
+    def placeholders(self) -> List[str]:
+        return [value for is_name, value in self.parts if is_name]
+
+    def render_iter(self, values: Dict[str, Union[str, Iterable[str]]]) -> Iterator[str]:
+        for is_name, value in self.parts:
+            if not is_name:
+                yield value
+                continue
+            replacement = values.get(value, "")
+            if isinstance(replacement, str):
+                yield replacement
+            else:
+                yield from replacement
+
+    def render(self, values: Dict[str, Union[str, Iterable[str]]]) -> str:
+        return "".join(self.render_iter(values))
+
+_templates: Dict[str, Tuple[Tuple[int, int], CompiledTemplate]] = {}
+_templates_lock = threading.Lock()
+
+def get_template(path: str) -> Optional[CompiledTemplate]:
+    """
+    Compiled template for path, recompiled only when the file's mtime or size
+    changes. None when it is missing or unreadable.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        logger.error(f"Template not found: {path}")
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _templates.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            template = CompiledTemplate(f.read())
+    except Exception as e:
+        logger.error(f"Error reading template: {e}")
+        return None
+    with _templates_lock:
+        _templates[path] = (signature, template)
+    return template
+
+def fix_block(index: int, fix: Dict[str, str]) -> str:
+    return f"""
+Write-Status "Applying Fix {index}: {fix['desc']}"
+try {{
+    {fix['cmd']}
+    Write-Status "Success: {fix['desc']}" "Green"
+}} catch {{
+    Write-Error "Failed to apply fix: $_"
+}}
+"""
+
+def _fix_blocks(fixes: List[Dict[str, str]]) -> Iterator[str]:
+    for i, fix in enumerate(fixes, 1):
+        if i > 1:
+            yield "\n"
+        yield fix_block(i, fix)
+
+def _fallback(fixes: List[Dict[str, str]], timestamp: str) -> Iterator[str]:
+    """Plain script used when the template is missing"""
+    yield f"# WINSEC DEFENDER REMEDIATION SCRIPT - {timestamp}\n"
+    yield "# RUN AS ADMINISTRATOR"
+    for fix in fixes:
+        yield f"\nWrite-Host 'Applying: {fix['desc']}'\n"
+        yield fix["cmd"]
+
+def iter_remediation(fixes: List[Dict[str, str]], timestamp: str,
+                     template_path: Optional[str] = None) -> Iterator[str]:
+    """Remediation script for fixes as a stream of text chunks (nothing when there are no fixes)"""
+    if not fixes:
+        return
+    if template_path is None:
+        from .config import settings
+        template_path = os.path.join(settings.SCRIPTS_DIR, "remediation_template.ps1")
+    template = get_template(template_path)
+    if template is None:
+        yield from _fallback(fixes, timestamp)
+        return
+    yield from template.render_iter({"timestamp": timestamp, "fix_blocks": _fix_blocks(fixes)})
+
+def fix_set_id(fixes: List[Dict[str, str]]) -> str:
+    """Stable id of a fix list; hosts with the same id get the same script"""
+    canonical = json.dumps([[f["desc"], f["cmd"]] for f in fixes], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+def group_hosts(host_fixes: Dict[str, List[Dict[str, str]]]) -> List[Dict[str, Any]]:
+    """Hosts grouped by identical fix lists, largest group first; hosts without fixes are left out"""
+    groups: Dict[str, Dict[str, Any]] = {}
+    for host, fixes in host_fixes.items():
+        if not fixes:
+            continue
+        group_id = fix_set_id(fixes)
+        group = groups.setdefault(group_id, {"id": group_id, "fixes": fixes, "hosts": []})
+        group["hosts"].append(host)
+    return sorted(groups.values(), key=lambda g: (-len(g["hosts"]), g["id"]))
+
+def write_fleet_bundle(out: IO[bytes], host_fixes: Dict[str, List[Dict[str, str]]], timestamp: str,
+                       template_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Writes a zip with one script per distinct fix set (rendered once, however
+    many hosts share it) and a manifest.json mapping hosts to scripts.
+    Returns the manifest.
+    """
+    groups = group_hosts(host_fixes)
+    manifest: Dict[str, Any] = {
+        "generated": timestamp,
+        "hosts": len(host_fixes),
+        "scripts": len(groups),
+        "groups": [],
+        "hosts_without_fixes": [h for h, fixes in host_fixes.items() if not fixes],
+    }
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for n, group in enumerate(groups, 1):
+            name = f"REMEDIATION_{n:02d}_{group['id']}.ps1"
+            digest = hashlib.sha256()
+            # Chunks go straight into the archive; the script is never held whole in memory
+            with bundle.open(name, "w") as entry:
+                for chunk in iter_remediation(group["fixes"], timestamp, template_path):
+                    data = chunk.encode("utf-8")
+                    digest.update(data)
+                    entry.write(data)
+            manifest["groups"].append({
+                "script": name,
+                "sha256": digest.hexdigest(),
+                "hosts": group["hosts"],
+                "fixes": [f["desc"] for f in group["fixes"]],
+            })
+        bundle.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return manifest
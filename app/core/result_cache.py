@@ -0,0 +1,73 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from .interfaces import IScanStrategy
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, Tuple]
+
+class ResultCache:
+    """
+    Strategy result cache keyed by (target, strategy, strategy parameters).
+    An entry is served while it is younger than the strategy's TTL and its
+    change token (see IScanStrategy.change_token) still matches.
+    """
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 1024):
+        # Per-strategy TTL overrides by class name; otherwise the strategy's cache_ttl
+        self.ttls = ttls or {}
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Optional[str], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, strategy: IScanStrategy) -> float:
+        return self.ttls.get(strategy.__class__.__name__, strategy.cache_ttl)
+
+    @staticmethod
+    def key_for(target: str, strategy: IScanStrategy) -> CacheKey:
+        return (target, strategy.__class__.__name__, strategy.cache_params())
+
+    def get(self, key: CacheKey, ttl: float, token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, stored_token, result = entry
+        if time.time() - stored_at > ttl:
+            return None
+        if token is not None and token != stored_token:
+            logger.info(f"Cached result for {key[1]} on {key[0]} invalidated: change detected")
+            return None
+        # Callers enrich results in place; never hand out the cached object itself
+        return copy.deepcopy(result)
+
+    def set(self, key: CacheKey, result: Dict[str, Any], token: Optional[str] = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), token, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, target: Optional[str] = None) -> None:
+        """Drops every entry, or only those for target"""
+        with self._lock:
+            if target is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == target]:
+                    del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+_default_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> ResultCache:
+    """Process-wide cache configured from settings"""
+    global _default_cache
+    if _default_cache is None:
+        from .config import settings
+        _default_cache = ResultCache(settings.STRATEGY_CACHE_TTLS, settings.RESULT_CACHE_MAX_ENTRIES)
+    return _default_cache
@@ -4,189 +4,207 @@ import json
 import os
 import logging
 import tempfile
+import time
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple, AsyncIterator, Iterator, Optional, Sequence
 from app.core.config import settings
+from .interfaces import IScanStrategy
+from .metrics import HOST_SCAN_DURATION, HOST_LAST_SCAN
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
+# Short module names (CLI, monitor plans) -> report keys
+MODULE_KEYS = {
+    "network": "Network_Scan",
+    "service": "System_Config",
+    "registry": "UAC_Check",
+    "file": "FileSystem_Check",
+}
+
+def resolve_modules(modules: Sequence[str]) -> List[str]:
+    """Report keys for module names (strategy names or report keys); unknown names raise ValueError"""
+    from .registry import strategy_names
+    keys = {name: MODULE_KEYS.get(name, name) for name in strategy_names()}
+    known = set(keys.values())
+    unknown = [m for m in modules if m not in keys and m not in known]
+    if unknown:
+        raise ValueError(f"Unknown module(s) {', '.join(map(repr, unknown))} "
+                         f"(expected one of {', '.join(keys)})")
+    return [keys.get(m, m) for m in modules]
+
 class HybridScanner:
-    def __init__(self, target_ip: str = settings.TARGET_IP):
-        self.target_ip = target_ip
+    def __init__(self, target_ip: Optional[str] = None, refresh: bool = False,
+                 modules: Optional[Sequence[str]] = None):
+        self.target_ip = target_ip or settings.TARGET_IP
+        # refresh=True ignores cached strategy results (they are still re-cached)
+        self.refresh = refresh
+        # Report keys of the modules to run (None = all of them)
+        self.modules = resolve_modules(modules) if modules else None
         self.report_data: Dict[str, Any] = {}
         self.fixes: List[Dict[str, str]] = []
+        self.findings: List[Dict[str, Any]] = []
+        # Report keys of the modules the last stream_all() covered
+        self.scanned_modules: List[str] = []
         self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        from .context import ContextScanner
-        from .strategies import NetworkScanStrategy, ServiceConfigStrategy, RegistryAuditStrategy
         from .mitre_mapper import MitreMapper
-        
-        self.context = ContextScanner(target_ip)
-        self.mitre_mapper = MitreMapper()
-
-    async def scan_network_ports(self) -> List[Dict[str, Any]]:
-        """Async port scanning using Strategy"""
-        from .strategies import NetworkScanStrategy
-        self.context.set_strategy(NetworkScanStrategy())
-        results = await self.context.execute_scan()
-        
-        # Extract specific result
-        scan_result = results.get("Network_Scan", [])
-        
-        # We can enrich the wrapper dict to attach MITRE details to "Network_Scan"
-        enriched_results = self.mitre_mapper.enrich_report(results)
-        scan_result_enriched = enriched_results.get("Network_Scan", scan_result)
-        
-        self.report_data["Network_Scan"] = scan_result_enriched
-        # Also preserve techniques if they were added at root
-        if "mitre_techniques" in enriched_results:
-            if "mitre_techniques" not in self.report_data:
-                self.report_data["mitre_techniques"] = []
-            self.report_data["mitre_techniques"].extend(enriched_results["mitre_techniques"])
-
-        return scan_result_enriched
-
-    async def run_powershell_module(self) -> Dict[str, Any]:
-        """Executes PS1 script using Strategy"""
-        from .strategies import ServiceConfigStrategy
-        self.context.set_strategy(ServiceConfigStrategy())
-        results = await self.context.execute_scan()
-        
-        ps_data = results.get("System_Config", {})
-        if "error" in ps_data:
-             return ps_data
-             
-        ps_data = self.mitre_mapper.enrich_report(ps_data)
-        self.report_data["System_Config"] = ps_data
-        self._analyze_ps_results(ps_data)
-        return ps_data
-
-    def _analyze_ps_results(self, ps_data: Dict[str, Any]):
-        """Analyze results and generate fixes"""
-        if ps_data.get("SMBv1_Status") == "Enabled" or ps_data.get("SMBv1_Status") == "Likely Enabled":
-            self.fixes.append({
-                "desc": "Disable SMBv1 (WannaCry Risk)",
-                "cmd": "Disable-WindowsOptionalFeature -Online -FeatureName SMB1Protocol -NoRestart"
-            })
-
-        if ps_data.get("Unquoted_Services", "None") != "None" and ps_data.get("Unquoted_Services") != []:
-            # Improved robust fix script with WQL optimization
-            fix_code = r'''
-# Optimized query to find candidates only (Server-Side Filtering)
-$wql = "Select Name, PathName, StartMode From Win32_Service Where StartMode='Auto' AND PathName LIKE '% %'"
-$candidates = Get-WmiObject -Query $wql -ErrorAction SilentlyContinue
-
-foreach ($service in $candidates) {
-    # Double check client-side safely
-    if ($service.PathName -notmatch '^"' -and $service.PathName -match '\s' -and $service.PathName -notmatch '^C:\\Windows\\') {
-        $newPath = '"' + $service.PathName + '"'
-        Write-Output "Fixing $($service.Name)..."
-        try {
-            Set-ItemProperty -Path "HKLM:\SYSTEM\CurrentControlSet\Services\$($service.Name)" -Name "ImagePath" -Value $newPath -ErrorAction Stop
-        } catch {
-            Write-Error "Could not fix $($service.Name): $_"
+        from .checkpack import get_check_pack
+
+        # Rules are compiled once per process; the pack also owns the finding -> MITRE mapping
+        self.check_pack = get_check_pack()
+        self.mitre_mapper = MitreMapper(technique_map=self.check_pack.technique_map,
+                                        containers=self.check_pack.containers)
+
+    def _build_modules(self) -> List[Tuple[str, IScanStrategy]]:
+        """Report key and strategy for every selected module, in report order"""
+        from .registry import create_strategy, strategy_names
+        selected = []
+        for name in strategy_names():
+            # Strategies registered later report under their own name
+            key = MODULE_KEYS.get(name, name)
+            if self.modules is None or key in self.modules:
+                selected.append((key, create_strategy(name)))
+        return selected
+
+    async def stream_all(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Runs every module concurrently and yields (module key, event) as each
+        one finishes. The event carries the module data, its fixes and the
+        MITRE techniques mapped for it, so callers can publish it right away.
+        Once the stream is exhausted report_data and fixes are complete.
+        """
+        from .context import ContextScanner, NOT_APPLICABLE, is_local_target
+        from .result_cache import get_result_cache
+        modules = self._build_modules()
+        keys = {strategy: key for key, strategy in modules}
+        self.scanned_modules = [key for key, _ in modules]
+        # Local-only modules would report this machine's state under a remote host's name
+        local = is_local_target(self.target_ip)
+        skipped = [key for key, strategy in modules if strategy.local_only and not local]
+
+        context = ContextScanner(
+            self.target_ip,
+            concurrent=True,
+            max_concurrency=settings.SCAN_CONCURRENCY,
+            strategy_timeout=settings.STRATEGY_TIMEOUT,
+            cache=get_result_cache(),
+            refresh=self.refresh
+        )
+        for key, strategy in modules:
+            if key not in skipped:
+                context.add_strategy(strategy)
+
+        collected: Dict[str, Dict[str, Any]] = {}
+        started = time.perf_counter()
+        for key in skipped:
+            # No findings, fixes or techniques: nothing was audited on this host
+            collected[key] = {"data": dict(NOT_APPLICABLE), "extra": {}, "findings": [], "fixes": [],
+                              "mitre_techniques": []}
+            yield key, collected[key]
+        async for strategy, result in context.stream_scan():
+            key = keys[strategy]
+            # Errors come back either at the top level or under the strategy class name
+            data = result.get(key, result.get(strategy.__class__.__name__, result))
+            # Secondary sections a module reports next to its own (e.g. Registry_Baseline)
+            extra = {k: v for k, v in result.items() if k != key} if key in result else {}
+            # Enriching the {key: data} slice is the merged-report enrichment done piecewise:
+            # nested findings are tagged in place, root-level ones come back on the wrapper
+            section = {key: data, **extra}
+            with span(f"fixes:{key}", cat="fixes") as args:
+                findings = self.check_pack.evaluate(section)
+                for finding in findings:
+                    # Lets history diffs leave out modules a partial run did not cover
+                    finding["module"] = key
+                fixes = self._fixes_from(findings)
+                args.update(findings=len(findings), fixes=len(fixes))
+            with span(f"enrich:{key}", cat="enrich"):
+                wrapper = self.mitre_mapper.enrich_report(section)
+            event = {
+                "data": wrapper[key],
+                "extra": {k: wrapper[k] for k in extra},
+                "findings": findings,
+                "fixes": fixes,
+                "mitre_techniques": wrapper.get("mitre_techniques", [])
+            }
+            collected[key] = event
+            logger.info(f"Module {key} finished ({len(event['fixes'])} fixes)")
+            yield key, event
+
+        elapsed = time.perf_counter() - started
+        HOST_SCAN_DURATION.observe(elapsed)
+        HOST_LAST_SCAN.set(elapsed, host=self.target_ip)
+
+        # Rebuild in module order so reports and scripts are deterministic
+        techniques = []
+        for key, _ in modules:
+            self.report_data[key] = collected[key]["data"]
+            self.findings.extend(collected[key]["findings"])
+            self._add_fixes(collected[key]["fixes"])
+            techniques.extend(collected[key]["mitre_techniques"])
+        for key, _ in modules:
+            self.report_data.update(collected[key]["extra"])
+        if techniques:
+            self.report_data["mitre_techniques"] = techniques
+
+    async def run_all(self) -> Dict[str, Any]:
+        """
+        Runs every module concurrently in a single pipeline.
+        Fixes are collected and MITRE data attached once per module as each
+        one finishes; no module is set up or enriched twice.
+        """
+        async for _ in self.stream_all():
+            pass
+        return self.report_data
+
+    def build_result(self) -> Dict[str, Any]:
+        """Host result as published by the API and stored in the scan history"""
+        # Findings come from the check pack rules (checks/*.json)
+        is_vulnerable = any(f["risk"] == "HIGH" for f in self.findings)
+        return {
+            "status": "success",
+            "network": self.report_data.get("Network_Scan", []),
+            "system": self.report_data.get("System_Config", {}),
+            "uac": self.report_data.get("UAC_Check", {}),
+            "filesystem": self.report_data.get("FileSystem_Check", {}),
+            "registry_baseline": self.report_data.get("Registry_Baseline", {}),
+            "mitre_techniques": self.report_data.get("mitre_techniques", []),
+            "findings": [{k: f.get(k) for k in ("rule", "finding", "risk", "mitre", "module")} for f in self.findings],
+            "vulnerable": is_vulnerable,
+            # Monitor runs cover a subset; empty sections above mean "not scanned" for the others
+            "modules": list(self.scanned_modules)
         }
-    }
-}'''
-            self.fixes.append({"desc": "Fix Unquoted Service Paths (Optimized)", "cmd": fix_code})
-
-    async def run_csharp_module(self, 
-            key_path: str = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\System", 
-            value_name: str = "EnableLUA", 
-            expected_val: str = "1") -> Dict[str, str]:
-        """Executes C# binary using Strategy"""
-        from .strategies import RegistryAuditStrategy
-        # Note: The strategy currently has hardcoded args for the demo, 
-        # but in a real refactor we might pass args to the strategy constructor.
-        # For this refactor, we'll rely on the default strategy behavior which matches the default args here.
-        # If dynamic args are needed, the Strategy should be instantiated with them.
-        
-        # Create a transient strategy instance if we need custom args? 
-        # For now, the prompt requirements were about "RegistryAuditStrategy" generally. 
-        # I'll stick to the default strategy implementation which does the UAC check.
-        
-        self.context.set_strategy(RegistryAuditStrategy())
-        results = await self.context.execute_scan()
-        
-        uac_result = results.get("UAC_Check", {})
-        uac_result = self.mitre_mapper.enrich_report(uac_result)
-        self.report_data["UAC_Check"] = uac_result
-        
-        # Analyze for fixes
-        if uac_result.get("Risk") == "HIGH" and "EnableLUA" in uac_result.get("Check", ""):
-             self.fixes.append({
-                "desc": "Enable UAC (Secure Desktop)",
-                "cmd": r'Set-ItemProperty -Path "HKLM:\SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\System" -Name "EnableLUA" -Value 1'
-            })
-
-        return uac_result
-
-    async def run_filesystem_module(self) -> Dict[str, Any]:
-        """Executes FileSystem check using Strategy"""
-        from .strategies import FileSystemStrategy
-        self.context.set_strategy(FileSystemStrategy())
-        results = await self.context.execute_scan()
-        
-        fs_result = results.get("FileSystem_Check", {})
-        fs_result = self.mitre_mapper.enrich_report(fs_result)
-        self.report_data["FileSystem_Check"] = fs_result
-        return fs_result
+
+    @staticmethod
+    def _fixes_from(findings: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        return [f["fix"] for f in findings if f.get("fix")]
+
+    def _add_fixes(self, fixes: List[Dict[str, str]]) -> None:
+        """Appends fixes, skipping ones already scheduled (several findings may share a fix)"""
+        scheduled = {f["desc"] for f in self.fixes}
+        for fix in fixes:
+            if fix["desc"] not in scheduled:
+                scheduled.add(fix["desc"])
+                self.fixes.append(fix)
+
+    def iter_remediation_content(self) -> Iterator[str]:
+        """Remediation script as text chunks, from the compiled (cached) template"""
+        from .remediation import iter_remediation
+        return iter_remediation(self.fixes, self.timestamp)
 
     def generate_remediation_content(self) -> str:
         """Generates remediation script content using template"""
-        if not self.fixes:
-            return ""
-        
-        template_path = os.path.join(settings.SCRIPTS_DIR, "remediation_template.ps1")
-        if not os.path.exists(template_path):
-            logger.error(f"Template not found: {template_path}")
-            # Fallback to simple string if template missing
-            return self._generate_fallback_remediation()
-
-        try:
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template = f.read()
-        except Exception as e:
-            logger.error(f"Error reading template: {e}")
-            return self._generate_fallback_remediation()
-        
-        fix_blocks = []
-        for i, fix in enumerate(self.fixes, 1):
-            block = f"""
-Write-Status "Applying Fix {i}: {fix['desc']}"
-try {{
-    {fix['cmd']}
-    Write-Status "Success: {fix['desc']}" "Green"
-}} catch {{
-    Write-Error "Failed to apply fix: $_"
-}}
-"""
-            fix_blocks.append(block)
-        
-        content = template.replace("{{ timestamp }}", self.timestamp)
-        content = content.replace("{{ fix_blocks }}", "\n".join(fix_blocks))
-        
-        return content
-
-    def _generate_fallback_remediation(self) -> str:
-        """Fallback generation if template is missing"""
-        content = []
-        content.append(f"# WINSEC DEFENDER REMEDIATION SCRIPT - {self.timestamp}")
-        content.append("# RUN AS ADMINISTRATOR")
-        for fix in self.fixes:
-            content.append(f"Write-Host 'Applying: {fix['desc']}'")
-            content.append(fix['cmd'])
-        return "\n".join(content)
+        with span("remediation", cat="fixes", fixes=len(self.fixes)):
+            return "".join(self.iter_remediation_content())
 
     def save_remediation_temp_file(self) -> str:
         """Saves content to a temp file and returns path"""
-        content = self.generate_remediation_content()
-        if not content:
+        if not self.fixes:
             return ""
             
         try:
             fd, path = tempfile.mkstemp(suffix=".ps1", prefix="REMEDIATION_")
             with os.fdopen(fd, 'w', encoding='utf-8') as f:
-                f.write(content)
+                f.writelines(self.iter_remediation_content())
             return path
         except Exception as e:
             logger.error(f"Failed to write temp remediation script: {e}")
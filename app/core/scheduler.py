@@ -0,0 +1,192 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Awaitable, Callable, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+class QueueFull(Exception):
+    """The scheduler already holds max_queue waiting scans"""
+
+class _Waiter:
+    __slots__ = ("job_id", "priority", "key", "queued_at", "future")
+
+    def __init__(self, job_id: str, priority: int, key: Optional[Hashable], future: asyncio.Future):
+        self.job_id = job_id
+        self.priority = priority
+        self.key = key
+        self.queued_at = time.time()
+        self.future = future
+
+class ScanScheduler:
+    """
+    Admission control for scans: at most `workers` scans run at once, the rest
+    wait in a priority queue (FIFO within a priority). Background jobs are
+    submitted with submit(); inline scans (e.g. SSE streams) wait for their
+    turn with `async with scheduler.slot(job_id)`. A pending job can carry a
+    de-duplication key, so identical scans requested while it waits are
+    served by the same job.
+    """
+    def __init__(self, workers: int = 2, max_queue: int = 100):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._heap: List[Tuple[int, int, str]] = []
+        self._waiting: Dict[str, _Waiter] = {}
+        self._running: Dict[str, float] = {}
+        self._keys: Dict[Hashable, str] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._seq = itertools.count()
+        # Queue wait of recently started jobs, for status reporting
+        self._waited: "OrderedDict[str, float]" = OrderedDict()
+        self._recent_waits: deque = deque(maxlen=100)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> None:
+        # Futures belong to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._heap, self._waiting, self._running, self._keys = [], {}, {}, {}
+            self._tasks = set()
+            self._loop = loop
+
+    def pending_job(self, key: Hashable) -> Optional[str]:
+        """Id of a queued (not yet started) job with this de-duplication key"""
+        return self._keys.get(key)
+
+    def would_wait(self) -> bool:
+        return len(self._running) >= self.workers or bool(self._waiting)
+
+    def _start(self, job_id: str, queued_at: Optional[float] = None) -> None:
+        now = time.time()
+        waited = now - queued_at if queued_at is not None else 0.0
+        self._running[job_id] = now
+        self._waited[job_id] = waited
+        self._recent_waits.append(waited)
+        while len(self._waited) > 1000:
+            self._waited.popitem(last=False)
+
+    def _enqueue(self, job_id: str, priority: str = "normal", key: Optional[Hashable] = None) -> Optional[_Waiter]:
+        """Takes a free slot (None) or queues the job; synchronous so bursts see each other"""
+        self._bind_loop()
+        if not self.would_wait():
+            self._start(job_id)
+            return None
+        if len(self._waiting) >= self.max_queue:
+            raise QueueFull(f"Scan queue is full ({self.max_queue} waiting)")
+        waiter = _Waiter(job_id, PRIORITIES.get(priority, PRIORITIES["normal"]), key, self._loop.create_future())
+        self._waiting[job_id] = waiter
+        if key is not None:
+            self._keys[key] = job_id
+        heapq.heappush(self._heap, (waiter.priority, next(self._seq), job_id))
+        logger.info(f"Scan {job_id} queued ({len(self._waiting)} waiting, {len(self._running)} running)")
+        return waiter
+
+    async def _wait(self, waiter: Optional[_Waiter]) -> None:
+        if waiter is None:
+            return
+        try:
+            await waiter.future
+        except BaseException:
+            # Cancelled while waiting (e.g. the client went away)
+            if self._waiting.get(waiter.job_id) is waiter:
+                self._forget(waiter)
+            elif waiter.job_id in self._running:
+                # Woken and cancelled at the same time: hand the slot on
+                self._release(waiter.job_id)
+            raise
+
+    def _forget(self, waiter: _Waiter) -> None:
+        # Heap entries are dropped lazily when they reach the top
+        del self._waiting[waiter.job_id]
+        if waiter.key is not None and self._keys.get(waiter.key) == waiter.job_id:
+            del self._keys[waiter.key]
+
+    def _release(self, job_id: str) -> None:
+        self._running.pop(job_id, None)
+        while self._heap and len(self._running) < self.workers:
+            _, _, next_id = heapq.heappop(self._heap)
+            waiter = self._waiting.get(next_id)
+            if waiter is None or waiter.future.done():
+                continue
+            self._forget(waiter)
+            # The slot is handed over directly, so a new arrival cannot take it first
+            self._start(next_id, waiter.queued_at)
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def _hold(self, waiter: Optional[_Waiter], job_id: str):
+        await self._wait(waiter)
+        try:
+            yield
+        finally:
+            self._release(job_id)
+
+    def slot(self, job_id: str, priority: str = "normal", key: Optional[Hashable] = None):
+        """Async context manager that waits for a free worker slot; raises QueueFull"""
+        return self._hold(self._enqueue(job_id, priority, key), job_id)
+
+    def submit(self, job_id: str, run: Callable[[], Awaitable[Any]], priority: str = "normal",
+               key: Optional[Hashable] = None) -> str:
+        """
+        Schedules run() as a background job and returns the id of the job that
+        will serve it: job_id, or an identical pending job when key matches.
+        Raises QueueFull when the queue is at max_queue.
+        """
+        self._bind_loop()
+        if key is not None and key in self._keys:
+            return self._keys[key]
+        # Queued right away, so the position and key are visible before the task runs
+        hold = self.slot(job_id, priority, key)
+
+        async def job():
+            async with hold:
+                await run()
+
+        def done(task: asyncio.Task) -> None:
+            self._tasks.discard(task)
+            # Cancelled before it first ran: the queue entry or slot is still held
+            waiter = self._waiting.get(job_id)
+            if waiter is not None:
+                self._forget(waiter)
+            elif job_id in self._running:
+                self._release(job_id)
+
+        task = self._loop.create_task(job())
+        self._tasks.add(task)
+        task.add_done_callback(done)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Live queue information for a job, or None if the scheduler does not know it"""
+        waiter = self._waiting.get(job_id)
+        if waiter is not None:
+            ahead = sum(1 for w in self._waiting.values()
+                        if (w.priority, w.queued_at) < (waiter.priority, waiter.queued_at))
+            return {
+                "queue_position": ahead + 1,
+                "queue_depth": len(self._waiting),
+                "queue_wait": round(time.time() - waiter.queued_at, 3)
+            }
+        if job_id in self._waited:
+            return {"queue_wait": round(self._waited[job_id], 3), "queue_depth": len(self._waiting)}
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        waits = list(self._recent_waits)
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "queue_depth": len(self._waiting),
+            "avg_queue_wait": round(sum(waits) / len(waits), 3) if waits else 0.0
+        }
+
+    async def drain(self) -> None:
+        """Waits for every submitted job to finish"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -0,0 +1,122 @@
+from pydantic_settings import BaseSettings
+from pydantic import Field
+import os
+import sys
+from typing import Dict
+import secrets
+import string
+
+class Settings(BaseSettings):
+    PROJECT_NAME: str = "WinSecDefender"
+    VERSION: str = "2.1.0"
+    
+    # Paths
+    BASE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ROOT_DIR: str = os.path.dirname(BASE_DIR)
+    SCRIPTS_DIR: str = os.path.join(ROOT_DIR, "scripts")
+    BIN_DIR: str = os.path.join(ROOT_DIR, "bin")
+    # Declarative check packs (*.json, *.yaml) compiled at startup
+    CHECKS_DIR: str = os.path.join(ROOT_DIR, "checks")
+    
+    # Logging
+    LOG_FILE: str = os.path.join(ROOT_DIR, "audit.log")
+    
+    # Security
+    # Default to "admin" if not set in .env
+    AUTH_USERNAME: str = Field(default="admin", env="WINSEC_ADMIN_USER")
+    # Default to None so we can detect if it's missing/default
+    AUTH_PASSWORD: str = Field(default="", env="WINSEC_ADMIN_PASSWORD")
+    
+    # SSL/TLS (Optional)
+    SSL_KEYFILE: str = ""
+    SSL_CERTFILE: str = ""
+    
+    # Registry audit: optional JSON list of extra checks, and timeout for the inspector
+    REGISTRY_BASELINE_FILE: str = ""
+    REGISTRY_TIMEOUT: float = 30.0
+    
+    # PowerShell worker pool (0 disables it: one powershell process per scan)
+    POWERSHELL_PATH: str = "powershell"
+    PS_POOL_SIZE: int = 2
+    PS_POOL_MAX_JOBS: int = 50
+    PS_TIMEOUT: float = 30.0
+    # Cap on stdout read from any scan subprocess (bytes); output past it is dropped
+    SUBPROCESS_MAX_OUTPUT: int = 16 * 1024 * 1024
+    
+    # File system audit: label -> file or directory (directories are walked), e.g.
+    # FS_AUDIT_PATHS='{"Hosts_File": "C:\\Windows\\System32\\drivers\\etc\\hosts", "Web_Root": "D:\\inetpub"}'
+    FS_AUDIT_PATHS: Dict[str, str] = {"Hosts_File": r"C:\Windows\System32\drivers\etc\hosts"}
+    FS_AUDIT_WORKERS: int = 0  # 0 = auto
+    FS_AUDIT_MAX_ENTRIES: int = 1_000_000
+    FS_AUDIT_MAX_FINDINGS: int = 500
+    # Unchanged directories are not re-listed for this long (seconds)
+    FS_AUDIT_RESCAN_AFTER: float = 3600.0
+    
+    # Result cache: per-strategy TTL overrides in seconds (0 disables), e.g.
+    # STRATEGY_CACHE_TTLS='{"ServiceConfigStrategy": 3600, "FileSystemStrategy": 0}'
+    STRATEGY_CACHE_TTLS: Dict[str, float] = {}
+    RESULT_CACHE_MAX_ENTRIES: int = 1024
+    
+    # Job Store: "memory" (per process) or "sqlite" (shared by all workers)
+    JOB_STORE_BACKEND: str = "memory"
+    JOB_STORE_PATH: str = os.path.join(ROOT_DIR, "jobs.db")
+    JOB_TTL_SECONDS: int = 86400
+    JOB_MAX_ENTRIES: int = 1000
+    
+    # Scan history: compressed host results kept for diffs between runs
+    HISTORY_ENABLED: bool = True
+    HISTORY_PATH: str = os.path.join(ROOT_DIR, "history.db")
+    HISTORY_MAX_PER_HOST: int = 500
+    
+    # Scanner Settings
+    TARGET_IP: str = "127.0.0.1"
+    # Fleet scans: max hosts scanned at once and max hosts per request
+    FLEET_MAX_HOSTS: int = 16
+    MAX_TARGETS: int = 1024
+    # Ports: "21,445,3389", ranges "1-1024", "topN" (N <= 105, the size of portscan.TOP_PORTS) or "all"
+    SCAN_PORTS: str = "21,445,3389"
+    # Workers per host; 0 = derive from the file-descriptor limit. Sockets open across all
+    # hosts of a fleet scan never exceed that limit either (see portscan.socket_slots)
+    PORT_SCAN_CONCURRENCY: int = 0
+    PORT_SCAN_TIMEOUT: float = 0.5
+    PORT_SCAN_RETRIES: int = 1
+    # Max strategies running at once and per-strategy timeout (seconds) in concurrent mode
+    SCAN_CONCURRENCY: int = 4
+    STRATEGY_TIMEOUT: float = 60.0
+    # Scan results younger than this (seconds) are reused by /api/sanitize
+    SANITIZE_MAX_AGE: int = 900
+    # Scan jobs running at once (API); further jobs wait in a priority queue of at most SCAN_QUEUE_MAX
+    SCAN_WORKERS: int = 2
+    SCAN_QUEUE_MAX: int = 100
+    # Monitor mode (app.cli --monitor): +/- fraction of random jitter on each interval,
+    # and window (seconds) over which first runs are spread
+    MONITOR_JITTER: float = 0.1
+    MONITOR_SPLAY: float = 60.0
+    # Prometheus text endpoint at /metrics (behind the same Basic auth as the API)
+    METRICS_ENABLED: bool = True
+    # Chrome-trace JSON of every API scan (chrome://tracing, Perfetto); /api/scan?trace=true does it per scan
+    TRACE_SCANS: bool = False
+    TRACE_DIR: str = os.path.join(ROOT_DIR, "traces")
+    
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+def load_settings() -> Settings:
+    """Reads the environment and .env; called once, on first use of config.settings"""
+    settings = Settings()
+
+    # Security Check: Generate random password if not set or default
+    if not settings.AUTH_PASSWORD or settings.AUTH_PASSWORD == "admin123":
+        # Generate a strong random password
+        chars = string.ascii_letters + string.digits + "!@#$%"
+        generated_pwd = ''.join(secrets.choice(chars) for _ in range(16))
+        settings.AUTH_PASSWORD = generated_pwd
+
+        # stderr, so it never ends up in the CLI's JSON output
+        print("\n" + "="*60, file=sys.stderr)
+        print("WARNING: No secure password found in .env (WINSEC_ADMIN_PASSWORD).", file=sys.stderr)
+        print(f"Generated Temporary Admin Password: {generated_pwd}", file=sys.stderr)
+        print("PLEASE SAVE THIS PASSWORD OR CONFIGURE .env IMMEDIATELEY.", file=sys.stderr)
+        print("="*60 + "\n", file=sys.stderr)
+    return settings
@@ -2,38 +2,102 @@ import asyncio
 import os
 import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from .interfaces import IScanStrategy
 from .config import settings
+from .portscan import PortScanner, parse_ports, describe_ports
+from .pspool import PowerShellPool, PowerShellStartError, get_powershell_pool
+from .subprocess_runner import run_ndjson, split_ndjson
+from .tracing import span
+from .fsaudit import FileSystemAuditor, get_fs_auditor
+from .native_build import get_native_build
 
 logger = logging.getLogger(__name__)
 
+def _stat_token(path: str) -> str:
+    """Change token from a file's metadata (mode, size, mtime), without reading it"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{st.st_mode}:{st.st_size}:{st.st_mtime_ns}"
+
 class NetworkScanStrategy(IScanStrategy):
+    def __init__(self, ports: Optional[str] = None, concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None, retries: Optional[int] = None):
+        # Port spec accepts lists, ranges, "topN" and "all" (see portscan.parse_ports)
+        self.ports = parse_ports(ports or settings.SCAN_PORTS)
+        self.scanner = PortScanner(
+            concurrency=concurrency or settings.PORT_SCAN_CONCURRENCY or None,
+            timeout=timeout or settings.PORT_SCAN_TIMEOUT,
+            retries=settings.PORT_SCAN_RETRIES if retries is None else retries
+        )
+
+    def cache_params(self) -> Tuple:
+        return (tuple(self.ports),)
+
     async def scan(self, target: str) -> Dict[str, Any]:
-        logger.info(f"Scanning ports on {target}...")
-        common_ports = {
-            21: "FTP (File Transfer)",
-            445: "SMB (Windows File Sharing)",
-            3389: "RDP (Remote Desktop)"
-        }
-        
-        async def check_port(port, desc):
-            try:
-                 future = asyncio.open_connection(target, port)
-                 reader, writer = await asyncio.wait_for(future, timeout=0.5)
-                 writer.close()
-                 await writer.wait_closed()
-                 return {"port": port, "service": desc, "status": "OPEN"}
-            except (asyncio.TimeoutError, ConnectionRefusedError, OSError):
-                return None
-
-        tasks = [check_port(port, desc) for port, desc in common_ports.items()]
-        results = await asyncio.gather(*tasks)
-        
-        open_ports = [r for r in results if r is not None]
-        return {"Network_Scan": open_ports}
+        logger.info(f"Scanning {len(self.ports)} ports on {target}...")
+        open_ports = await self.scanner.scan(target, self.ports)
+        return {"Network_Scan": describe_ports(open_ports)}
 
 class ServiceConfigStrategy(IScanStrategy):
+    def __init__(self, pool: Optional[PowerShellPool] = None):
+        # Persistent interpreters (see pspool.py); the default pool is None when PS_POOL_SIZE=0,
+        # which falls back to one powershell process per scan
+        self.pool = pool if pool is not None else get_powershell_pool()
+
+    # SMBv1, service paths and the last HotFix rarely change between scans
+    cache_ttl = 900
+    local_only = True
+
+    async def change_token(self, target: str) -> Optional[str]:
+        # A new audit script means new checks; the results themselves need PowerShell to probe
+        return _stat_token(os.path.join(settings.SCRIPTS_DIR, "audit_script.ps1"))
+
+    @staticmethod
+    def _parse_output(decoded_out: str) -> Dict[str, Any]:
+        """Legacy parsing for output that is not one JSON object per line"""
+        decoded_out = decoded_out.strip()
+        try:
+            # Robustness: Find the start and end of the JSON object
+            # Legacy systems might output extra text or banners
+            json_start = decoded_out.find('{')
+            json_end = decoded_out.rfind('}')
+            
+            if json_start != -1 and json_end != -1:
+                json_str = decoded_out[json_start:json_end+1]
+                ps_data = json.loads(json_str)
+                return {"System_Config": ps_data}
+            elif not decoded_out:
+                 return {"error": "Empty output"}
+            else:
+                # Try direct load if no brackets found (unlikely for object but possible for single value)
+                ps_data = json.loads(decoded_out)
+                return {"System_Config": ps_data}
+
+        except json.JSONDecodeError:
+            show_snippet = decoded_out[:200] + "..." if len(decoded_out) > 200 else decoded_out
+            logger.error(f"Failed to decode PowerShell JSON output: {show_snippet}")
+            return {"error": "Invalid JSON output", "raw": show_snippet}
+
+    @classmethod
+    def _from_output(cls, records: List[Dict[str, Any]], text: List[str], partial: Optional[str] = None) -> Dict[str, Any]:
+        if records:
+            # The script may emit its sections as separate NDJSON records
+            ps_data: Dict[str, Any] = {}
+            for record in records:
+                ps_data.update(record)
+            if partial:
+                # Keeps what was collected; the error keeps it out of the result cache
+                ps_data.setdefault("error", f"{partial} (partial results)")
+            return {"System_Config": ps_data}
+        result = cls._parse_output("\n".join(text))
+        if partial and "error" in result:
+            # Incomplete text is the likely reason the legacy parse failed
+            result["error"] = f"{partial} ({result['error']})"
+        return result
+
     async def scan(self, target: str) -> Dict[str, Any]:
         ps_script_path = os.path.join(settings.SCRIPTS_DIR, "audit_script.ps1")
         logger.info(f"Running PowerShell: {ps_script_path}")
@@ -42,130 +106,193 @@ class ServiceConfigStrategy(IScanStrategy):
             logger.error(f"Script not found: {ps_script_path}")
             return {"error": "Script not found"}
 
-        try:
-            # SAFETY: Add timeout to prevent hanging on legacy systems
-            process = await asyncio.create_subprocess_exec(
-                "powershell", "-ExecutionPolicy", "Bypass", "-File", ps_script_path,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
+        if self.pool is not None and not self.pool.disabled:
             try:
-                # 30 second timeout for checking config
-                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=30.0)
+                output = await self.pool.run(ps_script_path, timeout=settings.PS_TIMEOUT)
             except asyncio.TimeoutError:
-                process.kill()
                 logger.error("PowerShell execution timed out")
                 return {"error": "Execution timed out"}
-            
-            if stdout:
-                try:
-                    # Attempt to decode using system encoding, fallback to utf-8 with replacement
-                    try:
-                        decoded_out = stdout.decode("utf-8").strip()
-                    except UnicodeDecodeError:
-                        decoded_out = stdout.decode("mbcs", errors="replace").strip()
-                    
-                    # Robustness: Find the start and end of the JSON object
-                    # Legacy systems might output extra text or banners
-                    json_start = decoded_out.find('{')
-                    json_end = decoded_out.rfind('}')
-                    
-                    if json_start != -1 and json_end != -1:
-                        json_str = decoded_out[json_start:json_end+1]
-                        ps_data = json.loads(json_str)
-                        return {"System_Config": ps_data}
-                    elif not decoded_out:
-                         return {"error": "Empty output"}
-                    else:
-                        # Try direct load if no brackets found (unlikely for object but possible for single value)
-                        ps_data = json.loads(decoded_out)
-                        return {"System_Config": ps_data}
-
-                except json.JSONDecodeError:
-                    show_snippet = decoded_out[:200] + "..." if len(decoded_out) > 200 else decoded_out
-                    logger.error(f"Failed to decode PowerShell JSON output: {show_snippet}")
-                    return {"error": "Invalid JSON output", "raw": show_snippet}
-            else:
-                 err_msg = stderr.decode() if stderr else "No output"
-                 logger.error(f"PowerShell Error: {err_msg}")
-                 return {"error": err_msg}
+            except PowerShellStartError as e:
+                # e.g. PowerShell v2: the worker needs v3+, the audit script itself does not
+                logger.warning(f"PowerShell pool unavailable ({e}); running scripts one process at a time")
+                self.pool.disabled = True
+                output = None
+            except Exception as e:
+                logger.error(f"PowerShell execution failed: {str(e)}")
+                return {"error": str(e)}
+            if output is not None:
+                if not output.strip():
+                    return {"error": "No output"}
+                with span("parse", cat="parse", bytes=len(output)):
+                    return self._from_output(*split_ndjson(output))
 
+        try:
+            # SAFETY: timeout and output cap prevent hanging or flooding on legacy systems
+            output = await run_ndjson(
+                [settings.POWERSHELL_PATH, "-ExecutionPolicy", "Bypass", "-File", ps_script_path],
+                timeout=settings.PS_TIMEOUT,
+                max_output=settings.SUBPROCESS_MAX_OUTPUT
+            )
         except Exception as e:
             logger.error(f"PowerShell execution failed: {str(e)}")
             return {"error": str(e)}
 
+        if output.timed_out and not output.records:
+            logger.error("PowerShell execution timed out")
+            return {"error": "Execution timed out"}
+        if not output.records and not output.text:
+            err_msg = output.stderr.strip() or "No output"
+            logger.error(f"PowerShell Error: {err_msg}")
+            return {"error": err_msg}
+        # Dropped banner text only matters when the legacy parser has to read it
+        cut = output.truncated or (output.text_truncated and not output.records)
+        partial = "Execution timed out" if output.timed_out else "Output truncated" if cut else None
+        with span("parse", cat="parse", records=len(output.records)):
+            return self._from_output(output.records, output.text, partial)
+
 class RegistryAuditStrategy(IScanStrategy):
+    # Default check for UAC (Admin Approval Mode)
+    UAC_CHECK = {
+        "name": "UAC_Check",
+        "key": r"SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\System",
+        "value": "EnableLUA",
+        "expected": "1"
+    }
+
+    def __init__(self, checks: Optional[List[Dict[str, str]]] = None,
+                 exe_path: Optional[str] = None, timeout: Optional[float] = None):
+        # Checks: {"name", "key", "value", "expected", optional "risk"}; all run in one process
+        self.checks = checks if checks is not None else [self.UAC_CHECK] + self.load_baseline(settings.REGISTRY_BASELINE_FILE)
+        self.exe_path = exe_path or os.path.join(settings.BIN_DIR, "RegistryInspector.exe")
+        self.timeout = timeout or settings.REGISTRY_TIMEOUT
+
+    cache_ttl = 300
+    local_only = True
+
+    def cache_params(self) -> Tuple:
+        return (json.dumps(self.checks, sort_keys=True),)
+
+    async def change_token(self, target: str) -> Optional[str]:
+        # A rebuilt inspector may report differently; a finished build drops "warming up" results
+        return f"{_stat_token(self.exe_path)}|{get_native_build().state}"
+
+    @staticmethod
+    def load_baseline(path: str) -> List[Dict[str, str]]:
+        """Loads a JSON list of registry checks (CIS-style baseline)"""
+        if not path:
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load registry baseline {path}: {e}")
+            return []
+
+    @staticmethod
+    def _to_result(check: Dict[str, str], data: Dict[str, Any]) -> Dict[str, Any]:
+        status_output = data.get("status", "UNKNOWN")
+        if status_output == "SECURE":
+            risk = "LOW"
+        elif status_output == "VULNERABLE":
+            risk = check.get("risk", "HIGH")
+        else:
+            risk = "UNKNOWN" # ERROR case
+        result = {"Status": status_output, "Risk": risk, "Check": f"{check['key']}\\{check['value']}"}
+        if data.get("message"):
+            result["Message"] = data["message"]
+        return result
+
+    async def _run_batch(self) -> Dict[str, Dict[str, Any]]:
+        """Sends every check on stdin and converts each JSON result line as it is produced"""
+        checks = {str(i): check for i, check in enumerate(self.checks)}
+        results: Dict[str, Dict[str, Any]] = {}
+
+        def on_record(data: Dict[str, Any]) -> None:
+            # Inspectors without batch support answer the default check without an id
+            check_id = str(data.get("id", "0"))
+            if check_id in checks:
+                results[checks[check_id]["name"]] = self._to_result(checks[check_id], data)
+
+        requests = (
+            json.dumps({"id": check_id, "key": check["key"], "value": check["value"], "expected": check["expected"]})
+            for check_id, check in checks.items()
+        )
+        output = await run_ndjson(
+            [self.exe_path, "--batch"],
+            stdin_lines=requests,
+            timeout=self.timeout,
+            max_output=settings.SUBPROCESS_MAX_OUTPUT,
+            on_record=on_record
+        )
+        if output.partial:
+            logger.error(f"Registry inspector stopped early ({len(results)}/{len(checks)} checks done)")
+
+        for check in checks.values():
+            if check["name"] not in results:
+                results[check["name"]] = self._legacy_result(check, output.text)
+        return results
+
+    def _legacy_result(self, check: Dict[str, str], noise: List[str]) -> Dict[str, Any]:
+        """Fallback to legacy text parsing or just report raw"""
+        output_str = "\n".join(noise)
+        if output_str:
+            logger.warning(f"Failed to parse C# JSON: {output_str[:200]}")
+        if len(self.checks) == 1 and "VULNERABLE" in output_str:
+            return {"Status": "VULNERABLE", "Risk": check.get("risk", "HIGH"), "Check": f"{check['key']}\\{check['value']}"}
+        if len(self.checks) == 1 and "SECURE" in output_str:
+            return {"Status": "SECURE", "Risk": "LOW", "Check": f"{check['key']}\\{check['value']}"}
+        status = f"Raw: {output_str[:200]}" if output_str else "No result"
+        return {"Status": status, "Risk": "UNKNOWN", "Check": f"{check['key']}\\{check['value']}"}
+
     async def scan(self, target: str) -> Dict[str, Any]:
-        # Note: target IP is ignored here as this runs locally, but interface requires it
-        exe_path = os.path.join(settings.BIN_DIR, "RegistryInspector.exe")
-        logger.info(f"Running C# Registry Inspector: {exe_path}")
+        # target is ignored: the inspector reads the local registry (local_only)
+        logger.info(f"Running C# Registry Inspector: {self.exe_path} ({len(self.checks)} checks)")
         
-        if not os.path.exists(exe_path):
+        if get_native_build().is_building(self.exe_path):
+            return {"UAC_Check": {"Status": "Warming up", "Risk": "Warming Up - Inspector Compiling"}}
+
+        if not os.path.exists(self.exe_path):
              return {"UAC_Check": {"Status": "Error", "Risk": "Binary Missing - Please Compile"}}
 
         try:
-            # Default check for UAC
-            key_path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\System"
-            value_name = "EnableLUA"
-            expected_val = "1"
-
-            process = await asyncio.create_subprocess_exec(
-                exe_path, key_path, value_name, expected_val,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            output_str = stdout.decode().strip()
-            # Try to find JSON in output (lines might contain noise)
-            status_output = "UNKNOWN"
-            risk = "UNKNOWN"
-            
-            try:
-                # Find the last line that looks like JSON
-                import json
-                last_line = output_str.splitlines()[-1] if output_str else ""
-                data = json.loads(last_line)
-                
-                status_output = data.get("status", "UNKNOWN")
-                if status_output == "SECURE":
-                    risk = "LOW"
-                elif status_output == "VULNERABLE":
-                    risk = "HIGH"
-                else:
-                    risk = "UNKNOWN" # ERROR case
-                    
-            except (json.JSONDecodeError, IndexError):
-                # Fallback to legacy text parsing or just report raw
-                logger.warning(f"Failed to parse C# JSON: {output_str}")
-                if "VULNERABLE" in output_str:
-                    status_output = "VULNERABLE"
-                    risk = "HIGH"
-                elif "SECURE" in output_str:
-                    status_output = "SECURE"
-                    risk = "LOW"
-                else: 
-                    status_output = f"Raw: {output_str}"
-
-            result = {"Status": status_output, "Risk": risk, "Check": f"{key_path}\\{value_name}"}
-            return {"UAC_Check": result}
+            results = await self._run_batch()
         except Exception as e:
             return {"UAC_Check": {"Status": "Error", "Risk": str(e)}}
 
+        output = {}
+        if "UAC_Check" in results:
+            output["UAC_Check"] = results.pop("UAC_Check")
+        if results:
+            output["Registry_Baseline"] = results
+        return output
+
 class FileSystemStrategy(IScanStrategy):
+    cache_ttl = 300
+    local_only = True
+
+    def __init__(self, paths: Optional[Dict[str, str]] = None, auditor: Optional[FileSystemAuditor] = None):
+        # Label -> critical file or directory tree (see FS_AUDIT_PATHS)
+        self.paths = paths if paths is not None else dict(settings.FS_AUDIT_PATHS)
+        # Shared auditor by default, so unchanged directories are skipped on the next run
+        self.auditor = auditor or get_fs_auditor()
+
+    def cache_params(self) -> Tuple:
+        return (json.dumps(self.paths, sort_keys=True),)
+
+    async def change_token(self, target: str) -> Optional[str]:
+        # Permission or content changes of the configured paths show up in their stat
+        return "|".join(_stat_token(path) for path in self.paths.values())
+
     async def scan(self, target: str) -> Dict[str, Any]:
-        logger.info("Checking critical file permissions...")
-        # Simple check: Is hosts file writable?
-        hosts_path = r"C:\Windows\System32\drivers\etc\hosts"
+        logger.info(f"Checking file permissions of {len(self.paths)} critical paths...")
         results = {}
-        
-        if os.path.exists(hosts_path):
-            if os.access(hosts_path, os.W_OK):
-                results["Hosts_File"] = {"Status": "Writable", "Risk": "HIGH", "Path": hosts_path}
-            else:
-                results["Hosts_File"] = {"Status": "Secure", "Risk": "LOW", "Path": hosts_path}
-        else:
-             results["Hosts_File"] = {"Status": "Missing", "Risk": "UNKNOWN", "Path": hosts_path}
-             
+        stats = FileSystemAuditor.new_stats()
+        async for label, finding in self.auditor.audit(self.paths, stats):
+            if finding["Risk"] == "HIGH":
+                logger.warning(f"File system finding: {finding['Status']} {finding['Path']}")
+            results[label] = finding
+
+        if stats["Directories"]:
+            results["Audit_Summary"] = {"Status": "Truncated" if stats["Truncated"] else "Complete",
+                                        "Risk": "INFO", **stats}
         return {"FileSystem_Check": results}
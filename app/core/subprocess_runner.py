@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from .metrics import SUBPROCESS_SPAWNS, SUBPROCESS_DURATION, program_name
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+def decode_line(raw: bytes) -> str:
+    # Legacy Windows tools write in the ANSI code page rather than UTF-8
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("mbcs" if os.name == "nt" else "latin-1", errors="replace")
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """The JSON object on line, or None for anything else (banners, text, partial JSON)"""
+    if not line.startswith("{"):
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return record if isinstance(record, dict) else None
+
+def split_ndjson(text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Splits already captured output into JSON records and other non-empty lines"""
+    records, other = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        record = parse_line(line)
+        if record is None:
+            other.append(line)
+        else:
+            records.append(record)
+    return records, other
+
+def _kill(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+class ProcessOutput:
+    """
+    What a subprocess printed. Partial when it timed out, hit the output cap
+    or printed more non-JSON text than is kept; records read until then are
+    kept either way.
+    """
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        # Non-JSON stdout lines (capped), for legacy text parsing
+        self.text: List[str] = []
+        self.stderr = ""
+        self.returncode: Optional[int] = None
+        self.timed_out = False
+        self.truncated = False
+        # Non-JSON lines were dropped after max_text characters (the process kept running)
+        self.text_truncated = False
+        self.bytes_read = 0
+        # Time spent decoding and parsing lines (and in on_record), interleaved with reading
+        self.parse_seconds = 0.0
+
+    @property
+    def partial(self) -> bool:
+        return self.timed_out or self.truncated or self.text_truncated
+
+async def run_ndjson(command: Sequence[str], stdin_lines: Optional[Iterable[str]] = None,
+                     timeout: float = 30.0, max_output: int = 16 * 1024 * 1024, max_text: int = 64 * 1024,
+                     on_record: Optional[Callable[[Dict[str, Any]], None]] = None) -> ProcessOutput:
+    """
+    Runs command and parses its stdout as NDJSON while it is being printed.
+    Each record is handed to on_record as soon as its line arrives (and not
+    retained), or collected in output.records when no callback is given.
+    stdin_lines are written concurrently with reading, so a full pipe cannot
+    deadlock. Reading stops, and the process is killed, once max_output bytes
+    have been read or timeout seconds have passed.
+    """
+    with span(f"subprocess:{program_name(command)}", cat="subprocess") as trace_args:
+        output = await _run_ndjson(command, stdin_lines, timeout, max_output, max_text, on_record)
+        trace_args.update(returncode=output.returncode, bytes=output.bytes_read, records=len(output.records),
+                          parse_ms=round(output.parse_seconds * 1000, 3), partial=output.partial)
+    return output
+
+async def _run_ndjson(command: Sequence[str], stdin_lines: Optional[Iterable[str]] = None,
+                      timeout: float = 30.0, max_output: int = 16 * 1024 * 1024, max_text: int = 64 * 1024,
+                      on_record: Optional[Callable[[Dict[str, Any]], None]] = None) -> ProcessOutput:
+    output = ProcessOutput()
+    program = program_name(command)
+    started = time.perf_counter()
+    with span("spawn", cat="subprocess", program=program):
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE if stdin_lines is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=max_output
+        )
+    SUBPROCESS_SPAWNS.inc(program=program)
+    text_size = 0
+
+    async def feed():
+        try:
+            for line in stdin_lines:
+                process.stdin.write((line.rstrip("\n") + "\n").encode("utf-8"))
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            process.stdin.close()
+
+    async def collect():
+        nonlocal text_size
+        while True:
+            try:
+                raw = await process.stdout.readline()
+            except ValueError:
+                # A single line longer than max_output
+                output.truncated = True
+                _kill(process)
+                return
+            if not raw:
+                return
+            output.bytes_read += len(raw)
+            if output.bytes_read > max_output:
+                output.truncated = True
+                # Stop the producer so stderr reaches EOF too
+                _kill(process)
+                return
+            parse_started = time.perf_counter()
+            line = decode_line(raw).strip()
+            if line:
+                record = parse_line(line)
+                if record is None:
+                    if text_size < max_text:
+                        output.text.append(line)
+                        text_size += len(line)
+                    else:
+                        output.text_truncated = True
+                elif on_record is not None:
+                    on_record(record)
+                else:
+                    output.records.append(record)
+            output.parse_seconds += time.perf_counter() - parse_started
+
+    async def drain_stderr():
+        chunks, size = [], 0
+        while True:
+            chunk = await process.stderr.read(65536)
+            if not chunk:
+                break
+            if size < max_text:
+                chunks.append(chunk)
+                size += len(chunk)
+        output.stderr = decode_line(b"".join(chunks))[:max_text]
+
+    tasks = [collect(), drain_stderr()]
+    if stdin_lines is not None:
+        tasks.append(feed())
+    finished = False
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=timeout)
+        finished = not output.truncated
+    except asyncio.TimeoutError:
+        output.timed_out = True
+    finally:
+        # Timed out, over the cap or cancelled: do not leave the process behind
+        if not finished:
+            _kill(process)
+        output.returncode = await process.wait()
+        SUBPROCESS_DURATION.observe(time.perf_counter() - started, program=program)
+
+    if output.truncated:
+        logger.warning(f"{command[0]} exceeded {max_output} bytes of output, stopped reading")
+    if output.text_truncated:
+        logger.warning(f"{command[0]} printed more than {max_text} characters of non-JSON text, kept the first lines")
+    if output.timed_out:
+        logger.error(f"{command[0]} timed out after {timeout}s")
+    return output
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["Tracer"]] = ContextVar("winsec_tracer", default=None)
+
+class Tracer:
+    """
+    Collects spans as Chrome trace "complete" events (chrome://tracing,
+    Perfetto, speedscope). Each asyncio task gets its own track, so strategies
+    and hosts running concurrently show up side by side instead of overlapping.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._tracks: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _track(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        owner = id(task) if task is not None else threading.get_ident()
+        with self._lock:
+            track = self._tracks.get(owner)
+            if track is None:
+                track = self._tracks[owner] = len(self._tracks) + 1
+                label = task.get_name() if task is not None else threading.current_thread().name
+                self.events.append({"ph": "M", "name": "thread_name", "pid": os.getpid(), "tid": track,
+                                    "args": {"name": label}})
+        return track
+
+    def _now_us(self) -> float:
+        return round((time.perf_counter() - self._origin) * 1_000_000, 1)
+
+    @contextmanager
+    def span(self, name: str, cat: str = "scan", **args: Any) -> Iterator[Dict[str, Any]]:
+        """Records name around the block; the yielded dict can take extra args before it closes"""
+        track = self._track()
+        start = self._now_us()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            event = {"ph": "X", "name": name, "cat": cat, "ts": start, "dur": round(self._now_us() - start, 1),
+                     "pid": os.getpid(), "tid": track}
+            if args:
+                event["args"] = {k: v if isinstance(v, (int, float, bool, str)) or v is None else str(v)
+                                 for k, v in args.items()}
+            with self._lock:
+                self.events.append(event)
+
+    def instant(self, name: str, cat: str = "scan", **args: Any) -> None:
+        event = {"ph": "i", "s": "t", "name": name, "cat": cat, "ts": self._now_us(),
+                 "pid": os.getpid(), "tid": self._track()}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "traceEvents": [{"ph": "M", "name": "process_name", "pid": os.getpid(), "args": {"name": self.name}}]
+                           + self.events,
+            "displayTimeUnit": "ms",
+        }
+
+    def save(self, path: str) -> str:
+        """Writes the trace atomically and returns the path"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_json(), f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return path
+
+def current_tracer() -> Optional[Tracer]:
+    return _current.get()
+
+def span(name: str, cat: str = "scan", **args: Any):
+    """Span in the active trace; a no-op when tracing is off"""
+    tracer = _current.get()
+    if tracer is None:
+        return nullcontext({})
+    return tracer.span(name, cat, **args)
+
+def mark(name: str, cat: str = "scan", **args: Any) -> None:
+    """Instant event in the active trace, if any"""
+    tracer = _current.get()
+    if tracer is not None:
+        tracer.instant(name, cat, **args)
+
+@contextmanager
+def trace(name: str, path: Optional[str] = None) -> Iterator[Tracer]:
+    """
+    Activates a tracer for the block (and for tasks it starts) and, when path
+    is given, writes the Chrome trace JSON there on the way out, even if the
+    block failed.
+    """
+    tracer = Tracer(name)
+    token = _current.set(tracer)
+    try:
+        with tracer.span(name, cat="trace"):
+            yield tracer
+    finally:
+        _current.reset(token)
+        if path:
+            try:
+                tracer.save(path)
+                logger.info(f"Trace written to {path} ({len(tracer.events)} events)")
+            except OSError as e:
+                logger.error(f"Could not write trace {path}: {e}")
@@ -35,22 +35,17 @@ app.include_router(router)
 
 @app.on_event("startup")
 async def startup_check():
-    bin_path = os.path.join(settings.BIN_DIR, "RegistryInspector.exe")
-    if not os.path.exists(bin_path):
-        logger.warning("RegistryInspector.exe not found. Attempting to build...")
-        try:
-            # Append root dir to sys.path to ensure build.py can be imported if needed
-            if settings.ROOT_DIR not in sys.path:
-                sys.path.append(settings.ROOT_DIR)
-            import build
-            if build.compile_csharp():
-                logger.info("RegistryInspector.exe built successfully.")
-            else:
-                logger.error("Failed to build RegistryInspector.exe. C# Strategy will be unavailable.")
-        except ImportError:
-            logger.error("Could not import build.py. Please run 'python build.py' manually.")
-        except Exception as e:
-            logger.error(f"Error during startup build: {e}")
+    # Compiles RegistryInspector.exe in the background (only when its source changed);
+    # the registry strategy reports "warming up" until it is ready
+    from app.core.native_build import get_native_build
+    get_native_build().start()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    from app.core.pspool import get_powershell_pool
+    pool = get_powershell_pool()
+    if pool is not None:
+        await pool.close()
 
 if __name__ == "__main__":
     print(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
@@ -1,39 +1,126 @@
+import argparse
+import hashlib
+import json
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
+import time
 import logging
 
 # Configure logging for build script
 logging.basicConfig(level=logging.INFO, format="[BUILD] %(message)s")
 logger = logging.getLogger("build")
 
-def compile_csharp():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    scripts_dir = os.path.join(base_dir, "scripts")
-    bin_dir = os.path.join(base_dir, "bin")
-    
-    source_file = os.path.join(scripts_dir, "RegistryInspector.cs")
-    output_file = os.path.join(bin_dir, "RegistryInspector.exe")
-    
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILE = os.path.join(BASE_DIR, "scripts", "RegistryInspector.cs")
+OUTPUT_FILE = os.path.join(BASE_DIR, "bin", "RegistryInspector.exe")
+MANIFEST_NAME = "build_manifest.json"
+DEFAULT_CSC = r"C:\Windows\Microsoft.NET\Framework64\v4.0.30319\csc.exe"
+# System.Web.Extensions provides the JSON serializer used by batch mode
+CSC_FLAGS = ["/r:System.Web.Extensions.dll"]
+
+def find_compiler() -> str:
+    """CSC_PATH (e.g. a stub compiler in tests) wins over the .NET Framework csc and 'csc' in PATH"""
+    configured = os.environ.get("CSC_PATH")
+    if configured:
+        return configured
+    if os.path.exists(DEFAULT_CSC):
+        return DEFAULT_CSC
+    # Try finding newer version or generic
+    logger.warning("Default csc.exe not found. Trying 'csc' in PATH.")
+    return shutil.which("csc") or "csc"
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_hash(source_file: str) -> str:
+    """Hash of the source and the flags it is compiled with; either changing means a rebuild"""
+    return hashlib.sha256(f"{file_sha256(source_file)}|{' '.join(CSC_FLAGS)}".encode("utf-8")).hexdigest()
+
+def manifest_path(output_file: str) -> str:
+    return os.path.join(os.path.dirname(output_file), MANIFEST_NAME)
+
+def load_manifest(output_file: str) -> dict:
+    try:
+        with open(manifest_path(output_file), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(output_file: str, manifest: dict) -> None:
+    path = manifest_path(output_file)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def _record_build(source_file: str, output_file: str, compiler: str) -> None:
+    """Stamps output_file as compiled from source_file; only called right after a compile"""
+    manifest = load_manifest(output_file)
+    manifest[os.path.basename(output_file)] = {
+        "source": os.path.relpath(source_file, os.path.dirname(output_file)),
+        "source_sha256": source_hash(source_file),
+        "output_sha256": file_sha256(output_file),
+        "compiler": compiler,
+        "built_at": time.time()
+    }
+    _save_manifest(output_file, manifest)
+
+def needs_build(source_file: str = SOURCE_FILE, output_file: str = OUTPUT_FILE) -> bool:
+    """
+    True if the output is missing, or the manifest says it was built from
+    another source or is no longer the file that build produced. An output
+    with no manifest entry (e.g. built before manifests existed) is stale:
+    nothing says which source it came from.
+    """
+    if not os.path.exists(output_file):
+        return True
+    entry = load_manifest(output_file).get(os.path.basename(output_file))
+    if not entry:
+        return True
+    if not os.path.exists(source_file):
+        # Nothing to rebuild from; keep the binary we have
+        return False
+    try:
+        return entry.get("source_sha256") != source_hash(source_file) or \
+            entry.get("output_sha256") != file_sha256(output_file)
+    except OSError:
+        return True
+
+def compile_csharp(force: bool = False, source_file: str = SOURCE_FILE, output_file: str = OUTPUT_FILE) -> bool:
+    bin_dir = os.path.dirname(output_file)
     if not os.path.exists(bin_dir):
         os.makedirs(bin_dir)
-        
+
     if not os.path.exists(source_file):
         logger.error(f"Source file not found: {source_file}")
         return False
 
-    # Check for csc.exe (C# Compiler)
-    csc_path = r"C:\Windows\Microsoft.NET\Framework64\v4.0.30319\csc.exe"
-    if not os.path.exists(csc_path):
-        # Try finding newer version or generic
-        logger.warning("Default csc.exe not found. Trying 'csc' in PATH.")
-        csc_path = "csc"
+    if not force and not needs_build(source_file, output_file):
+        logger.info(f"{os.path.basename(output_file)} is up to date.")
+        return True
+
+    csc_path = find_compiler()
+    # Build next to the target and swap it in, so a running scan never sees a half-written binary
+    base, ext = os.path.splitext(output_file)
+    tmp_output = f"{base}.{os.getpid()}.tmp{ext}"
 
     logger.info(f"Compiling {source_file} -> {output_file}...")
     try:
-        cmd = [csc_path, f"/out:{output_file}", source_file]
+        cmd = [csc_path, f"/out:{tmp_output}", *CSC_FLAGS, source_file]
         # Capture output to avoid cluttering stdout unless error
-        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if not os.path.exists(tmp_output):
+            logger.error(f"Compiler produced no output: {tmp_output}")
+            return False
+        os.replace(tmp_output, output_file)
+        _record_build(source_file, output_file, csc_path)
         logger.info("Compilation successful.")
         return True
     except subprocess.CalledProcessError as e:
@@ -43,9 +130,18 @@ def compile_csharp():
         return False
     except FileNotFoundError:
         logger.error("csc compiler not found in PATH or standard location.")
-        logger.error("Please install .NET Framework or add csc to PATH.")
+        logger.error("Please install .NET Framework or add csc to PATH (or set CSC_PATH).")
         return False
+    finally:
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
 
 if __name__ == "__main__":
-    if not compile_csharp():
+    parser = argparse.ArgumentParser(description="Builds bin/RegistryInspector.exe when its source changed")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the manifest says it is up to date")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a rebuild is needed, without building")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(1 if needs_build() else 0)
+    if not compile_csharp(force=args.force):
         sys.exit(1)
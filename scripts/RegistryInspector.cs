@@ -1,12 +1,23 @@
 using System;
+using System.Collections.Generic;
+using System.Web.Script.Serialization;
 using Microsoft.Win32;
 
 namespace SecurityInspector
 {
     class Program
     {
+        static readonly JavaScriptSerializer Json = new JavaScriptSerializer();
+
         static void Main(string[] args)
         {
+            // Batch mode: one JSON check per stdin line, one JSON result per stdout line
+            if (args.Length >= 1 && args[0] == "--batch")
+            {
+                RunBatch();
+                return;
+            }
+
             // Default check if no args provided (Backwards compatibility: UAC Check)
             string keyPath = @"SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\System";
             string valueName = "EnableLUA";
@@ -19,33 +30,79 @@ namespace SecurityInspector
                 expectedValue = args[2];
             }
 
+            Console.WriteLine(Json.Serialize(Inspect(null, keyPath, valueName, expectedValue)));
+        }
+
+        static void RunBatch()
+        {
+            string line;
+            while ((line = Console.In.ReadLine()) != null)
+            {
+                if (line.Trim().Length == 0) continue;
+
+                Dictionary<string, object> result;
+                try
+                {
+                    var check = Json.Deserialize<Dictionary<string, object>>(line);
+                    result = Inspect(
+                        Get(check, "id"), Get(check, "key"), Get(check, "value"), Get(check, "expected"));
+                }
+                catch (Exception ex)
+                {
+                    result = Error(null, "Invalid check: " + ex.Message);
+                }
+
+                // Flush per result so the caller can stream them as they are produced
+                Console.WriteLine(Json.Serialize(result));
+                Console.Out.Flush();
+            }
+        }
+
+        static string Get(Dictionary<string, object> check, string name)
+        {
+            object o;
+            return check.TryGetValue(name, out o) && o != null ? o.ToString() : null;
+        }
+
+        static Dictionary<string, object> Inspect(string id, string keyPath, string valueName, string expectedValue)
+        {
             try
             {
                 using (RegistryKey key = Registry.LocalMachine.OpenSubKey(keyPath))
                 {
-                    if (key != null)
+                    if (key == null)
                     {
-                        Object o = key.GetValue(valueName);
-                        if (o != null)
-                        {
-                            string currentVal = o.ToString();
-                            string status = (currentVal == expectedValue) ? "SECURE" : "VULNERABLE";
-                            Console.WriteLine("{{ \"status\": \"{0}\", \"value\": \"{1}\", \"expected\": \"{2}\" }}", status, currentVal, expectedValue);
-                        }
-                        else { 
-                            Console.WriteLine("{ \"status\": \"ERROR\", \"message\": \"Value not found\" }");
-                        }
+                        return Error(id, "Key not found");
                     }
-                    else { 
-                        Console.WriteLine("{ \"status\": \"ERROR\", \"message\": \"Key not found\" }");
+
+                    Object o = key.GetValue(valueName);
+                    if (o == null)
+                    {
+                        return Error(id, "Value not found");
                     }
+
+                    string currentVal = o.ToString();
+                    var result = new Dictionary<string, object>();
+                    if (id != null) result["id"] = id;
+                    result["status"] = (currentVal == expectedValue) ? "SECURE" : "VULNERABLE";
+                    result["value"] = currentVal;
+                    result["expected"] = expectedValue;
+                    return result;
                 }
             }
-            catch (Exception ex) { 
-                // Escape quotes for simplified JSON
-                string msg = ex.Message.Replace("\"", "'");
-                Console.WriteLine("{{ \"status\": \"ERROR\", \"message\": \"{0}\" }}", msg);
+            catch (Exception ex)
+            {
+                return Error(id, ex.Message);
             }
         }
+
+        static Dictionary<string, object> Error(string id, string message)
+        {
+            var result = new Dictionary<string, object>();
+            if (id != null) result["id"] = id;
+            result["status"] = "ERROR";
+            result["message"] = message;
+            return result;
+        }
     }
-}
\ No newline at end of file
+}
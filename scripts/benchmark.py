@@ -0,0 +1,387 @@
+"""
+Benchmarks for the scan hot paths, run against local stand-ins so the numbers
+do not depend on the network or on Windows:
+
+- fake TCP listeners for NetworkScanStrategy,
+- a stub PowerShell worker (same framed protocol as ps_worker.ps1),
+- a stub RegistryInspector speaking the --batch NDJSON protocol,
+- a synthetic directory tree for FileSystemStrategy,
+- synthetic reports for MitreMapper.enrich_report.
+
+Reports latency percentiles, throughput and tracemalloc peak per benchmark
+and can save them as JSON and compare against a previous run:
+
+    python scripts/benchmark.py --output bench.json
+    python scripts/benchmark.py --compare bench.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from typing import Dict, Any, Callable, List, Optional
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.context import ContextScanner
+from app.core.pspool import PowerShellPool, FRAME_MARKER
+from app.core.fsaudit import FileSystemAuditor
+from app.core.scanner import HybridScanner
+from app.core.strategies import NetworkScanStrategy, ServiceConfigStrategy, RegistryAuditStrategy, FileSystemStrategy
+
+# Only benchmark output on stdout
+logging.basicConfig(level=logging.ERROR)
+
+STUB_PS_WORKER = f'''
+import json, os, sys
+MARKER = {FRAME_MARKER!r}
+OUTPUT = "\\n".join(json.dumps(r) for r in [
+    {{"SMBv1_Status": "Enabled"}},
+    {{"Unquoted_Services": "None", "Unquoted_Risk": "Low"}},
+    {{"Last_Patch": "KB5030211"}},
+])
+def send(reply):
+    sys.stdout.write(MARKER + json.dumps(reply) + "\\n")
+    sys.stdout.flush()
+send({{"ready": True, "pid": os.getpid()}})
+for line in sys.stdin:
+    request = json.loads(line)
+    if request.get("ping"):
+        send({{"id": request["id"], "ok": True}})
+    else:
+        send({{"id": request["id"], "ok": True, "output": OUTPUT}})
+'''
+
+STUB_INSPECTOR = '''
+import json, sys
+for line in sys.stdin:
+    request = json.loads(line)
+    status = "VULNERABLE" if request["value"] == "EnableLUA" else "SECURE"
+    sys.stdout.write(json.dumps({"id": request["id"], "status": status}) + "\\n")
+sys.stdout.flush()
+'''
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies: List[float], wall: float, peak_bytes: Optional[int]) -> Dict[str, Any]:
+    values = sorted(latencies)
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "iterations": len(values),
+        "mean_ms": ms(sum(values) / len(values)) if values else 0.0,
+        "p50_ms": ms(percentile(values, 50)),
+        "p90_ms": ms(percentile(values, 90)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+        "throughput_ops": round(len(values) / wall, 2) if wall > 0 else 0.0,
+        "peak_memory_kb": round(peak_bytes / 1024, 1) if peak_bytes is not None else None,
+    }
+
+class StandIns:
+    """Local fakes for everything a scan talks to; all live under one temp directory"""
+    def __init__(self, loop: asyncio.AbstractEventLoop, listeners: int = 4, tree_dirs: int = 50,
+                 files_per_dir: int = 20, baseline_checks: int = 20):
+        self.loop = loop
+        self.root = tempfile.mkdtemp(prefix="winsec-bench-")
+        self.servers = []
+        self.ports: List[int] = []
+        for _ in range(listeners):
+            server = loop.run_until_complete(asyncio.start_server(self._close_client, "127.0.0.1", 0))
+            self.servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+
+        self.ps_worker = self._write("ps_worker_stub.py", STUB_PS_WORKER)
+        self.ps_pool = self.new_pool()
+        self.inspector = self._inspector_command(self._write("inspector_stub.py", STUB_INSPECTOR))
+        self.baseline = [
+            {"name": f"Bench_Check_{i}", "key": r"SOFTWARE\Policies\Bench", "value": f"Value{i}", "expected": "1"}
+            for i in range(baseline_checks)
+        ]
+        self.tree = self._build_tree(tree_dirs, files_per_dir)
+
+    @staticmethod
+    async def _close_client(reader, writer):
+        writer.close()
+
+    def _write(self, name: str, content: str) -> str:
+        path = os.path.join(self.root, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def _inspector_command(self, script: str) -> str:
+        # RegistryAuditStrategy runs exe_path directly, so wrap the stub in something executable
+        if os.name == "nt":
+            return self._write("inspector_stub.cmd", f'@"{sys.executable}" "{script}" %*\r\n')
+        path = self._write("inspector_stub", f"#!/bin/sh\nexec \"{sys.executable}\" \"{script}\" \"$@\"\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        return path
+
+    def _build_tree(self, dirs: int, files_per_dir: int) -> str:
+        tree = os.path.join(self.root, "tree")
+        for d in range(dirs):
+            # A few levels deep so the walk fans out
+            path = os.path.join(tree, f"level{d % 5}", f"dir{d}")
+            os.makedirs(path, exist_ok=True)
+            for f in range(files_per_dir):
+                with open(os.path.join(path, f"file{f}.txt"), "w") as fh:
+                    fh.write("x")
+            if d % 10 == 0 and os.name != "nt":
+                os.chmod(os.path.join(path, "file0.txt"), 0o666)
+        return tree
+
+    def new_pool(self) -> PowerShellPool:
+        return PowerShellPool([sys.executable, self.ps_worker], size=2, max_jobs=1000)
+
+    def strategies(self, pool: Optional[PowerShellPool] = None) -> List[Any]:
+        return [
+            NetworkScanStrategy(ports=",".join(map(str, self.ports)), timeout=0.5, retries=0),
+            ServiceConfigStrategy(pool=pool if pool is not None else self.ps_pool),
+            RegistryAuditStrategy(checks=[RegistryAuditStrategy.UAC_CHECK] + self.baseline, exe_path=self.inspector),
+            # Fresh auditor: no incremental state carried between iterations
+            FileSystemStrategy(paths={"Bench_Tree": self.tree}, auditor=FileSystemAuditor()),
+        ]
+
+    def modules(self, pool: Optional[PowerShellPool] = None):
+        keys = ["Network_Scan", "System_Config", "UAC_Check", "FileSystem_Check"]
+        return list(zip(keys, self.strategies(pool)))
+
+    def close(self) -> None:
+        for server in self.servers:
+            server.close()
+        self.loop.run_until_complete(self.ps_pool.close())
+        shutil.rmtree(self.root, ignore_errors=True)
+
+def synthetic_report(hosts: int = 50) -> Dict[str, Any]:
+    """Fleet-sized report: every host carries every finding key the check pack maps"""
+    host = {
+        "Network_Scan": [{"port": p, "service": "SMB", "status": "OPEN"} for p in (21, 445, 3389)],
+        "System_Config": {"SMBv1_Status": "Enabled", "Unquoted_Services": ["svc1", "svc2"], "Last_Patch": "KB1"},
+        "UAC_Check": {"Status": "VULNERABLE", "Risk": "HIGH", "Check": "System\\EnableLUA"},
+        "FileSystem_Check": {"Hosts_File": {"Status": "Writable", "Risk": "HIGH"}},
+        "Registry_Baseline": {f"Bench_Check_{i}": {"Status": "SECURE", "Risk": "LOW"} for i in range(20)},
+    }
+    return {"hosts": {f"10.0.{i // 256}.{i % 256}": copy.deepcopy(host) for i in range(hosts)}}
+
+class Bench:
+    def __init__(self, loop: asyncio.AbstractEventLoop, iterations: int, warmup: int, track_memory: bool):
+        self.loop = loop
+        self.iterations = iterations
+        self.warmup = warmup
+        self.track_memory = track_memory
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def run(self, name: str, op: Callable, setup: Optional[Callable[[], Any]] = None,
+            concurrency: int = 1, iterations: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Times op (sync or async; called with setup()'s value when setup is given,
+        setup itself is not timed). Async ops run `concurrency` at a time.
+        """
+        iterations = iterations or self.iterations
+        is_async = asyncio.iscoroutinefunction(op)
+        latencies: List[float] = []
+
+        async def one_async():
+            arg = setup() if setup else None
+            started = time.perf_counter()
+            await (op(arg) if setup else op())
+            latencies.append(time.perf_counter() - started)
+
+        def batch(n: int):
+            if is_async:
+                async def group():
+                    for offset in range(0, n, concurrency):
+                        await asyncio.gather(*(one_async() for _ in range(min(concurrency, n - offset))))
+                self.loop.run_until_complete(group())
+                return
+            for _ in range(n):
+                arg = setup() if setup else None
+                started = time.perf_counter()
+                op(arg) if setup else op()
+                latencies.append(time.perf_counter() - started)
+
+        batch(self.warmup)
+        latencies.clear()
+        baseline = 0
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        batch(iterations)
+        wall = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] - baseline if self.track_memory else None
+
+        result = summarize(latencies, wall, peak)
+        result["concurrency"] = concurrency
+        self.results[name] = result
+        print(f"{name:<24} p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+              f"{result['throughput_ops']:>9.2f} ops/s  peak {result['peak_memory_kb'] or 0:>9.1f} KiB",
+              file=sys.stderr)
+        return result
+
+def run_benchmarks(args) -> Dict[str, Any]:
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if not args.no_memory:
+        tracemalloc.start()
+
+    selected = set(args.only.split(",")) if args.only else None
+    wanted = lambda name: selected is None or name in selected
+    stand_ins = StandIns(loop)
+    bench = Bench(loop, args.iterations, args.warmup, not args.no_memory)
+
+    try:
+        if wanted("context_scan"):
+            async def context_scan():
+                scanner = ContextScanner("127.0.0.1", concurrent=True, max_concurrency=settings.SCAN_CONCURRENCY,
+                                         strategy_timeout=settings.STRATEGY_TIMEOUT)
+                for strategy in stand_ins.strategies():
+                    scanner.add_strategy(strategy)
+                await scanner.execute_scan()
+            bench.run("context_scan", context_scan, concurrency=args.concurrency)
+
+        with patch.object(HybridScanner, "_build_modules", lambda self: stand_ins.modules()):
+            if wanted("hybrid_scan"):
+                async def hybrid_scan():
+                    await HybridScanner("127.0.0.1", refresh=True).run_all()
+                bench.run("hybrid_scan", hybrid_scan, concurrency=args.concurrency)
+
+            if wanted("hybrid_scan_cached"):
+                async def hybrid_scan_cached():
+                    # Served from the result cache after the warmup run
+                    await HybridScanner("127.0.0.1").run_all()
+                bench.run("hybrid_scan_cached", hybrid_scan_cached, concurrency=args.concurrency)
+
+        if wanted("api_status") or wanted("api_scan_stream"):
+            from fastapi.testclient import TestClient
+            from app.api import routes
+            from app.core.job_store import create_job_store
+            from app.main import app
+            # The app runs on the TestClient's own loop: its worker pool must live there too
+            api_pool = stand_ins.new_pool()
+            with ExitStack() as stack:
+                stack.enter_context(patch.object(HybridScanner, "_build_modules", lambda self: stand_ins.modules(api_pool)))
+                # Keep benchmark runs out of the real job store and history database
+                stack.enter_context(patch.object(routes, "jobs", create_job_store("memory")))
+                stack.enter_context(patch.object(routes, "history", None))
+                client = stack.enter_context(TestClient(app))
+                client.auth = (settings.AUTH_USERNAME, settings.AUTH_PASSWORD)
+                if wanted("api_status"):
+                    routes.jobs["bench-job"] = {"status": "completed", "username": settings.AUTH_USERNAME,
+                                                "result": synthetic_report(1)["hosts"]["10.0.0.0"]}
+                    bench.run("api_status", lambda: client.get("/api/status/bench-job").raise_for_status())
+                if wanted("api_scan_stream"):
+                    def stream():
+                        with client.stream("GET", "/api/scan/stream", params={"refresh": "true"}) as res:
+                            for _ in res.iter_lines():
+                                pass
+                    bench.run("api_scan_stream", stream)
+                client.portal.call(api_pool.close)
+
+        if wanted("enrich_report"):
+            scanner = HybridScanner("127.0.0.1")
+            report = synthetic_report(args.report_hosts)
+            # enrich_report works in place: give every iteration a fresh copy (not timed)
+            bench.run("enrich_report", scanner.mitre_mapper.enrich_report, setup=lambda: copy.deepcopy(report))
+
+        if wanted("cli_cold_start"):
+            # A fresh interpreter per run: import time plus a one-port probe with every option on the
+            # command line, which is the path that must not load settings (pydantic, .env)
+            command = [sys.executable, "-m", "app.cli", "--target", "127.0.0.1", "--strategy", "network",
+                       "--ports", "1", "--port-timeout", "0.2", "--port-retries", "0", "--port-concurrency", "1",
+                       "--concurrency", "1", "--timeout", "5", "--max-targets", "1"]
+            bench.run("cli_cold_start",
+                      lambda: subprocess.run(command, cwd=settings.ROOT_DIR, capture_output=True, check=True),
+                      iterations=min(args.iterations, 20))
+    finally:
+        stand_ins.close()
+        if not args.no_memory:
+            tracemalloc.stop()
+        loop.close()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "memory_tracking": not args.no_memory,
+        },
+        "benchmarks": bench.results,
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=settings.ROOT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Benchmarks whose p50 or p99 grew by more than threshold (a fraction) over the baseline"""
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if before[metric] > 0 and result[metric] > before[metric] * (1 + threshold):
+                change = result[metric] / before[metric] - 1
+                regressions.append(f"{name} {metric}: {before[metric]} -> {result[metric]} (+{change:.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="WinSec Defender benchmarks (local stand-ins, no network)")
+    parser.add_argument("--iterations", type=int, default=30, help="Timed runs per benchmark")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed runs before measuring")
+    parser.add_argument("--concurrency", type=int, default=1, help="Scans in flight at once for scan benchmarks")
+    parser.add_argument("--report-hosts", type=int, default=50, help="Hosts in the synthetic enrich_report input")
+    parser.add_argument("--only", default=None,
+                        help="Comma-separated subset: context_scan, hybrid_scan, hybrid_scan_cached, "
+                             "api_status, api_scan_stream, enrich_report, cli_cold_start")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows everything down)")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--compare", default=None, help="Previous results JSON; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50/p99 growth when comparing")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Worker persistente para el pool de PowerShell (app/core/pspool.py).
+# Lee una petición JSON por línea en stdin y responde con UNA línea enmarcada:
+#   @@WINSEC-FRAME@@{"id": ..., "ok": true, "output": "..."}
+# Cualquier otra línea en stdout (banners, Write-Host) es ignorada por Python.
+# Requiere PowerShell v3+ (ConvertFrom-Json).
+$ErrorActionPreference = 'Continue'
+$Marker = '@@WINSEC-FRAME@@'
+[Console]::InputEncoding = New-Object System.Text.UTF8Encoding $false
+[Console]::OutputEncoding = New-Object System.Text.UTF8Encoding $false
+
+function Send-Frame {
+    param($Reply)
+    [Console]::Out.WriteLine($Marker + ($Reply | ConvertTo-Json -Compress))
+    [Console]::Out.Flush()
+}
+
+# PowerShell v2 no tiene ConvertFrom-Json: avisar en vez de dejar al pool esperando el arranque
+if ($PSVersionTable.PSVersion.Major -lt 3) {
+    [Console]::Out.WriteLine($Marker + '{"ready": false, "error": "PowerShell 3.0 or later is required"}')
+    [Console]::Out.Flush()
+    exit 1
+}
+
+# Señal de arranque: el intérprete está listo para recibir trabajos
+Send-Frame @{ ready = $true; pid = $PID }
+
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($line -eq $null) { break }   # stdin cerrado: el pool retira este worker
+    if ($line.Trim().Length -eq 0) { continue }
+
+    $reply = @{ ok = $false }
+    try {
+        $request = $line | ConvertFrom-Json
+        $reply["id"] = $request.id
+        if ($request.ping) {
+            # Health check
+            $reply["ok"] = $true
+        } else {
+            $scriptArgs = @()
+            if ($request.args) { $scriptArgs = @($request.args) }
+            # Cada script se ejecuta en su propio ámbito; 'exit' solo termina el script
+            $output = & $request.script @scriptArgs 2>&1 | Out-String
+            $reply["ok"] = $true
+            $reply["output"] = $output
+        }
+    } catch {
+        $reply["error"] = $_.Exception.Message
+    }
+    Send-Frame $reply
+}
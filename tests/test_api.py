@@ -0,0 +1,270 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.api import routes
+from app.core.history import ScanHistory
+from app.core.scheduler import ScanScheduler
+from app.main import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    routes.jobs.clear()
+    monkeypatch.setattr(routes, "history", ScanHistory(str(tmp_path / "history.db")))
+    # One event loop for the whole test, so scheduled jobs keep running between requests
+    with TestClient(app) as test_client:
+        test_client.auth = (settings.AUTH_USERNAME, settings.AUTH_PASSWORD)
+        yield test_client
+    routes.jobs.clear()
+
+
+def wait_for_job(client, job_id: str, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/api/status/{job_id}").json()
+        if job["status"] in ("completed", "failed") or time.time() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def analyze(scanner):
+    # What stream_all does with each module's section
+    scanner.findings = scanner.check_pack.evaluate(scanner.report_data)
+    scanner.fixes = [f["fix"] for f in scanner.findings if f.get("fix")]
+
+
+def completed_job(age: float = 0.0, username: str = None):
+    return {
+        "status": "completed",
+        "result": {},
+        "username": username or settings.AUTH_USERNAME,
+        "timestamp": "2025-01-01 10:00:00",
+        "completed_at": time.time() - age,
+        "fixes": [{"desc": "Cached Fix", "cmd": "Write-Host 'cached'"}],
+    }
+
+
+def test_sanitize_reuses_job_fixes(client):
+    routes.jobs["job-1"] = completed_job()
+    with patch("app.api.routes.HybridScanner.run_all", new_callable=AsyncMock) as run_all:
+        res = client.post("/api/sanitize", params={"job_id": "job-1"})
+
+    assert res.status_code == 200
+    assert "Cached Fix" in res.text
+    assert "2025-01-01 10:00:00" in res.text
+    run_all.assert_not_called()
+
+
+def test_sanitize_defaults_to_latest_job(client):
+    old = completed_job(age=60)
+    old["fixes"] = [{"desc": "Old Fix", "cmd": "Write-Host 'old'"}]
+    routes.jobs["old"] = old
+    routes.jobs["new"] = completed_job(age=1)
+    routes.jobs["other-user"] = completed_job(username="someone-else")
+
+    with patch("app.api.routes.HybridScanner.run_all", new_callable=AsyncMock) as run_all:
+        res = client.post("/api/sanitize")
+
+    assert "Cached Fix" in res.text
+    assert "Old Fix" not in res.text
+    run_all.assert_not_called()
+
+
+def test_sanitize_rescans_stale_results(client):
+    routes.jobs["stale"] = {**completed_job(age=settings.SANITIZE_MAX_AGE + 10), "target": "10.0.0.7"}
+    targets = []
+
+    async def fake_run_all(self):
+        targets.append(self.target_ip)
+        return {}
+
+    with patch("app.api.routes.HybridScanner.run_all", fake_run_all):
+        res = client.post("/api/sanitize")
+        # A specific job is never swapped for a scan of another point in time
+        stale = client.post("/api/sanitize", params={"job_id": "stale"})
+
+    # The latest job's host is rescanned, not the default target; it found nothing to fix
+    assert targets == ["10.0.0.7"]
+    assert res.status_code == 400
+    assert stale.status_code == 409
+
+
+def test_sanitize_unknown_job(client):
+    res = client.post("/api/sanitize", params={"job_id": "missing"})
+    assert res.status_code == 404
+
+
+def test_scan_rejects_target_files(client):
+    res = client.get("/api/scan", params={"targets": "@/etc/hosts"})
+    assert res.status_code == 400
+
+
+def test_fleet_sanitize_bundles_scripts(client):
+    smb = {"desc": "Disable SMBv1", "cmd": "Disable-SMB1"}
+    routes.jobs["fleet"] = {**completed_job(), "host_fixes": {"10.0.0.1": [smb], "10.0.0.2": [smb], "10.0.0.3": []}}
+    res = client.post("/api/sanitize/fleet", params={"job_id": "fleet"})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(res.content)) as bundle:
+        manifest = json.loads(bundle.read("manifest.json"))
+        assert manifest["groups"][0]["hosts"] == ["10.0.0.1", "10.0.0.2"]
+        assert "Disable-SMB1" in bundle.read(manifest["groups"][0]["script"]).decode("utf-8")
+
+    routes.jobs["clean"] = {**completed_job(), "fixes": []}
+    assert client.post("/api/sanitize/fleet", params={"job_id": "clean"}).status_code == 400
+    assert client.post("/api/sanitize/fleet", params={"job_id": "missing"}).status_code == 404
+
+
+def test_fleet_scan_collects_hosts(client):
+    async def fake_run_all(self):
+        risk = "HIGH" if self.target_ip == "10.0.0.2" else "LOW"
+        self.report_data = {"UAC_Check": {"Risk": risk, "Check": "System\\EnableLUA"}}
+        analyze(self)
+        return self.report_data
+
+    with patch("app.api.routes.HybridScanner.run_all", fake_run_all):
+        res = client.get("/api/scan", params={"targets": "10.0.0.1,10.0.0.2"})
+        job = wait_for_job(client, res.json()["job_id"])
+
+    assert job["status"] == "completed"
+    assert list(job["result"]["hosts"]) == ["10.0.0.1", "10.0.0.2"]
+    assert job["result"]["vulnerable"] is True
+    assert job["result"]["hosts"]["10.0.0.1"]["vulnerable"] is False
+    assert job["host_fixes"]["10.0.0.2"][0]["desc"] == "Enable UAC (Secure Desktop)"
+    assert job["progress"] == {"completed": 2, "total": 2}
+
+
+def test_sanitize_after_fleet_scan(client):
+    async def fake_run_all(self):
+        self.report_data = {"UAC_Check": {"Risk": "HIGH", "Check": "System\\EnableLUA"}}
+        analyze(self)
+        return self.report_data
+
+    routes.jobs["job-1"] = completed_job(age=30)
+    with patch("app.api.routes.HybridScanner.run_all", fake_run_all):
+        fleet_id = client.get("/api/scan", params={"targets": "10.0.0.1,10.0.0.2"}).json()["job_id"]
+        assert wait_for_job(client, fleet_id)["status"] == "completed"
+
+    # Without a job_id the latest single-host job is used, not the newer fleet job
+    res = client.post("/api/sanitize")
+    assert res.status_code == 200
+    assert "Cached Fix" in res.text
+
+    res = client.post("/api/sanitize", params={"job_id": fleet_id})
+    assert res.status_code == 409
+    assert "/api/sanitize/fleet" in res.json()["message"]
+    assert client.post("/api/sanitize/fleet", params={"job_id": fleet_id}).status_code == 200
+
+
+def test_stream_scan_pushes_module_events(client):
+    from tests.test_scanner import fake_modules
+
+    with patch("app.api.routes.HybridScanner._build_modules", lambda self: fake_modules()):
+        with client.stream("GET", "/api/scan/stream") as res:
+            assert res.headers["content-type"].startswith("text/event-stream")
+            events = [line[len("event: "):] for line in res.iter_lines() if line.startswith("event: ")]
+
+    assert events[0] == "start"
+    assert events[1:5] == ["module"] * 4
+    assert events[-1] == "complete"
+    job = routes.jobs.latest(settings.AUTH_USERNAME)
+    assert job["fixes"][0]["desc"] == "Disable SMBv1 (WannaCry Risk)"
+
+
+def test_history_diff_between_scans(client):
+    async def fake_run_all(self):
+        self.report_data = {"UAC_Check": {"Risk": self.risk, "Check": "System\\EnableLUA"}}
+        analyze(self)
+        return self.report_data
+
+    with patch("app.api.routes.HybridScanner.run_all", fake_run_all):
+        for risk in ("HIGH", "LOW"):
+            with patch("app.api.routes.HybridScanner.risk", risk, create=True):
+                job_id = client.get("/api/scan", params={"targets": "10.0.0.9"}).json()["job_id"]
+                assert wait_for_job(client, job_id)["history_id"]
+
+    runs = client.get("/api/history", params={"host": "10.0.0.9"}).json()["scans"]
+    assert [r["vulnerable"] for r in runs] == [False, True]
+
+    diff = client.get("/api/history/diff", params={"host": "10.0.0.9"}).json()
+    assert [e["key"] for e in diff["resolved"]] == ["finding:uac-disabled"]
+    assert diff["new"] == [] and diff["changed"] == []
+    assert client.get(f"/api/history/{runs[0]['id']}").json()["result"]["vulnerable"] is False
+    assert client.get("/api/history/diff", params={"host": "10.0.0.10"}).status_code == 404
+
+
+def test_scan_queue_dedupes_and_reports_position(client, monkeypatch):
+    monkeypatch.setattr(routes, "scheduler", ScanScheduler(workers=1, max_queue=2))
+    release = threading.Event()
+
+    async def slow_run_all(self):
+        # Blocks a worker thread, not the loop, until the test lets it finish
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        self.report_data = {}
+        return self.report_data
+
+    with patch("app.api.routes.HybridScanner.run_all", slow_run_all):
+        first = client.get("/api/scan", params={"targets": "10.0.0.1"}).json()
+        queued = client.get("/api/scan", params={"targets": "10.0.0.2", "priority": "low"}).json()
+        same = client.get("/api/scan", params={"targets": "10.0.0.2"}).json()
+        assert same == {"job_id": queued["job_id"], "status": "queued", "deduplicated": True}
+
+        status = client.get(f"/api/status/{queued['job_id']}").json()
+        assert status["status"] == "queued"
+        assert status["queue_position"] == 1 and status["queue_depth"] == 1
+
+        client.get("/api/scan", params={"targets": "10.0.0.3"})
+        assert client.get("/api/scan", params={"targets": "10.0.0.4"}).status_code == 503
+        assert client.get("/api/scan", params={"priority": "urgent"}).status_code == 400
+
+        release.set()
+        assert wait_for_job(client, first["job_id"])["status"] == "completed"
+        assert wait_for_job(client, queued["job_id"])["status"] == "completed"
+
+
+def test_metrics_endpoint(client):
+    from tests.test_scanner import fake_modules
+
+    routes.jobs["job-1"] = completed_job()
+    with patch("app.api.routes.HybridScanner._build_modules", lambda self: fake_modules()):
+        with client.stream("GET", "/api/scan/stream") as res:
+            list(res.iter_lines())
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE winsec_strategy_duration_seconds histogram" in res.text
+    assert 'winsec_strategy_duration_seconds_count{strategy="FakeStrategy"}' in res.text
+    assert "winsec_enrich_report_duration_seconds_count" in res.text
+    assert "winsec_jobs 2" in res.text
+    assert "winsec_scan_queue_depth 0" in res.text
+
+    client.auth = None
+    assert client.get("/metrics").status_code == 401
+
+
+def test_scan_trace_opt_in(client, monkeypatch, tmp_path):
+    from tests.test_scanner import fake_modules
+
+    monkeypatch.setattr(routes.settings, "TRACE_DIR", str(tmp_path / "traces"))
+    with patch("app.api.routes.HybridScanner._build_modules", lambda self: fake_modules()):
+        job_id = client.get("/api/scan", params={"trace": "true"}).json()["job_id"]
+        assert wait_for_job(client, job_id)["status"] == "completed"
+        # The trace is saved, and named on the job, once the scan has settled
+        deadline = time.time() + 5
+        while "trace" not in (job := client.get(f"/api/status/{job_id}").json()) and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert job["trace"] == f"{job_id}.trace.json"
+    events = json.loads((tmp_path / "traces" / job["trace"]).read_text())["traceEvents"]
+    names = {e["name"] for e in events if e["ph"] == "X"}
+    assert {"strategy:FakeStrategy", "fixes:UAC_Check", "enrich:UAC_Check"} <= names
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+import build
+from app.core import native_build
+from app.core.native_build import NativeBuild
+from app.core.strategies import RegistryAuditStrategy
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="stub compiler is a shebang script")
+
+# Stand-in for csc: copies the source to /out:, logs each call, sleeps on request
+STUB_CSC = f'''#!{sys.executable}
+import os, sys, time
+out = next(a[5:] for a in sys.argv if a.startswith("/out:"))
+with open(os.environ["STUB_CSC_LOG"], "a") as log:
+    log.write("build\\n")
+time.sleep(float(os.environ.get("STUB_CSC_DELAY", "0")))
+if os.environ.get("STUB_CSC_FAIL"):
+    sys.exit("error CS1002: ; expected")
+with open(sys.argv[-1], "rb") as src, open(out, "wb") as dst:
+    dst.write(src.read())
+'''
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    csc = tmp_path / "csc"
+    csc.write_text(STUB_CSC)
+    csc.chmod(0o755)
+    log = tmp_path / "csc.log"
+    log.write_text("")
+    monkeypatch.setenv("CSC_PATH", str(csc))
+    monkeypatch.setenv("STUB_CSC_LOG", str(log))
+    source = tmp_path / "RegistryInspector.cs"
+    source.write_text("class Inspector {}")
+    output = tmp_path / "bin" / "RegistryInspector.exe"
+    return source, output, lambda: log.read_text().count("build")
+
+
+def test_rebuilds_only_when_source_or_output_changes(stub, monkeypatch):
+    source, output, builds = stub
+
+    assert build.compile_csharp(source_file=str(source), output_file=str(output))
+    assert builds() == 1 and output.read_text() == "class Inspector {}"
+    entry = json.loads((output.parent / build.MANIFEST_NAME).read_text())["RegistryInspector.exe"]
+    assert entry["output_sha256"] == build.file_sha256(str(output))
+
+    # Unchanged source: no compiler call
+    assert build.compile_csharp(source_file=str(source), output_file=str(output))
+    assert builds() == 1
+
+    source.write_text("class Inspector { int x; }")
+    assert build.needs_build(str(source), str(output))
+    assert build.compile_csharp(source_file=str(source), output_file=str(output))
+    assert builds() == 2
+
+    # A binary that is not the one we built is replaced
+    output.write_text("tampered")
+    assert build.compile_csharp(source_file=str(source), output_file=str(output))
+    assert builds() == 3
+
+    # A failed build keeps the previous binary and leaves no temp file behind
+    source.write_text("class Inspector { broken")
+    monkeypatch.setenv("STUB_CSC_FAIL", "1")
+    assert not build.compile_csharp(source_file=str(source), output_file=str(output))
+    assert output.read_text() == "class Inspector { int x; }"
+    assert sorted(os.listdir(output.parent)) == sorted([build.MANIFEST_NAME, "RegistryInspector.exe"])
+
+
+def test_registry_strategy_warms_up_during_background_build(stub, monkeypatch):
+    source, output, builds = stub
+    monkeypatch.setenv("STUB_CSC_DELAY", "0.3")
+    native = NativeBuild(str(source), str(output))
+    monkeypatch.setattr(native_build, "_default_build", native)
+    strategy = RegistryAuditStrategy(checks=[RegistryAuditStrategy.UAC_CHECK], exe_path=str(output))
+
+    async def run():
+        task = native.start()
+        assert task is not None and native.state == "building"
+        warming = await strategy.scan("127.0.0.1")
+        token = await strategy.change_token("127.0.0.1")
+        assert await native.wait() == "ready"
+        assert await strategy.change_token("127.0.0.1") != token
+        return warming
+
+    warming = asyncio.run(run())
+    assert warming == {"UAC_Check": {"Status": "Warming up", "Risk": "Warming Up - Inspector Compiling"}}
+    assert builds() == 1
+
+    # Up to date on the next start: ready without compiling
+    assert NativeBuild(str(source), str(output)).start() is None
+    assert builds() == 1
+
+
+def test_binary_without_manifest_is_rebuilt_while_it_serves(stub):
+    source, output, builds = stub
+    output.parent.mkdir()
+    output.write_text("prebuilt")
+    assert build.needs_build(str(source), str(output))
+
+    native = NativeBuild(str(source), str(output))
+
+    async def run():
+        assert native.start() is not None
+        # The old binary keeps answering while its replacement compiles
+        assert native.state == "building" and not native.is_building(str(output))
+        return await native.wait()
+
+    assert asyncio.run(run()) == "ready"
+    assert builds() == 1 and output.read_text() == "class Inspector {}"
+    entry = json.loads((output.parent / build.MANIFEST_NAME).read_text())["RegistryInspector.exe"]
+    assert entry["compiler"] == os.environ["CSC_PATH"]
+    assert not build.needs_build(str(source), str(output))
+
+
+def test_stale_binary_is_not_warming_up(stub):
+    source, output, builds = stub
+    assert build.compile_csharp(source_file=str(source), output_file=str(output))
+    native = NativeBuild(str(source), str(output))
+    native.state = "building"
+
+    # The old binary keeps serving while its replacement compiles
+    assert not native.is_building(str(output))
+    output.unlink()
+    assert native.is_building(str(output))
@@ -0,0 +1,70 @@
+import json
+import pytest
+
+from app.core.checkpack import CheckPack, compile_matcher, get_check_pack
+
+
+@pytest.mark.parametrize("spec, value, expected", [
+    ({"equals": "Enabled"}, "Enabled", True),
+    ({"in": ["Enabled", "Likely Enabled"]}, "Disabled", False),
+    ({"not_in": ["None", []]}, [], False),
+    ({"not_in": ["None", []]}, ["svc"], True),
+    ({"prefix": "Likely"}, "Likely Enabled (Default)", True),
+    ({"regex": r"^\d+$"}, "12a", False),
+    ({"field": "Risk", "equals": "HIGH"}, {"Risk": "HIGH"}, True),
+    ({"field": "Risk", "equals": "HIGH"}, "HIGH", False),
+    ({"any_value": {"field": "Risk", "equals": "HIGH"}}, {"a": {"Risk": "LOW"}, "b": {"Risk": "HIGH"}}, True),
+    ({"any": [{"equals": 1}, {"equals": 2}]}, 2, True),
+    (None, "anything", True),
+])
+def test_matchers(spec, value, expected):
+    assert compile_matcher(spec)(value) is expected
+
+
+def test_unknown_operator_fails_at_compile_time():
+    with pytest.raises(ValueError):
+        compile_matcher({"looks_like": "x"})
+
+
+def test_default_pack_findings():
+    pack = get_check_pack()
+    report = {
+        "System_Config": {"SMBv1_Status": "Enabled", "Unquoted_Services": "None"},
+        "UAC_Check": {"Status": "VULNERABLE", "Risk": "HIGH", "Check": "Policies\\System\\EnableLUA"},
+        "FileSystem_Check": {"Hosts_File": {"Status": "Secure", "Risk": "LOW"}},
+    }
+    findings = pack.evaluate(report)
+
+    assert [f["rule"] for f in findings] == ["smbv1-enabled", "uac-disabled"]
+    assert findings[0]["fix"]["desc"] == "Disable SMBv1 (WannaCry Risk)"
+    assert pack.technique_map["Unquoted_Services"] == "T1574.009"
+
+
+def test_only_indexed_keys_are_evaluated():
+    calls = []
+    rules = [{"id": f"r{i}", "finding": f"Key_{i}", "risk": "LOW"} for i in range(5000)]
+    pack = CheckPack(rules)
+    for rule in pack.index["Key_7"]:
+        original = rule.matcher
+        rule.matcher = lambda v, m=original: calls.append(v) or m(v)
+
+    findings = pack.evaluate({"Other": {"Key_7": "x", "mitre_techniques": [{"Key_8": {}}]}})
+
+    assert [f["rule"] for f in findings] == ["r7"]
+    assert calls == ["x"]
+
+
+def test_load_json_and_yaml_packs(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps({"rules": [
+        {"id": "json-rule", "finding": "Telnet", "match": {"equals": "Running"}, "risk": "HIGH", "mitre": "T1021"}
+    ]}))
+    pytest.importorskip("yaml")
+    (tmp_path / "b.yaml").write_text(
+        "- id: yaml-rule\n  finding: Guest_Account\n  match: {equals: Enabled}\n  risk: MEDIUM\n"
+    )
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    pack = CheckPack.from_directory(str(tmp_path))
+    assert pack.rule_count == 2
+    findings = pack.evaluate({"Telnet": "Running", "Guest_Account": "Enabled"})
+    assert {f["rule"] for f in findings} == {"json-rule", "yaml-rule"}
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Dict, Any
+
+from app.core.context import ContextScanner, NOT_APPLICABLE, is_local_target
+from app.core.interfaces import IScanStrategy
+
+
+class SleepStrategy(IScanStrategy):
+    def __init__(self, key: str, delay: float):
+        self.key = key
+        self.delay = delay
+
+    async def scan(self, target: str) -> Dict[str, Any]:
+        await asyncio.sleep(self.delay)
+        return {self.key: {"target": target, "delay": self.delay}}
+
+
+class FailingStrategy(IScanStrategy):
+    async def scan(self, target: str) -> Dict[str, Any]:
+        raise RuntimeError("boom")
+
+
+def test_concurrent_runs_in_parallel():
+    scanner = ContextScanner("127.0.0.1", concurrent=True)
+    for i in range(3):
+        scanner.add_strategy(SleepStrategy(f"S{i}", 0.2))
+
+    start = time.perf_counter()
+    results = asyncio.run(scanner.execute_scan())
+    elapsed = time.perf_counter() - start
+
+    assert set(results) == {"S0", "S1", "S2"}
+    assert elapsed < 0.5
+
+
+def test_concurrent_merge_is_deterministic():
+    scanner = ContextScanner("127.0.0.1", concurrent=True)
+    # Slowest first: completion order is the reverse of registration order
+    scanner.add_strategy(SleepStrategy("Shared", 0.1))
+    scanner.add_strategy(SleepStrategy("Shared", 0.0))
+
+    results = asyncio.run(scanner.execute_scan())
+    # The last registered strategy wins, exactly as in sequential mode
+    assert results["Shared"]["delay"] == 0.0
+    assert list(results) == ["Shared"]
+
+
+def test_concurrency_limit():
+    scanner = ContextScanner("127.0.0.1", concurrent=True, max_concurrency=1)
+    scanner.add_strategy(SleepStrategy("A", 0.1))
+    scanner.add_strategy(SleepStrategy("B", 0.1))
+
+    start = time.perf_counter()
+    asyncio.run(scanner.execute_scan())
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_error_and_timeout_isolation():
+    scanner = ContextScanner("127.0.0.1", concurrent=True, strategy_timeout=0.1)
+    scanner.add_strategy(FailingStrategy())
+    scanner.add_strategy(SleepStrategy("Slow", 1.0))
+    scanner.add_strategy(SleepStrategy("Fast", 0.0))
+
+    results = asyncio.run(scanner.execute_scan())
+    assert results["FailingStrategy"] == {"error": "boom"}
+    assert "Timed out" in results["SleepStrategy"]["error"]
+    assert results["Fast"]["delay"] == 0.0
+
+
+class LocalOnlyStrategy(SleepStrategy):
+    local_only = True
+
+
+def test_local_only_strategies_skip_remote_targets():
+    assert is_local_target("127.0.0.1") and is_local_target("::1") and is_local_target("LOCALHOST")
+    assert not is_local_target("10.0.0.5")
+
+    async def scan(target):
+        scanner = ContextScanner(target, concurrent=True)
+        scanner.add_strategy(SleepStrategy("Net", 0))
+        scanner.add_strategy(LocalOnlyStrategy("Local", 0))
+        return await scanner.execute_scan()
+
+    remote = asyncio.run(scan("10.0.0.5"))
+    assert remote["Net"]["target"] == "10.0.0.5"
+    assert remote["LocalOnlyStrategy"] == NOT_APPLICABLE and "Local" not in remote
+    assert asyncio.run(scan("127.0.0.1"))["Local"]["target"] == "127.0.0.1"
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+
+from app.core.fleet import FleetScanner, expand_targets
+
+
+def test_expand_targets(tmp_path):
+    hosts_file = tmp_path / "hosts.txt"
+    hosts_file.write_text("# fleet\n10.0.0.9\nsrv01  # file server\n\n10.0.0.1\n")
+
+    targets = expand_targets(["10.0.0.0/30", "10.0.0.1,10.0.0.8", f"@{hosts_file}"])
+    assert targets == ["10.0.0.1", "10.0.0.2", "10.0.0.8", "10.0.0.9", "srv01"]
+    assert expand_targets(["192.168.1.5/32"]) == ["192.168.1.5"]
+
+
+def test_expand_targets_limits():
+    with pytest.raises(ValueError):
+        expand_targets(["10.0.0.0/16"], max_targets=100)
+    with pytest.raises(ValueError):
+        expand_targets(["@/etc/hosts"], allow_files=False)
+
+
+def test_stream_yields_hosts_as_they_finish():
+    delays = {"slow": 0.1, "fast": 0.0, "mid": 0.05}
+    running = 0
+    peak = 0
+
+    async def scan_host(target):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delays[target])
+        running -= 1
+        if target == "mid":
+            raise RuntimeError("unreachable")
+        return {"target": target}
+
+    async def collect():
+        fleet = FleetScanner(scan_host, max_hosts=2)
+        return [item async for item in fleet.stream(["slow", "fast", "mid"])]
+
+    results = asyncio.run(collect())
+    assert [t for t, _ in results] == ["fast", "mid", "slow"]
+    assert dict(results)["mid"] == {"error": "unreachable"}
+    assert peak == 2
+
+
+def test_run_preserves_input_order():
+    async def scan_host(target):
+        await asyncio.sleep(0.01 if target == "a" else 0)
+        return {"ok": target}
+
+    results = asyncio.run(FleetScanner(scan_host).run(["a", "b"]))
+    assert list(results) == ["a", "b"]
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+import time
+import pytest
+
+from app.core import fsaudit
+from app.core.fsaudit import FileSystemAuditor, check_path
+from app.core.strategies import FileSystemStrategy
+
+posix_only = pytest.mark.skipif(sys.platform == "win32", reason="Mode bits are POSIX-only")
+
+
+def collect(auditor, paths):
+    async def main():
+        stats = auditor.new_stats()
+        found = [item async for item in auditor.audit(paths, stats)]
+        return found, stats
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    (root / "a" / "deep").mkdir(parents=True)
+    (root / "b").mkdir()
+    (root / "a" / "deep" / "open.cfg").write_text("x")
+    os.chmod(root / "a" / "deep" / "open.cfg", 0o666)
+    (root / "b" / "tool").write_text("x")
+    os.chmod(root / "b" / "tool", 0o4755)
+    (root / "shared").mkdir()
+    os.chmod(root / "shared", 0o1777)
+    (root / "safe.txt").write_text("x")
+    os.chmod(root / "safe.txt", 0o644)
+    os.symlink("/etc/passwd", root / "link")
+    return root
+
+
+@posix_only
+def test_walk_reports_risky_entries(tree):
+    found, stats = collect(FileSystemAuditor(max_workers=4, check_writable=False), {"Tree": str(tree)})
+
+    labels = dict(found)
+    assert found[0][0] == "Tree"
+    assert labels[str(tree / "a" / "deep" / "open.cfg")]["Status"] == "World-Writable"
+    assert labels[str(tree / "b" / "tool")]["Status"] == "SetUID"
+    # Sticky world-writable directories, symlinks and safe files are not findings
+    assert set(labels) == {"Tree", str(tree / "a" / "deep" / "open.cfg"), str(tree / "b" / "tool")}
+    assert stats["Directories"] == 5 and not stats["Truncated"]
+
+
+@posix_only
+def test_unchanged_directories_are_not_relisted(tree):
+    auditor = FileSystemAuditor(max_workers=2, check_writable=False)
+    collect(auditor, {"Tree": str(tree)})
+    found, stats = collect(auditor, {"Tree": str(tree)})
+    assert stats["Reused"] == stats["Directories"] == 5
+    assert stats["Entries"] == 0
+    assert len(found) == 3
+
+    # A new entry changes its directory's mtime: only that directory is listed again
+    time.sleep(0.01)
+    (tree / "b" / "new.sh").write_text("x")
+    os.chmod(tree / "b" / "new.sh", 0o777)
+    found, stats = collect(auditor, {"Tree": str(tree)})
+    assert stats["Reused"] == 4
+    assert str(tree / "b" / "new.sh") in dict(found)
+
+
+@posix_only
+def test_state_follows_the_live_tree(tree, tmp_path):
+    import shutil
+    other = tmp_path / "other"
+    (other / "x").mkdir(parents=True)
+    auditor = FileSystemAuditor(max_workers=2)
+    collect(auditor, {"Tree": str(tree), "Other": str(other)})
+    assert str(tree / "a" / "deep") in auditor._dirs and str(other / "x") in auditor._dirs
+
+    # A removed subtree is dropped when its parent is listed again
+    time.sleep(0.01)
+    shutil.rmtree(tree / "a")
+    collect(auditor, {"Tree": str(tree), "Other": str(other)})
+    assert not any(path.startswith(str(tree / "a")) for path in auditor._dirs)
+
+    # A root that is no longer configured is forgotten entirely
+    collect(auditor, {"Tree": str(tree)})
+    assert sorted(auditor._dirs) == sorted(str(p) for p in (tree, tree / "b", tree / "shared"))
+
+
+@posix_only
+def test_large_directory_and_limits(tmp_path):
+    big = tmp_path / "big"
+    big.mkdir()
+    for i in range(20000):
+        (big / f"f{i}").touch()
+    for i in range(5):
+        os.chmod(big / f"f{i}", 0o666)
+
+    found, stats = collect(FileSystemAuditor(check_writable=False), {"Big": str(big)})
+    assert stats["Entries"] == 20000
+    assert len(found) == 6
+
+    found, stats = collect(FileSystemAuditor(max_findings=2, check_writable=False), {"Big": str(big)})
+    assert len(found) == 3 and stats["Truncated"]
+
+
+def test_writable_entries_are_reported(tree, monkeypatch):
+    # Stands in for os.access / the Windows ACL check, whoever runs the tests
+    writable = {str(tree / "safe.txt"), str(tree / "b")}
+    monkeypatch.setattr(fsaudit, "is_writable", lambda path, is_dir=False: path in writable)
+
+    found, _ = collect(FileSystemAuditor(max_workers=2, check_writable=True), {"Tree": str(tree)})
+
+    labels = dict(found)
+    assert labels[str(tree / "safe.txt")] == {"Status": "Writable", "Risk": "HIGH", "Path": str(tree / "safe.txt")}
+    assert labels[str(tree / "b")]["Status"] == "Writable"
+    # Mode findings win over writability; unwritable entries stay quiet
+    assert labels[str(tree / "b" / "tool")]["Status"] == "SetUID"
+    assert str(tree / "a") not in labels
+
+
+def test_critical_path_status(tmp_path):
+    assert check_path(str(tmp_path / "missing"))["Status"] == "Missing"
+    target = tmp_path / "hosts"
+    target.write_text("127.0.0.1 localhost")
+    expected = "Secure" if hasattr(os, "geteuid") and os.geteuid() != 0 else "Writable"
+    os.chmod(target, 0o444)
+    assert check_path(str(target))["Status"] == expected
+
+
+@posix_only
+def test_strategy_output(tree):
+    strategy = FileSystemStrategy(paths={"Tree": str(tree)}, auditor=FileSystemAuditor(check_writable=False))
+    result = asyncio.run(strategy.scan("127.0.0.1"))["FileSystem_Check"]
+    assert result["Audit_Summary"]["Status"] == "Complete"
+    assert result[str(tree / "b" / "tool")]["Risk"] == "HIGH"
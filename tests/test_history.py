@@ -0,0 +1,117 @@
+import gzip
+import sqlite3
+
+from app.core.history import ScanHistory, diff_results
+
+
+def host_result(findings=(), ports=(445,), baseline=None):
+    return {
+        "status": "success",
+        "network": [{"port": p, "service": "SMB", "status": "OPEN"} for p in ports],
+        "registry_baseline": baseline or {},
+        "findings": [{"rule": r, "finding": r, "risk": "HIGH", "mitre": None} for r in findings],
+        "vulnerable": bool(findings),
+    }
+
+
+def test_runs_are_indexed_by_host_and_time(tmp_path):
+    store = ScanHistory(str(tmp_path / "history.db"))
+    store.record("10.0.0.1", host_result(), scanned_at=100.0)
+    store.record("10.0.0.2", host_result(), scanned_at=150.0)
+    newest = store.record("10.0.0.1", host_result(["smbv1-enabled"]), scanned_at=200.0)
+
+    runs = store.runs("10.0.0.1")
+    assert [r["scanned_at"] for r in runs] == [200.0, 100.0]
+    assert runs[0]["vulnerable"] is True and runs[0]["findings"] == 1
+    assert [r["host"] for r in store.runs(since=120.0, until=180.0)] == ["10.0.0.2"]
+    assert store.get(newest)["result"]["findings"][0]["rule"] == "smbv1-enabled"
+
+
+def test_results_are_stored_compressed(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = ScanHistory(path)
+    store.record("10.0.0.1", host_result(ports=range(1000)))
+
+    blob = sqlite3.connect(path).execute("SELECT data FROM scans").fetchone()[0]
+    assert blob[:2] == b"\x1f\x8b"
+    assert len(blob) < len(gzip.decompress(blob)) / 5
+
+
+def test_diff_reports_new_resolved_and_changed(tmp_path):
+    store = ScanHistory(str(tmp_path / "history.db"))
+    first = store.record("h", host_result(["smbv1-enabled"], ports=(445, 3389),
+                                          baseline={"NoLMHash": {"Status": "SECURE", "Risk": "LOW"}}), scanned_at=1.0)
+    store.record("h", host_result(["uac-disabled"], ports=(445,),
+                                  baseline={"NoLMHash": {"Status": "VULNERABLE", "Risk": "HIGH"}}), scanned_at=2.0)
+    store.record("other", host_result(), scanned_at=3.0)
+
+    diff = store.diff("h")
+    assert diff["baseline"]["id"] == first
+    assert [e["key"] for e in diff["new"]] == ["finding:uac-disabled"]
+    assert [e["key"] for e in diff["resolved"]] == ["finding:smbv1-enabled", "port:3389"]
+    assert [e["key"] for e in diff["changed"]] == ["registry:NoLMHash"]
+    assert diff["changed"][0]["after"]["Status"] == "VULNERABLE"
+    assert diff["unchanged"] == 1
+
+    # A single run, or a baseline from another host, has nothing to compare to
+    assert store.diff("other") is None
+    assert store.diff("h", baseline_id=3) is None
+
+
+def test_retention_per_host(tmp_path):
+    store = ScanHistory(str(tmp_path / "history.db"), max_per_host=2)
+    for t in range(4):
+        store.record("h", host_result(), scanned_at=float(t))
+    store.record("other", host_result(), scanned_at=0.0)
+    assert [r["scanned_at"] for r in store.runs("h")] == [3.0, 2.0]
+    assert len(store) == 3
+
+
+def test_repeated_rule_hits_are_kept_apart():
+    before = host_result(["smbv1-enabled"])
+    after = host_result(["smbv1-enabled", "smbv1-enabled"])
+    assert [e["key"] for e in diff_results(before, after)["new"]] == ["finding:smbv1-enabled#2"]
+
+
+def test_partial_runs_do_not_resolve_unscanned_modules(tmp_path):
+    def result(modules, findings):
+        out = host_result(ports=(445,) if "Network_Scan" in modules else ())
+        out["findings"] = [{"rule": r, "finding": r, "risk": "HIGH", "mitre": None, "module": m}
+                           for r, m in findings]
+        out["modules"] = modules
+        return out
+
+    full = ["FileSystem_Check", "Network_Scan", "System_Config", "UAC_Check"]
+    store = ScanHistory(str(tmp_path / "history.db"))
+    first = store.record("h", result(full, [("smbv1-enabled", "System_Config"), ("uac-disabled", "UAC_Check")]),
+                         scanned_at=1.0)
+    partial = store.record("h", result(["UAC_Check"], []), scanned_at=2.0)
+    latest = store.record("h", result(list(reversed(full)), [("smbv1-enabled", "System_Config")]), scanned_at=3.0)
+
+    # The latest full run is compared with the previous full run, not the monitor run
+    diff = store.diff("h")
+    assert diff["baseline"]["id"] == first and diff["current"]["id"] == latest
+    assert diff["current"]["modules"] == sorted(full)
+    assert [e["key"] for e in diff["resolved"]] == ["finding:uac-disabled"]
+    assert diff["new"] == [] and diff["unchanged"] == 2
+
+    # Explicit runs of different sets only compare the modules both scanned
+    diff = store.diff("h", baseline_id=first, current_id=partial)
+    assert [e["key"] for e in diff["resolved"]] == ["finding:uac-disabled"]
+    assert diff["unchanged"] == 0
+
+
+def test_histories_without_module_sets_are_upgraded(tmp_path):
+    path = str(tmp_path / "history.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE scans (id INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT NOT NULL, "
+                 "scanned_at REAL NOT NULL, job_id TEXT, username TEXT, vulnerable INTEGER, "
+                 "findings INTEGER, data BLOB NOT NULL)")
+    conn.commit()
+    conn.close()
+
+    store = ScanHistory(path)
+    store.record("h", host_result(["smbv1-enabled"]), scanned_at=1.0)
+    store.record("h", host_result(), scanned_at=2.0)
+    assert store.runs("h")[0]["modules"] is None
+    assert [e["key"] for e in store.diff("h")["resolved"]] == ["finding:smbv1-enabled"]
@@ -0,0 +1,92 @@
+import time
+import pytest
+
+from app.core.job_store import MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def factory(ttl=60, max_entries=100):
+        if request.param == "memory":
+            store = MemoryJobStore(ttl=ttl, max_entries=max_entries)
+        else:
+            store = SQLiteJobStore(str(tmp_path / "jobs.db"), ttl=ttl, max_entries=max_entries)
+        stores.append(store)
+        return store
+
+    return factory
+
+
+def test_set_and_get(make_store):
+    store = make_store()
+    store["a"] = {"status": "processing", "username": "admin"}
+    assert store.get("a") == {"status": "processing", "username": "admin"}
+    assert store.get("missing") is None
+    assert len(store) == 1
+
+
+def test_max_entries_evicts_oldest(make_store):
+    store = make_store(max_entries=2)
+    for job_id in ("a", "b", "c"):
+        store.set(job_id, {"status": "completed"})
+        time.sleep(0.01)
+    assert len(store) == 2
+    assert store.get("a") is None
+    assert store.get("c") is not None
+
+
+def test_ttl_expiry(make_store):
+    store = make_store(ttl=0.05)
+    store.set("a", {"status": "completed"})
+    time.sleep(0.1)
+    assert store.get("a") is None
+    store.set("b", {"status": "completed"})
+    assert len(store) == 1
+    time.sleep(0.1)
+    # Expired jobs are not counted, even before the next write evicts them
+    assert len(store) == 0
+
+
+def test_latest_for_user(make_store):
+    store = make_store()
+    store.set("old", {"status": "completed", "username": "admin", "n": 1})
+    time.sleep(0.01)
+    store.set("new", {"status": "completed", "username": "admin", "n": 2})
+    store.set("other", {"status": "completed", "username": "bob", "n": 3})
+    store.set("running", {"status": "processing", "username": "admin", "n": 4})
+
+    assert store.latest("admin")["n"] == 2
+    assert store.latest("admin", "processing")["n"] == 4
+    assert store.latest("nobody") is None
+
+    time.sleep(0.01)
+    store.set("fleet", {"status": "completed", "username": "admin", "kind": "fleet", "n": 5})
+    assert store.latest("admin")["n"] == 5
+    assert store.latest("admin", kind="host")["n"] == 2
+    assert store.latest("admin", kind="fleet")["n"] == 5
+
+
+def test_latest_falls_back_when_indexed_job_is_gone(make_store):
+    store = make_store(ttl=0.2)
+    store.set("old", {"status": "completed", "username": "admin", "n": 1})
+    time.sleep(0.01)
+    store.set("new", {"status": "completed", "username": "admin", "n": 2})
+    # The newest completed job is re-run: the previous completed one is served
+    store.set("new", {"status": "processing", "username": "admin", "n": 3})
+    assert store.latest("admin")["n"] == 1
+    assert store.latest("admin", kind="host")["n"] == 1
+
+    time.sleep(0.25)
+    assert store.latest("admin") is None
+
+
+def test_sqlite_shared_between_instances(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    writer = SQLiteJobStore(path)
+    reader = SQLiteJobStore(path)
+    writer.set("a", {"status": "completed", "username": "admin"})
+    assert reader.get("a")["status"] == "completed"
+    mode = reader._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
@@ -0,0 +1,55 @@
+import asyncio
+
+from app.core.context import ContextScanner
+from app.core.metrics import MetricsRegistry, STRATEGY_DURATION, STRATEGY_FAILURES
+from tests.test_scanner import FakeStrategy
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    runs = registry.counter("bench_runs_total", "Runs", ["kind"])
+    latency = registry.histogram("bench_seconds", "Latency", ["kind"], buckets=(0.1, 1.0))
+    hosts = registry.gauge("bench_host_seconds", "Per host", ["host"], max_series=2)
+
+    runs.inc(kind='a"b')
+    runs.inc(2, kind="plain")
+    latency.observe(0.1, kind="scan")
+    latency.observe(0.5, kind="scan")
+    latency.observe(5, kind="scan")
+    for host in ("h1", "h2", "h3"):
+        hosts.set(1.5, host=host)
+
+    text = registry.render()
+    assert "# TYPE bench_runs_total counter" in text
+    assert 'bench_runs_total{kind="a\\"b"} 1' in text
+    assert 'bench_runs_total{kind="plain"} 2' in text
+    assert 'bench_seconds_bucket{kind="scan",le="0.1"} 1' in text
+    assert 'bench_seconds_bucket{kind="scan",le="1"} 2' in text
+    assert 'bench_seconds_bucket{kind="scan",le="+Inf"} 3' in text
+    assert 'bench_seconds_sum{kind="scan"} 5.6' in text
+    assert 'bench_seconds_count{kind="scan"} 3' in text
+    # Oldest host series evicted
+    assert 'host="h1"' not in text and 'bench_host_seconds{host="h3"} 1.5' in text
+    assert text.endswith("\n")
+
+
+def test_context_scanner_records_strategy_metrics():
+    class Broken(FakeStrategy):
+        async def scan(self, target):
+            raise RuntimeError("boom")
+
+    class MetricsProbe(FakeStrategy):
+        pass
+
+    runs = STRATEGY_DURATION.count(strategy="MetricsProbe")
+    failures = STRATEGY_FAILURES.value(strategy="Broken", reason="exception")
+    errors = STRATEGY_FAILURES.value(strategy="MetricsProbe", reason="error")
+
+    scanner = ContextScanner("127.0.0.1", concurrent=True)
+    scanner.add_strategy(MetricsProbe({"error": "Script not found"}))
+    scanner.add_strategy(Broken({}))
+    asyncio.run(scanner.execute_scan())
+
+    assert STRATEGY_DURATION.count(strategy="MetricsProbe") == runs + 1
+    assert STRATEGY_FAILURES.value(strategy="Broken", reason="exception") == failures + 1
+    assert STRATEGY_FAILURES.value(strategy="MetricsProbe", reason="error") == errors + 1
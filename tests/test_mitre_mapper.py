@@ -37,9 +37,11 @@ def temp_cache():
         
     yield path
     
-    # Cleanup
-    if os.path.exists(path):
-        os.remove(path)
+    # Cleanup (cache file and its technique index)
+    index = os.path.splitext(path)[0] + ".idx.db"
+    for leftover in (path, index, index + "-wal", index + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
 
 
 def test_load_cache(temp_cache):
@@ -117,3 +119,172 @@ def test_update_cache_no_attackcti(mock_logger):
         mapper = MitreMapper(cache_file="dummy.json")
         mapper.update_cache()
         mock_logger.error.assert_called_with("attackcti is not installed. Please install it to update the MITRE cache.")
+
+
+def test_index_is_shared_and_lazy(temp_cache):
+    first = MitreMapper(cache_file=temp_cache)
+    second = MitreMapper(cache_file=temp_cache)
+    assert first.cache is second.cache
+
+    details = first.get_technique_details("Unquoted_Services")
+    # Only the looked-up record is materialised, and later mappers reuse it
+    assert list(first.cache._records) == ["T1574.009"]
+    assert second.get_technique_details("Unquoted_Services") is details
+
+
+def test_index_follows_cache_file_changes(temp_cache):
+    mapper = MitreMapper(cache_file=temp_cache)
+    assert "T1088" in mapper.cache
+
+    with open(temp_cache, 'w', encoding='utf-8') as f:
+        json.dump({"T1210": {"id": "T1210", "name": "Exploitation of Remote Services",
+                             "description": "New", "url": None}}, f)
+
+    refreshed = MitreMapper(cache_file=temp_cache)
+    assert len(refreshed.cache) == 1
+    assert "T1088" not in refreshed.cache
+    assert refreshed.get_technique_details("SMBv1_Status")["description"] == "New"
+
+
+def test_missing_cache_file_uses_fallback(tmp_path):
+    mapper = MitreMapper(cache_file=str(tmp_path / "missing.json"))
+    assert len(mapper.cache) == 0
+    assert mapper.get_technique_details("UAC_Check")["name"] == "Metadata unavailable"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_enrich_report_is_idempotent_and_in_place(temp_cache):
+    mapper = MitreMapper(cache_file=temp_cache)
+    services = [{"Unquoted_Services": "svc"}]
+    report = {"Unquoted_Services": "svc", "hosts": services}
+
+    assert mapper.enrich_report(report) is report
+    mapper.enrich_report(report)
+
+    assert report["hosts"] is services
+    assert [next(iter(t)) for t in report["mitre_techniques"]] == ["Unquoted_Services"]
+    assert len(services[0]["mitre_techniques"]) == 1
+
+
+def test_enrich_report_cost_follows_mapped_findings(temp_cache):
+    mapper = MitreMapper(cache_file=temp_cache)
+    hosts = {f"10.0.{i // 256}.{i % 256}": {"ports": list(range(50)), "banner": "x" * 10}
+             for i in range(2000)}
+    hosts["10.9.9.9"] = {"System_Config": {"Unquoted_Services": "svc"}}
+    report = {"hosts": hosts}
+
+    with patch.object(mapper, "get_technique_details", wraps=mapper.get_technique_details) as lookup:
+        mapper.enrich_report(report)
+
+    assert lookup.call_count == 1
+    assert "mitre_techniques" in hosts["10.9.9.9"]["System_Config"]
+    assert "mitre_techniques" not in report
+
+
+def test_enrich_report_visits_only_finding_sections(temp_cache):
+    mapper = MitreMapper(cache_file=temp_cache)
+    hosts = {f"10.0.{i // 256}.{i % 256}": {"Network_Scan": {"open": [{"port": p, "banner": {"raw": "x"}}
+                                                                       for p in range(20)]},
+                                            "Registry_Baseline": {"checks": [{"key": "k", "ok": True}] * 10}}
+             for i in range(2000)}
+    hosts["10.9.9.9"] = {"System_Config": {"Unquoted_Services": "svc"}}
+    report = {"hosts": hosts}
+
+    mapper.enrich_report(report)
+
+    # The report, each host and the one System_Config section; no port, banner or check dicts
+    assert mapper.visited == 1 + len(hosts) + 1
+    assert "mitre_techniques" in hosts["10.9.9.9"]["System_Config"]
+
+
+def test_enrich_report_containers_come_from_check_pack(temp_cache):
+    from app.core.checkpack import CheckPack
+    pack = CheckPack([{"finding": "Unquoted_Services", "mitre": "T1574.009", "within": "Services"}])
+    mapper = MitreMapper(cache_file=temp_cache, technique_map=pack.technique_map, containers=pack.containers)
+    report = {"Services": {"Unquoted_Services": "svc"}, "System_Config": {"Unquoted_Services": "svc"}}
+
+    mapper.enrich_report(report)
+
+    assert pack.containers == {"Services"}
+    assert "mitre_techniques" in report["Services"]
+    assert "mitre_techniques" not in report["System_Config"]
+    assert mapper.visited == 2
+
+
+def test_enrich_report_keeps_caller_technique_list(temp_cache):
+    mapper = MitreMapper(cache_file=temp_cache)
+    supplied = {"Unquoted_Services": "x", "mitre_techniques": []}
+    created = {"Unquoted_Services": "x"}
+
+    # No details for the technique: nothing gets attached
+    with patch.object(mapper, "get_technique_details", return_value=None):
+        mapper.enrich_report([supplied, created])
+
+    assert supplied["mitre_techniques"] == []
+    assert "mitre_techniques" not in created
+
+
+def stix_technique(mitre_id, modified, **extra):
+    obj = {
+        "type": "attack-pattern", "id": f"attack-pattern--{mitre_id}", "name": f"Technique {mitre_id}",
+        "description": "Bundle description", "modified": modified,
+        "external_references": [{"source_name": "mitre-attack", "external_id": mitre_id,
+                                  "url": f"https://attack.mitre.org/techniques/{mitre_id}/"}],
+    }
+    obj.update(extra)
+    return obj
+
+
+def write_bundle(path, objects):
+    path.write_text(json.dumps({"type": "bundle", "id": "bundle--1", "objects": objects}, indent=1))
+    return str(path)
+
+
+def test_iter_stix_objects_streams_small_chunks(tmp_path):
+    from app.core.mitre_mapper import iter_stix_objects
+    objects = [stix_technique(f"T{1000 + i}", "2024-01-01T00:00:00.000Z") for i in range(20)]
+    bundle = write_bundle(tmp_path / "bundle.json", objects)
+
+    assert list(iter_stix_objects(bundle, chunk_size=7)) == objects
+
+    (tmp_path / "truncated.json").write_text(open(bundle).read()[:-200])
+    with pytest.raises(ValueError):
+        list(iter_stix_objects(str(tmp_path / "truncated.json"), chunk_size=64))
+
+
+def test_bundle_refresh_is_incremental(tmp_path):
+    cache_file = str(tmp_path / "mitre_cache.json")
+    mapper = MitreMapper(cache_file=cache_file)
+    first = write_bundle(tmp_path / "v1.json", [
+        stix_technique("T1210", "2024-01-01T00:00:00.000Z"),
+        stix_technique("T1088", "2024-01-01T00:00:00.000Z"),
+        stix_technique("T1548.002", "2024-01-01T00:00:00.000Z"),
+        {"type": "intrusion-set", "id": "intrusion-set--x", "name": "Ignored"},
+    ])
+    summary = mapper.update_cache_from_bundle(first)
+    assert sorted(summary["added"]) == ["T1088", "T1210", "T1548.002"]
+
+    # Nothing changed: the cache file is left untouched
+    stamp = os.stat(cache_file).st_mtime_ns
+    assert mapper.update_cache_from_bundle(first)["unchanged"] == 3
+    assert os.stat(cache_file).st_mtime_ns == stamp
+
+    second = write_bundle(tmp_path / "v2.json", [
+        stix_technique("T1210", "2024-01-01T00:00:00.000Z"),
+        stix_technique("T1088", "2024-06-01T00:00:00Z", revoked=True),
+        stix_technique("T1548.002", "2023-01-01T00:00:00.000Z", description="Older copy"),
+        {"type": "relationship", "id": "relationship--1", "relationship_type": "revoked-by",
+         "source_ref": "attack-pattern--T1088", "target_ref": "attack-pattern--T1548.002"},
+    ])
+    summary = mapper.update_cache_from_bundle(second)
+    assert summary["updated"] == ["T1088"]
+    assert summary["revoked"] == ["T1088"]
+    assert summary["unchanged"] == 2
+
+    with open(cache_file, encoding='utf-8') as f:
+        cache = json.load(f)
+    assert cache["T1088"]["revoked_by"] == "T1548.002"
+    assert cache["T1548.002"]["description"] == "Bundle description"
+    # Atomic writes leave no temporary files behind
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+    assert MitreMapper(cache_file=cache_file).cache.get("T1088")["revoked"] is True
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import pytest
+
+from app.core.monitor import Monitor, MonitoredHost, load_plan, parse_interval
+
+
+def test_parse_interval():
+    assert parse_interval(90) == 90.0
+    assert parse_interval("30s") == 30.0
+    assert parse_interval("15m") == 900.0
+    assert parse_interval("1.5h") == 5400.0
+    assert parse_interval("1d") == 86400.0
+    for bad in ("soon", "0", "-5m"):
+        with pytest.raises(ValueError):
+            parse_interval(bad)
+
+
+def test_load_plan_expands_targets(tmp_path):
+    plan = tmp_path / "plan.json"
+    plan.write_text(json.dumps([
+        {"targets": ["10.0.0.0/31"], "modules": ["service"], "interval": "1h", "max_interval": "2h"},
+        {"targets": "srv01", "interval": 600},
+    ]))
+    hosts = load_plan(str(plan))
+    assert [h.target for h in hosts] == ["10.0.0.0", "10.0.0.1", "srv01"]
+    assert hosts[0].modules == ["service"] and hosts[2].modules is None
+    assert (hosts[0].min_interval, hosts[0].max_interval) == (900.0, 7200.0)
+
+    plan.write_text(json.dumps([{"targets": ["srv01"]}]))
+    with pytest.raises(ValueError):
+        load_plan(str(plan))
+
+    for modules in (["service", "regsitry"], "service"):
+        plan.write_text(json.dumps([{"targets": ["srv01"], "modules": modules, "interval": "1h"}]))
+        with pytest.raises(ValueError):
+            load_plan(str(plan))
+
+
+def test_changing_hosts_are_scanned_more_often():
+    runs = {"flappy": 0, "stable": 0}
+
+    async def scan(target, modules):
+        runs[target] += 1
+        await asyncio.sleep(0)
+        if target == "flappy" and runs[target] % 2:
+            return {"findings": [{"rule": "smbv1-enabled", "risk": "HIGH"}]}
+        return {"findings": []}
+
+    flappy = MonitoredHost("flappy", None, 0.04, min_interval=0.01, max_interval=0.2)
+    stable = MonitoredHost("stable", ["registry"], 0.04, min_interval=0.01, max_interval=0.2)
+    summaries = []
+    monitor = Monitor(scan, [flappy, stable], jitter=0.0, splay=0.0,
+                      on_result=lambda host, summary: summaries.append(summary))
+
+    asyncio.run(monitor.run(max_runs=12))
+
+    assert flappy.interval == 0.01 and stable.interval > 0.04
+    assert runs["flappy"] > runs["stable"]
+    assert flappy.changes == flappy.runs - 1 and stable.changes == 0
+    assert summaries[0]["baseline"] is True
+    assert any(s.get("changed") for s in summaries if s["target"] == "flappy")
+
+
+def test_failed_scan_keeps_interval_and_stop_event():
+    async def scan(target, modules):
+        raise RuntimeError("host unreachable")
+
+    host = MonitoredHost("down", None, 0.01)
+    summaries = []
+
+    async def main():
+        stop = asyncio.Event()
+        monitor = Monitor(scan, [host], jitter=0.5, splay=0.0,
+                          on_result=lambda h, s: (summaries.append(s), len(summaries) >= 3 and stop.set()))
+        return await monitor.run(stop=stop)
+
+    assert asyncio.run(main()) >= 3
+    assert host.failures >= 3 and host.runs == 0 and host.interval == 0.01
+    assert summaries[0]["error"] == "host unreachable"
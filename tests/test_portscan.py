@@ -0,0 +1,115 @@
+import asyncio
+import socket
+import pytest
+
+from app.core import portscan
+
+from app.core.portscan import PortScanner, parse_ports, describe_ports, TOP_PORTS
+
+
+@pytest.fixture
+def listeners():
+    socks = []
+    for _ in range(3):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind(("127.0.0.1", 0))
+        s.listen()
+        socks.append(s)
+    yield sorted(s.getsockname()[1] for s in socks)
+    for s in socks:
+        s.close()
+
+
+def test_parse_ports():
+    assert parse_ports("21,445,3389") == [21, 445, 3389]
+    assert parse_ports("20-22, 21") == [20, 21, 22]
+    assert parse_ports("top5") == TOP_PORTS[:5]
+    assert parse_ports("top") == parse_ports(f"top{len(TOP_PORTS)}") == TOP_PORTS
+    assert len(parse_ports("all")) == 65535
+
+
+@pytest.mark.parametrize("spec", ["0", "70000", "10-5", "abc", "top0", f"top{len(TOP_PORTS) + 1}", "top1000"])
+def test_parse_ports_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_ports(spec)
+
+
+def test_scan_finds_local_listeners(listeners):
+    low, high = listeners[0] - 50, listeners[-1] + 50
+    ports = parse_ports(f"{max(1, low)}-{min(65535, high)}")
+
+    scanner = PortScanner(concurrency=64, timeout=0.5)
+    found = asyncio.run(scanner.scan("127.0.0.1", ports))
+
+    assert set(listeners) <= set(found)
+    # Loopback RTT is tiny, so the adaptive timeout drops to its floor
+    assert scanner.timeout < 0.5
+
+
+def test_only_timeouts_are_retried(monkeypatch):
+    scanner = PortScanner(concurrency=4, timeout=0.1, retries=2)
+    attempts = {}
+
+    async def fake_probe(addr, family, port, timeout):
+        attempts[port] = attempts.get(port, 0) + 1
+        if port == 1:
+            return "timeout"
+        return "open" if port == 2 else "closed"
+
+    monkeypatch.setattr(scanner, "_probe", fake_probe)
+    found = asyncio.run(scanner.scan("127.0.0.1", [1, 2, 3]))
+
+    assert found == [2]
+    assert attempts == {1: 3, 2: 1, 3: 1}
+
+
+def test_describe_ports():
+    assert describe_ports([445, 12345]) == [
+        {"port": 445, "service": "SMB (Windows File Sharing)", "status": "OPEN"},
+        {"port": 12345, "service": "Unknown", "status": "OPEN"},
+    ]
+
+
+class FakeSocket:
+    live = 0
+    peak = 0
+
+    def __init__(self, *args):
+        FakeSocket.live += 1
+        FakeSocket.peak = max(FakeSocket.peak, FakeSocket.live)
+
+    def setblocking(self, flag):
+        pass
+
+    def close(self):
+        FakeSocket.live -= 1
+
+
+def test_scanners_share_one_socket_budget(monkeypatch):
+    monkeypatch.setattr(portscan, "default_concurrency", lambda: 5)
+
+    async def refuse(sock, address):
+        await asyncio.sleep(0.005)
+        raise ConnectionRefusedError
+
+    async def fleet():
+        # Patched inside the loop: asyncio needs real sockets for its own self-pipe
+        monkeypatch.setattr(portscan.socket, "socket", FakeSocket)
+        monkeypatch.setattr(asyncio.get_running_loop(), "sock_connect", refuse, raising=False)
+        scanners = [PortScanner(concurrency=10, timeout=0.5, retries=0) for _ in range(4)]
+        return await asyncio.gather(*(s.scan("127.0.0.1", list(range(1, 31))) for s in scanners))
+
+    assert asyncio.run(fleet()) == [[]] * 4
+    # Four scanners with 10 workers each never hold more than the shared 5 sockets
+    assert FakeSocket.peak == 5 and FakeSocket.live == 0
+
+
+def test_socket_exhaustion_is_retried(monkeypatch):
+    def no_descriptors(*args):
+        raise OSError(24, "Too many open files")
+
+    async def probe():
+        monkeypatch.setattr(portscan.socket, "socket", no_descriptors)
+        return await PortScanner(concurrency=2, timeout=0.1)._probe(("127.0.0.1", 0), socket.AF_INET, 80, 0.1)
+
+    assert asyncio.run(probe()) == "timeout"
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import sys
+import time
+import pytest
+
+from app.core.pspool import PowerShellPool, PowerShellError, FRAME_MARKER
+from app.core.strategies import ServiceConfigStrategy
+
+# Stand-in interpreter speaking the protocol of scripts/ps_worker.ps1.
+# "Running" a script echoes its contents; HANG and CRASH scripts misbehave.
+STUB_WORKER = f'''
+import json, os, sys, time
+MARKER = {FRAME_MARKER!r}
+def send(reply):
+    print("noise before frame")
+    print(MARKER + json.dumps(reply), flush=True)
+send({{"ready": True, "pid": os.getpid()}})
+for line in sys.stdin:
+    request = json.loads(line)
+    if request.get("ping"):
+        send({{"id": request["id"], "ok": True}})
+        continue
+    body = open(request["script"]).read()
+    if body.startswith("HANG"):
+        time.sleep(float(body.split()[1]))
+    if body.startswith("CRASH"):
+        sys.exit(1)
+    if body.startswith("FAIL"):
+        send({{"id": request["id"], "ok": False, "error": "script threw"}})
+        continue
+    send({{"id": request["id"], "ok": True, "output": body + " pid=" + str(os.getpid()) + " " + " ".join(request["args"])}})
+'''
+
+
+@pytest.fixture
+def make_pool(tmp_path):
+    stub = tmp_path / "stub_worker.py"
+    stub.write_text(STUB_WORKER)
+
+    def factory(**kwargs):
+        return PowerShellPool([sys.executable, str(stub)], **kwargs)
+    return factory
+
+
+@pytest.fixture
+def script(tmp_path):
+    def factory(body, name="job.ps1"):
+        path = tmp_path / name
+        path.write_text(body)
+        return str(path)
+    return factory
+
+
+def pid_of(output):
+    return output.split("pid=")[1].split()[0]
+
+
+def test_workers_are_reused_and_recycled(make_pool, script):
+    pool = make_pool(size=1, max_jobs=2)
+    job = script("hello")
+
+    async def main():
+        outputs = [await pool.run(job, args=["-Verbose"]) for _ in range(3)]
+        await pool.close()
+        return outputs
+
+    outputs = asyncio.run(main())
+    assert outputs[0].startswith("hello pid=") and outputs[0].endswith("-Verbose")
+    assert pid_of(outputs[0]) == pid_of(outputs[1]) != pid_of(outputs[2])
+    assert (pool.spawned, pool.recycled) == (2, 1)
+
+
+def test_timeout_kills_and_replaces_worker(make_pool, script):
+    pool = make_pool(size=1, timeout=0.3)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(script("HANG 5", "hang.ps1"))
+        output = await pool.run(script("after"))
+        await pool.close()
+        return output
+
+    start = time.perf_counter()
+    assert asyncio.run(main()).startswith("after")
+    assert time.perf_counter() - start < 3
+    assert pool.spawned == 2
+
+
+def test_dead_and_failing_workers(make_pool, script):
+    pool = make_pool(size=1, health_interval=0)
+
+    async def main():
+        with pytest.raises(PowerShellError):
+            await pool.run(script("CRASH", "crash.ps1"))
+        with pytest.raises(PowerShellError, match="script threw"):
+            await pool.run(script("FAIL", "fail.ps1"))
+        # A script error does not cost the worker; pings run before each reuse
+        output = await pool.run(script("ok"))
+        await pool.close()
+        return output
+
+    assert asyncio.run(main()).startswith("ok")
+    assert pool.spawned == 2
+
+
+def test_runs_in_parallel_up_to_size(make_pool, script):
+    pool = make_pool(size=2)
+    job = script("HANG 0.4")
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.run(job) for _ in range(4)))
+        elapsed = time.perf_counter() - start
+        await pool.close()
+        return elapsed
+
+    elapsed = asyncio.run(main())
+    assert 0.8 <= elapsed < 1.6
+    assert pool.spawned == 2
+    assert len(pool) == 0
+
+
+def test_service_config_strategy_uses_pool(make_pool, tmp_path, monkeypatch):
+    from app.core.config import settings
+    (tmp_path / "audit_script.ps1").write_text('{"SMBv1_Status": "Disabled"}')
+    monkeypatch.setattr(settings, "SCRIPTS_DIR", str(tmp_path))
+    pool = make_pool(size=1)
+
+    async def main():
+        result = await ServiceConfigStrategy(pool=pool).scan("127.0.0.1")
+        await pool.close()
+        return result
+
+    assert asyncio.run(main()) == {"System_Config": {"SMBv1_Status": "Disabled"}}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Stand-in interpreter relies on a shebang")
+def test_strategy_falls_back_when_workers_cannot_start(tmp_path, monkeypatch):
+    import stat
+    from app.core.config import settings
+    # What scripts/ps_worker.ps1 answers on PowerShell v2
+    old_worker = tmp_path / "old_worker.py"
+    old_worker.write_text(f"import json\nprint({FRAME_MARKER!r} + json.dumps({{'ready': False, "
+                          f"'error': 'PowerShell 3.0 or later is required'}}), flush=True)\n")
+    fake_ps = tmp_path / "powershell"
+    fake_ps.write_text(f"#!{sys.executable}\nimport sys\nprint(open(sys.argv[-1]).read())\n")
+    fake_ps.chmod(fake_ps.stat().st_mode | stat.S_IEXEC)
+    (tmp_path / "audit_script.ps1").write_text('{"SMBv1_Status": "Disabled"}')
+    monkeypatch.setattr(settings, "SCRIPTS_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "POWERSHELL_PATH", str(fake_ps))
+    pool = PowerShellPool([sys.executable, str(old_worker)], size=1, start_timeout=5)
+
+    async def main():
+        return [await ServiceConfigStrategy(pool=pool).scan("127.0.0.1") for _ in range(2)]
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    assert results == [{"System_Config": {"SMBv1_Status": "Disabled"}}] * 2
+    # Failed fast on the ready frame, then stopped trying the pool
+    assert time.perf_counter() - start < 5
+    assert pool.disabled and pool.spawned == 0
+
+
+def test_workers_of_a_finished_loop_are_reaped(make_pool, script):
+    pool = make_pool(size=1)
+    job = script("hello")
+
+    first = pid_of(asyncio.run(pool.run(job)))
+    second = asyncio.run(pool.run(job))
+
+    assert pid_of(second) != first
+    with pytest.raises(ProcessLookupError):
+        # A zombie would still accept signal 0
+        os.kill(int(first), 0)
+    asyncio.run(pool.close())
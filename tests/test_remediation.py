@@ -0,0 +1,61 @@
+import io
+import json
+import os
+import zipfile
+
+from app.core import remediation
+from app.core.remediation import CompiledTemplate, get_template, group_hosts, iter_remediation, write_fleet_bundle
+
+SMB = {"desc": "Disable SMBv1", "cmd": "Disable-SMB1"}
+UAC = {"desc": "Enable UAC", "cmd": "Enable-UAC"}
+
+
+def test_compiled_template_renders_chunks():
+    template = CompiledTemplate("Generated: {{ timestamp }}\n{{fix_blocks}}\nEnd {{ missing }}")
+    assert template.placeholders == ["timestamp", "fix_blocks", "missing"]
+    rendered = template.render({"timestamp": "now", "fix_blocks": iter(["a", "b"])})
+    assert rendered == "Generated: now\nab\nEnd "
+
+
+def test_template_cache_invalidated_on_change(tmp_path):
+    path = tmp_path / "template.ps1"
+    path.write_text("v1 {{ fix_blocks }}")
+    first = get_template(str(path))
+    assert get_template(str(path)) is first
+
+    path.write_text("version 2 {{ fix_blocks }}")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    second = get_template(str(path))
+    assert second is not first
+    assert "".join(iter_remediation([SMB], "now", str(path))).startswith("version 2")
+    assert get_template(str(tmp_path / "missing.ps1")) is None
+
+
+def test_missing_template_falls_back(tmp_path):
+    content = "".join(iter_remediation([SMB, UAC], "2025-01-01", str(tmp_path / "missing.ps1")))
+    assert content.startswith("# WINSEC DEFENDER REMEDIATION SCRIPT - 2025-01-01")
+    assert "Disable-SMB1" in content and "Enable-UAC" in content
+    assert list(iter_remediation([], "now")) == []
+
+
+def test_fleet_bundle_dedupes_identical_fix_sets(monkeypatch):
+    host_fixes = {f"10.0.0.{i}": [SMB, UAC] for i in range(1, 6)}
+    host_fixes["10.0.0.9"] = [UAC]
+    host_fixes["10.0.0.10"] = []
+
+    renders = []
+    real = remediation.iter_remediation
+    monkeypatch.setattr(remediation, "iter_remediation",
+                        lambda fixes, *args: renders.append(fixes) or real(fixes, *args))
+
+    out = io.BytesIO()
+    manifest = write_fleet_bundle(out, host_fixes, "2025-01-01 10:00:00")
+    assert len(renders) == 2
+    assert manifest["scripts"] == 2 and manifest["hosts_without_fixes"] == ["10.0.0.10"]
+    assert [len(g["hosts"]) for g in manifest["groups"]] == [5, 1]
+
+    with zipfile.ZipFile(out) as bundle:
+        assert json.loads(bundle.read("manifest.json")) == manifest
+        script = bundle.read(manifest["groups"][0]["script"]).decode("utf-8")
+    assert "Disable-SMB1" in script and "2025-01-01 10:00:00" in script
+    assert group_hosts({"a": [SMB], "b": [SMB]})[0]["hosts"] == ["a", "b"]
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Dict, Any, Optional
+
+from app.core.context import ContextScanner
+from app.core.interfaces import IScanStrategy
+from app.core.result_cache import ResultCache
+
+
+class CountingStrategy(IScanStrategy):
+    cache_ttl = 60
+
+    def __init__(self, token: Optional[str] = None, fail: bool = False):
+        self.calls = 0
+        self.token = token
+        self.fail = fail
+
+    async def change_token(self, target: str) -> Optional[str]:
+        return self.token
+
+    async def scan(self, target: str) -> Dict[str, Any]:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("boom")
+        return {"Counting": {"calls": self.calls}}
+
+
+def run(strategy, cache, refresh=False):
+    scanner = ContextScanner("127.0.0.1", cache=cache, refresh=refresh)
+    scanner.add_strategy(strategy)
+    return asyncio.run(scanner.execute_scan())
+
+
+def test_hit_within_ttl_and_refresh_bypass():
+    cache, strategy = ResultCache(), CountingStrategy()
+    assert run(strategy, cache)["Counting"]["calls"] == 1
+    assert run(strategy, cache)["Counting"]["calls"] == 1
+    assert run(strategy, cache, refresh=True)["Counting"]["calls"] == 2
+    # The refreshed result replaces the cached one
+    assert run(strategy, cache)["Counting"]["calls"] == 2
+
+
+def test_ttl_expiry_and_overrides(monkeypatch):
+    import app.core.result_cache as result_cache
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+
+    cache, strategy = ResultCache(), CountingStrategy()
+    run(strategy, cache)
+    now[0] += 61
+    assert run(strategy, cache)["Counting"]["calls"] == 2
+
+    # A TTL of 0 disables caching for that strategy
+    disabled = ResultCache(ttls={"CountingStrategy": 0})
+    run(strategy, disabled)
+    assert run(strategy, disabled)["Counting"]["calls"] == 4
+    assert len(disabled) == 0
+
+
+def test_change_token_invalidates():
+    cache, strategy = ResultCache(), CountingStrategy(token="v1")
+    run(strategy, cache)
+    assert run(strategy, cache)["Counting"]["calls"] == 1
+    strategy.token = "v2"
+    assert run(strategy, cache)["Counting"]["calls"] == 2
+
+
+def test_cached_results_are_isolated_copies():
+    cache, strategy = ResultCache(), CountingStrategy()
+    run(strategy, cache)["Counting"]["mitre_techniques"] = ["enriched"]
+    assert "mitre_techniques" not in run(strategy, cache)["Counting"]
+
+
+def test_errors_are_not_cached():
+    cache, strategy = ResultCache(), CountingStrategy(fail=True)
+    run(strategy, cache)
+    run(strategy, cache)
+    assert strategy.calls == 2
+    assert len(cache) == 0
+
+
+def test_lru_bound_and_invalidate():
+    cache = ResultCache(max_entries=2)
+    for target in ("a", "b", "c"):
+        cache.set((target, "S", ()), {"x": 1})
+    assert len(cache) == 2
+    assert cache.get(("a", "S", ()), ttl=60) is None
+    cache.invalidate("b")
+    assert cache.get(("b", "S", ()), ttl=60) is None
+    assert cache.get(("c", "S", ()), ttl=60) == {"x": 1}
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from typing import Dict, Any
+from unittest.mock import patch
+
+from app.core.interfaces import IScanStrategy
+from app.core.scanner import HybridScanner
+
+
+class FakeStrategy(IScanStrategy):
+    def __init__(self, result: Dict[str, Any], delay: float = 0.0):
+        self.result = result
+        self.delay = delay
+
+    async def scan(self, target: str) -> Dict[str, Any]:
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+def fake_modules():
+    # Delays make completion order differ from report order
+    return [
+        ("Network_Scan", FakeStrategy({"Network_Scan": [{"port": 445, "service": "SMB", "status": "OPEN"}]}, 0.03)),
+        ("System_Config", FakeStrategy({"System_Config": {"SMBv1_Status": "Enabled", "Unquoted_Services": "None"}}, 0.02)),
+        ("UAC_Check", FakeStrategy({"UAC_Check": {"Status": "VULNERABLE", "Risk": "HIGH", "Check": "System\\EnableLUA"}}, 0.0)),
+        ("FileSystem_Check", FakeStrategy({"error": "Script not found"}, 0.01)),
+    ]
+
+
+def test_run_all_merges_and_enriches_each_module_once():
+    scanner = HybridScanner()
+    enrich = scanner.mitre_mapper.enrich_report
+    calls = []
+
+    def record(report_data):
+        calls.append(list(report_data))
+        return enrich(report_data)
+
+    with patch.object(scanner, "_build_modules", side_effect=fake_modules), \
+         patch.object(scanner.mitre_mapper, "enrich_report", side_effect=record):
+        report = asyncio.run(scanner.run_all())
+
+    modules = ["Network_Scan", "System_Config", "UAC_Check", "FileSystem_Check"]
+    module_calls = sorted(keys[0] for keys in calls)
+    assert module_calls == sorted(modules)
+    assert list(report)[:4] == ["Network_Scan", "System_Config", "UAC_Check", "FileSystem_Check"]
+    assert report["FileSystem_Check"] == {"error": "Script not found"}
+    techniques = [next(iter(t)) for t in report["mitre_techniques"]]
+    assert techniques == ["Network_Scan", "UAC_Check", "FileSystem_Check"]
+
+
+def test_run_all_fixes_follow_module_order():
+    scanner = HybridScanner()
+    with patch.object(scanner, "_build_modules", side_effect=fake_modules):
+        asyncio.run(scanner.run_all())
+
+    descs = [f["desc"] for f in scanner.fixes]
+    assert descs == ["Disable SMBv1 (WannaCry Risk)", "Enable UAC (Secure Desktop)"]
+
+
+def test_stream_all_yields_in_completion_order():
+    scanner = HybridScanner()
+
+    async def collect():
+        return [(key, event) async for key, event in scanner.stream_all()]
+
+    with patch.object(scanner, "_build_modules", side_effect=fake_modules):
+        events = asyncio.run(collect())
+
+    assert [key for key, _ in events] == ["UAC_Check", "FileSystem_Check", "System_Config", "Network_Scan"]
+    uac = dict(events)["UAC_Check"]
+    assert uac["fixes"][0]["desc"] == "Enable UAC (Secure Desktop)"
+    assert next(iter(uac["mitre_techniques"][0])) == "UAC_Check"
+
+
+def test_modules_selects_what_runs():
+    scanner = HybridScanner(modules=["service", "UAC_Check"])
+    # Selection happens in _build_modules, so the stand-in applies it too
+    selected = lambda: [(key, strategy) for key, strategy in fake_modules() if key in scanner.modules]
+    with patch.object(scanner, "_build_modules", side_effect=selected):
+        report = asyncio.run(scanner.run_all())
+
+    assert [k for k in report if k != "mitre_techniques"] == ["System_Config", "UAC_Check"]
+    result = scanner.build_result()
+    assert result["network"] == [] and result["vulnerable"] is True
+    # Recorded so history diffs do not read the modules left out as resolved
+    assert result["modules"] == ["System_Config", "UAC_Check"]
+    assert {f["module"] for f in result["findings"]} <= {"System_Config", "UAC_Check"}
+
+
+def test_unknown_modules_are_rejected():
+    with pytest.raises(ValueError, match="regsitry"):
+        HybridScanner(modules=["service", "regsitry"])
+
+
+def test_registered_strategy_is_a_module(monkeypatch):
+    from app.core import registry
+    monkeypatch.setattr(registry, "STRATEGIES", dict(registry.STRATEGIES))
+    registry.register_strategy("custom", "tests.test_scanner:FakeStrategy")
+    monkeypatch.setattr(registry, "create_strategy", lambda name: FakeStrategy({name: "ok"}))
+
+    scanner = HybridScanner(modules=["custom"])
+    assert [key for key, _ in scanner._build_modules()] == ["custom"]
+
+
+def test_remote_target_skips_local_only_modules():
+    def modules():
+        result = fake_modules()
+        for key, strategy in result:
+            strategy.local_only = key != "Network_Scan"
+        return result
+
+    scanner = HybridScanner("10.0.0.5")
+    with patch.object(scanner, "_build_modules", side_effect=modules):
+        report = asyncio.run(scanner.run_all())
+
+    assert report["Network_Scan"][0]["port"] == 445
+    for key in ("System_Config", "UAC_Check", "FileSystem_Check"):
+        assert report[key]["Status"] == "Not applicable"
+    # The scanning machine's SMBv1/UAC state is not reported for the remote host
+    assert scanner.fixes == [] and not scanner.build_result()["vulnerable"]
+    assert all(next(iter(t)) == "Network_Scan" for t in report.get("mitre_techniques", []))
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+
+from app.core.scheduler import ScanScheduler, QueueFull
+
+
+def test_worker_limit_and_priority_order():
+    order, running, peak = [], 0, 0
+
+    async def main():
+        scheduler = ScanScheduler(workers=2)
+
+        def job(name):
+            async def run():
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                order.append(name)
+                await asyncio.sleep(0.01)
+                running -= 1
+            return run
+
+        for name, priority in [("a", "normal"), ("b", "normal"), ("low", "low"),
+                               ("normal", "normal"), ("high", "high")]:
+            scheduler.submit(name, job(name), priority=priority)
+        await scheduler.drain()
+        return scheduler.stats()
+
+    stats = asyncio.run(main())
+    assert peak == 2
+    assert order == ["a", "b", "high", "normal", "low"]
+    assert stats["running"] == 0 and stats["queue_depth"] == 0
+
+
+def test_dedupe_status_and_queue_full():
+    async def main():
+        scheduler = ScanScheduler(workers=1, max_queue=1)
+        gate = asyncio.Event()
+        ran = []
+
+        async def run():
+            ran.append(1)
+            await gate.wait()
+
+        assert scheduler.submit("first", run, key="host-a") == "first"
+        await asyncio.sleep(0)
+        # "first" is running, so its key no longer de-duplicates
+        assert scheduler.pending_job("host-a") is None
+        assert scheduler.submit("second", run, key="host-a") == "second"
+        assert scheduler.submit("third", run, key="host-a") == "second"
+        with pytest.raises(QueueFull):
+            scheduler.submit("fourth", run, key="host-b")
+
+        await asyncio.sleep(0.02)
+        queued = scheduler.status("second")
+        assert queued["queue_position"] == 1 and queued["queue_depth"] == 1
+        assert queued["queue_wait"] >= 0.01
+
+        gate.set()
+        await scheduler.drain()
+        assert scheduler.status("second")["queue_wait"] >= 0.01
+        assert scheduler.status("unknown") is None
+        return len(ran)
+
+    assert asyncio.run(main()) == 2
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def main():
+        scheduler = ScanScheduler(workers=1)
+        gate = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("holder"):
+                await gate.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        async def wait_turn():
+            async with scheduler.slot("waiter", key="k"):
+                pass
+
+        waiter = asyncio.create_task(wait_turn())
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.stats()["queue_depth"] == 0
+        assert scheduler.pending_job("k") is None
+
+        gate.set()
+        await holder
+        # The slot is free again
+        async with scheduler.slot("next"):
+            return scheduler.stats()["running"]
+
+    assert asyncio.run(main()) == 1
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.core import registry
+from app.core.interfaces import IScanStrategy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Never imported by a port probe whose options all come from the command line
+# (import time itself is measured by the cli_cold_start case of scripts/benchmark.py)
+HEAVY_MODULES = ["pydantic", "pydantic_settings", "app.core.settings_model", "app.core.mitre_mapper", "app.core.scanner"]
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+
+
+def test_cli_import_skips_heavy_modules():
+    code = """
+import sys
+import app.cli
+print(sorted(m for m in HEAVY if m in sys.modules))
+""".replace("HEAVY", repr(HEAVY_MODULES + ["app.core.strategies"]))
+    result = run_python(code)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_port_probe_with_explicit_options_never_loads_settings():
+    code = """
+import asyncio, sys
+sys.argv = ["cli", "--strategy", "network", "--ports", "1", "--port-timeout", "0.2", "--port-retries", "0",
+            "--port-concurrency", "1", "--concurrency", "1", "--timeout", "5", "--max-targets", "1"]
+from app import cli
+from app.core.config import settings
+asyncio.run(cli.main())
+print(settings.loaded, sorted(m for m in HEAVY if m in sys.modules), file=sys.stderr)
+""".replace("HEAVY", repr(HEAVY_MODULES))
+    result = run_python(code)
+    assert result.returncode == 0, result.stderr
+    assert '"Network_Scan"' in result.stdout
+    assert result.stderr.strip().splitlines()[-1] == "False []"
+
+
+def test_registry_imports_strategies_on_first_use(monkeypatch):
+    monkeypatch.setattr(registry, "STRATEGIES", dict(registry.STRATEGIES))
+    monkeypatch.setattr(registry, "_classes", {})
+
+    assert registry.strategy_names() == ["network", "service", "registry", "file"]
+    strategy = registry.create_strategy("network", ports="445", retries=0)
+    assert isinstance(strategy, IScanStrategy) and strategy.ports == [445]
+
+    registry.register_strategy("custom", "tests.test_scanner:FakeStrategy")
+    assert registry.create_strategy("custom", result={"ok": True}).result == {"ok": True}
+    with pytest.raises(ValueError):
+        registry.get_strategy_class("nope")
+    with pytest.raises(ValueError):
+        registry.register_strategy("broken", "tests.test_scanner.FakeStrategy")
+
+
+def test_settings_can_be_patched():
+    from unittest.mock import patch
+    from app.core.config import settings
+
+    original = settings.PS_TIMEOUT
+    with patch.object(settings, "PS_TIMEOUT", original + 1):
+        assert settings.PS_TIMEOUT == original + 1
+    assert settings.PS_TIMEOUT == original
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import stat
+import sys
+import pytest
+
+from app.core.strategies import RegistryAuditStrategy
+
+# Stand-in for RegistryInspector.exe speaking the --batch protocol
+BATCH_INSPECTOR = '''
+import json, os, sys
+with open(os.environ["INSPECTOR_LOG"], "a") as log:
+    log.write(" ".join(sys.argv[1:]) + "\\n")
+registry = {"EnableLUA": "0", "NoLMHash": "1"}
+for line in sys.stdin:
+    check = json.loads(line)
+    if check["value"] == "Hang":
+        import time; time.sleep(30)
+    value = registry.get(check["value"])
+    if value is None:
+        out = {"id": check["id"], "status": "ERROR", "message": "Value not found"}
+    else:
+        status = "SECURE" if value == check["expected"] else "VULNERABLE"
+        out = {"id": check["id"], "status": status, "value": value, "expected": check["expected"]}
+    print(json.dumps(out), flush=True)
+'''
+
+# Stand-in for an old inspector that ignores --batch and answers the UAC check once
+LEGACY_INSPECTOR = '''
+print("Banner noise")
+print('{ "status": "SECURE", "value": "1", "expected": "1" }')
+'''
+
+
+def make_inspector(tmp_path, body):
+    path = tmp_path / "inspector"
+    path.write_text(f"#!{sys.executable}\n{body}")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def check(name, value, expected="1"):
+    return {"name": name, "key": r"SOFTWARE\Policies\Test", "value": value, "expected": expected}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Stand-in inspector relies on a shebang")
+def test_batch_runs_all_checks_in_one_process(tmp_path, monkeypatch):
+    log = tmp_path / "spawns.log"
+    monkeypatch.setenv("INSPECTOR_LOG", str(log))
+    checks = [RegistryAuditStrategy.UAC_CHECK] + [check(f"Check_{i}", "NoLMHash") for i in range(300)]
+    checks.append(check("Missing", "DoesNotExist"))
+
+    strategy = RegistryAuditStrategy(checks=checks, exe_path=make_inspector(tmp_path, BATCH_INSPECTOR))
+    result = asyncio.run(strategy.scan("127.0.0.1"))
+
+    assert log.read_text().splitlines() == ["--batch"]
+    assert result["UAC_Check"]["Status"] == "VULNERABLE"
+    assert result["UAC_Check"]["Risk"] == "HIGH"
+    baseline = result["Registry_Baseline"]
+    assert len(baseline) == 301
+    assert baseline["Check_7"]["Risk"] == "LOW"
+    assert baseline["Missing"]["Status"] == "ERROR"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Stand-in inspector relies on a shebang")
+def test_timeout_keeps_partial_results(tmp_path, monkeypatch):
+    monkeypatch.setenv("INSPECTOR_LOG", str(tmp_path / "spawns.log"))
+    checks = [check("Fast", "NoLMHash"), check("Slow", "Hang")]
+
+    strategy = RegistryAuditStrategy(checks=checks, exe_path=make_inspector(tmp_path, BATCH_INSPECTOR), timeout=1.0)
+    result = asyncio.run(strategy.scan("127.0.0.1"))
+
+    assert result["Registry_Baseline"]["Fast"]["Status"] == "SECURE"
+    assert result["Registry_Baseline"]["Slow"]["Status"] == "No result"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Stand-in inspector relies on a shebang")
+def test_legacy_inspector_output(tmp_path):
+    strategy = RegistryAuditStrategy(checks=[RegistryAuditStrategy.UAC_CHECK],
+                                     exe_path=make_inspector(tmp_path, LEGACY_INSPECTOR))
+    result = asyncio.run(strategy.scan("127.0.0.1"))
+    assert result == {"UAC_Check": {
+        "Status": "SECURE", "Risk": "LOW",
+        "Check": r"SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\System\EnableLUA"
+    }}
+
+
+def test_missing_binary(tmp_path):
+    strategy = RegistryAuditStrategy(exe_path=os.path.join(str(tmp_path), "missing.exe"))
+    result = asyncio.run(strategy.scan("127.0.0.1"))
+    assert result["UAC_Check"]["Risk"] == "Binary Missing - Please Compile"
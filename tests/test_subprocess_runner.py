@@ -0,0 +1,105 @@
+import asyncio
+import stat
+import sys
+import time
+import pytest
+
+from app.core.subprocess_runner import run_ndjson, split_ndjson
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_records_stream_as_they_are_printed():
+    code = (
+        "import json, sys, time\n"
+        "print('banner')\n"
+        "print(json.dumps({'n': 1}), flush=True)\n"
+        "time.sleep(0.5)\n"
+        "print(json.dumps({'n': 2}))\n"
+        "sys.stderr.write('warn')\n"
+    )
+    seen = []
+
+    async def main():
+        start = time.perf_counter()
+        output = await run_ndjson(python(code), on_record=lambda r: seen.append((r["n"], time.perf_counter() - start)))
+        return output, time.perf_counter() - start
+
+    output, elapsed = asyncio.run(main())
+    assert [n for n, _ in seen] == [1, 2]
+    # The first record was handled well before the process finished
+    assert seen[0][1] < elapsed - 0.3
+    assert output.records == [] and output.text == ["banner"]
+    assert output.stderr == "warn" and output.returncode == 0
+    assert not output.partial
+
+
+def test_timeout_keeps_partial_records():
+    code = "import json, time\nprint(json.dumps({'done': 1}), flush=True)\ntime.sleep(30)\n"
+    output = asyncio.run(run_ndjson(python(code), timeout=0.5))
+    assert output.timed_out and output.partial
+    assert output.records == [{"done": 1}]
+    assert output.returncode != 0
+
+
+def test_output_cap_stops_reading_and_kills():
+    code = "import json\nwhile True:\n    print(json.dumps({'x': 'y' * 100}))\n"
+    start = time.perf_counter()
+    output = asyncio.run(run_ndjson(python(code), max_output=64 * 1024, timeout=10))
+    assert output.truncated and not output.timed_out
+    assert output.bytes_read <= 64 * 1024 + 200
+    assert 0 < len(output.records) < 1000
+    assert time.perf_counter() - start < 5
+
+
+def test_text_cap_marks_output_partial():
+    code = "import json\nfor i in range(200):\n    print('noise ' * 20)\nprint(json.dumps({'n': 1}))\n"
+    output = asyncio.run(run_ndjson(python(code), max_text=1024))
+    assert output.text_truncated and output.partial
+    assert not output.truncated and output.returncode == 0
+    # The process ran to the end: records after the dropped text still arrive
+    assert output.records == [{"n": 1}]
+    assert 1024 <= sum(map(len, output.text)) < 1024 + 200
+
+
+def test_large_stdin_does_not_deadlock():
+    code = "import sys\nfor line in sys.stdin:\n    sys.stdout.write(line)\n"
+    lines = ('{"id": %d, "pad": "%s"}' % (i, "p" * 200) for i in range(20000))
+    output = asyncio.run(run_ndjson(python(code), stdin_lines=lines, timeout=20))
+    assert len(output.records) == 20000
+    assert output.records[-1]["id"] == 19999
+
+
+def test_split_ndjson():
+    records, text = split_ndjson('noise\n{"a": 1}\n\n{"b": \n[1]\n')
+    assert records == [{"a": 1}]
+    assert text == ["noise", '{"b":', "[1]"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Stand-in interpreter relies on a shebang")
+def test_service_config_one_shot_path(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.core.strategies import ServiceConfigStrategy
+
+    fake_ps = tmp_path / "powershell"
+    fake_ps.write_text(f"#!{sys.executable}\nimport sys\nprint('WARNING: legacy host')\nprint(open(sys.argv[-1]).read())\n")
+    fake_ps.chmod(fake_ps.stat().st_mode | stat.S_IEXEC)
+    (tmp_path / "audit_script.ps1").write_text('{"SMBv1_Status": "Enabled"}\n{"Last_Patch_ID": "KB1"}')
+    monkeypatch.setattr(settings, "SCRIPTS_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "POWERSHELL_PATH", str(fake_ps))
+    monkeypatch.setattr(settings, "PS_POOL_SIZE", 0)
+
+    result = asyncio.run(ServiceConfigStrategy().scan("127.0.0.1"))
+    assert result == {"System_Config": {"SMBv1_Status": "Enabled", "Last_Patch_ID": "KB1"}}
+
+
+def test_service_config_reports_cut_legacy_text():
+    from app.core.strategies import ServiceConfigStrategy
+
+    result = ServiceConfigStrategy._from_output([], ['{"SMBv1_Status":', '"Enabled",'], "Output truncated")
+    assert result["error"] == "Output truncated (Invalid JSON output)"
+    # Complete records do not depend on the dropped text
+    result = ServiceConfigStrategy._from_output([{"SMBv1_Status": "Enabled"}], ["banner"])
+    assert result == {"System_Config": {"SMBv1_Status": "Enabled"}}
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.context import ContextScanner
+from app.core.tracing import trace, span, current_tracer
+from tests.test_scanner import FakeStrategy
+
+
+def test_span_is_a_noop_without_a_tracer():
+    assert current_tracer() is None
+    with span("orphan", detail=1) as args:
+        args["more"] = 2
+
+
+def test_concurrent_strategies_nest_under_execute_scan(tmp_path):
+    class Slow(FakeStrategy):
+        pass
+
+    class Broken(FakeStrategy):
+        async def scan(self, target):
+            raise RuntimeError("boom")
+
+    scanner = ContextScanner("127.0.0.1", concurrent=True)
+    scanner.add_strategy(Slow({"Slow": {"ok": True}}, 0.02))
+    scanner.add_strategy(Broken({}))
+    path = tmp_path / "scan.trace.json"
+
+    async def run():
+        with trace("test scan", str(path)):
+            await scanner.execute_scan()
+
+    asyncio.run(run())
+
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    outer = spans["execute_scan"]
+    for name in ("strategy:Slow", "strategy:Broken"):
+        inner = spans[name]
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 1
+    assert spans["strategy:Slow"]["dur"] >= 15000
+    assert spans["strategy:Broken"]["args"]["error"] == "RuntimeError: boom"
+    # Gathered strategies run in their own tasks, so each gets its own track
+    assert spans["strategy:Slow"]["tid"] != spans["strategy:Broken"]["tid"]
+    assert any(e["ph"] == "M" and e["name"] == "process_name" for e in events)
+
+
+def test_trace_is_written_when_the_block_fails(tmp_path):
+    path = tmp_path / "failed.json"
+    with pytest.raises(ValueError):
+        with trace("failing", str(path)):
+            with span("parse", cat="parse", records=3):
+                raise ValueError("bad output")
+
+    spans = {e["name"]: e for e in json.loads(path.read_text())["traceEvents"] if e["ph"] == "X"}
+    assert spans["parse"]["args"] == {"records": 3, "error": "ValueError: bad output"}
+    assert "error" in spans["failing"]["args"]
+    assert current_tracer() is None